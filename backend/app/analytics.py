@@ -0,0 +1,217 @@
+"""Per-product sales analytics of a date range, for every product at once.
+
+The sales of each product in the range and in the period of the same length
+before it come from the rollups (``rollups.product_totals``), never from
+``invoice_items``. They are laid out as NumPy columns indexed like the
+product list, and the measures are computed column-wise:
+
+* ABC class: products ranked by revenue; A until 80% of the revenue is
+  reached, B until 95%, C for the rest and for products without sales.
+* revenue share of the range's total (the schema records no unit cost, so
+  this stands in for margin contribution).
+* velocity: units sold per day.
+* sell-through: units sold / (units sold + stock left at the end).
+* changes against the previous period.
+
+Results are cached by range. Sales and stock movements are recorded today,
+so they only drop the ranges that reach today: an earlier range's stock at
+its end is today's stock less the movements since, which a new movement
+changes both sides of. Product edits drop every range. NumPy is optional: without it the analytics endpoint answers 400.
+"""
+import os
+from collections import OrderedDict, deque
+from datetime import date, timedelta
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+from .rollups import local_midnight, product_totals
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "32"))
+INVALIDATION_HISTORY = 256
+ABC_THRESHOLDS = (0.80, 0.95)  # cumulative revenue share closing classes A and B
+
+# NumPy columns of a result, one entry per product, best revenue first
+Analytics = Dict[str, Any]
+
+
+class AnalyticsCache:
+    """Results by date range, keyed ``(start, end)``. ``invalidate(since)``
+    drops the ranges that end on or after ``since``, or all of them without
+    it; a result computed across an invalidation of its range is not stored
+    (see ``ProductCache``)."""
+
+    def __init__(self, max_size: int = ANALYTICS_CACHE_SIZE):
+        self.max_size = max_size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[date, date], Analytics]" = OrderedDict()
+        # (generation, since) of the latest invalidations
+        self._invalidations: Deque[Tuple[int, Optional[date]]] = deque(maxlen=INVALIDATION_HISTORY)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[date, date]) -> Optional[Analytics]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def _unchanged(self, end: date, generation: int) -> bool:
+        if generation == self.generation:
+            return True
+        if self.generation - generation > len(self._invalidations):
+            return False  # invalidations older than the history
+        return all(
+            since is not None and end < since
+            for invalidated, since in self._invalidations if invalidated > generation
+        )
+
+    def put(self, key: Tuple[date, date], analytics: Analytics, generation: int) -> None:
+        if not self._unchanged(key[1], generation):
+            return
+        self._entries[key] = analytics
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, since: Optional[date] = None) -> None:
+        self.generation += 1
+        self._invalidations.append((self.generation, since))
+        if since is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[1] >= since]:
+            del self._entries[key]
+
+
+analytics_cache = AnalyticsCache()
+
+
+def previous_period(start: date, end: date) -> Tuple[date, date]:
+    """The period of the same length ending the day before ``start``."""
+    return start - (end - start) - timedelta(days=1), start - timedelta(days=1)
+
+
+async def _sold(db: AsyncSession, np, ids, start: date, end: date):
+    """Units and revenue of each product of ``ids`` (sorted) in the range."""
+    units = np.zeros(len(ids), dtype=np.int64)
+    revenue = np.zeros(len(ids), dtype=np.float64)
+    for stmt in product_totals(start, end):
+        rows = (await db.execute(stmt)).all()
+        if not rows or not len(ids):
+            continue
+        product_ids, quantities, revenues = (np.array(column) for column in zip(*rows))
+        # Rollups keep the sales of deleted products; leave those out
+        positions = np.searchsorted(ids, product_ids).clip(max=len(ids) - 1)
+        known = ids[positions] == product_ids
+        np.add.at(units, positions[known], quantities[known].astype(np.int64))
+        np.add.at(revenue, positions[known], revenues[known].astype(np.float64))
+    return units, revenue
+
+
+async def compute_analytics(db: AsyncSession, start: date, end: date) -> Analytics:
+    try:
+        import numpy as np
+    except ImportError:
+        raise HTTPException(status_code=400, detail="Sales analytics needs numpy installed on the server.")
+
+    products = (await db.execute(
+        select(models.Product.id, models.Product.code, models.Product.name, models.Product.quantity)
+        .order_by(models.Product.id)
+    )).all()
+    ids = np.array([row[0] for row in products], dtype=np.int64)
+    stock = np.array([row[3] or 0 for row in products], dtype=np.int64)
+    units, revenue = await _sold(db, np, ids, start, end)
+    previous_units, previous_revenue = await _sold(db, np, ids, *previous_period(start, end))
+
+    # Stock at the end of the range: today's, less what moved since
+    moved = (await db.execute(
+        select(models.InventoryRecord.product_id, func.sum(models.InventoryRecord.quantity_change))
+        .where(models.InventoryRecord.created_at >= local_midnight(end + timedelta(days=1)))
+        .group_by(models.InventoryRecord.product_id)
+    )).all()
+    if moved and len(ids):
+        moved_ids, changes = (np.array(column) for column in zip(*moved))
+        positions = np.searchsorted(ids, moved_ids).clip(max=len(ids) - 1)
+        known = ids[positions] == moved_ids
+        np.subtract.at(stock, positions[known], changes[known].astype(np.int64))
+    stock = stock.clip(min=0)
+
+    total = revenue.sum()
+    order = np.argsort(-revenue, kind="stable")
+    share = revenue / total if total > 0 else np.zeros(len(ids))
+    share_before = np.empty(len(ids))
+    share_before[order] = np.cumsum(share[order]) - share[order]
+    abc = np.where(share_before < ABC_THRESHOLDS[0], "A", np.where(share_before < ABC_THRESHOLDS[1], "B", "C"))
+    abc[revenue <= 0] = "C"
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sell_through = np.where(units + stock > 0, units / (units + stock), 0.0)
+        revenue_change_pct = np.where(
+            previous_revenue > 0, (revenue - previous_revenue) / previous_revenue, np.nan
+        )
+
+    columns = {
+        "product_id": ids,
+        "code": np.array([row[1] for row in products], dtype=object),
+        "name": np.array([row[2] for row in products], dtype=object),
+        "abc_class": abc,
+        "units": units,
+        "revenue": revenue,
+        "revenue_share": share,
+        "velocity": units / ((end - start).days + 1),
+        "sell_through": sell_through,
+        "stock": stock,
+        "previous_units": previous_units,
+        "previous_revenue": previous_revenue,
+        "units_change": units - previous_units,
+        "revenue_change": revenue - previous_revenue,
+        "revenue_change_pct": revenue_change_pct,
+    }
+    return {name: column[order] for name, column in columns.items()}
+
+
+async def product_analytics(db: AsyncSession, start: date, end: date) -> Analytics:
+    """Analytics of every product from ``start`` to ``end`` (days,
+    inclusive), from the cache unless a sale in the range came in since."""
+    key = (start, end)
+    analytics = analytics_cache.get(key)
+    if analytics is None:
+        generation = analytics_cache.generation
+        analytics = await compute_analytics(db, start, end)
+        analytics_cache.put(key, analytics, generation)
+    return analytics
+
+
+def analytics_page(
+    analytics: Analytics, start: date, end: date, abc_class: Optional[schemas.AbcClass],
+    page: int, limit: int
+) -> schemas.ProductAnalyticsResponse:
+    """One page of ``analytics``, optionally of one ABC class only."""
+    selected = analytics if abc_class is None else {
+        name: column[analytics["abc_class"] == abc_class.value] for name, column in analytics.items()
+    }
+    offset = (page - 1) * limit
+    rows = {name: column[offset:offset + limit].tolist() for name, column in selected.items()}
+    # NaN (no sales in the previous period) has no JSON form
+    rows["revenue_change_pct"] = [None if pct != pct else pct for pct in rows["revenue_change_pct"]]
+    previous_start, previous_end = previous_period(start, end)
+    return schemas.ProductAnalyticsResponse(
+        start=start,
+        end=end,
+        previous_start=previous_start,
+        previous_end=previous_end,
+        revenue=float(analytics["revenue"].sum()),
+        previous_revenue=float(analytics["previous_revenue"].sum()),
+        total=len(selected["product_id"]),
+        items=[schemas.ProductAnalytics(**dict(zip(rows, values))) for values in zip(*rows.values())],
+    )
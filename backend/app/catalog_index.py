@@ -0,0 +1,318 @@
+"""In-process product catalog index for search-as-you-type.
+
+The POS searches on every keystroke, so ``/products/search`` is served from
+memory instead of two SQLite queries per key press. The index is loaded from
+``products`` at startup and then kept current by the write paths (create,
+update, bulk import, stock movements and checkout) after they commit.
+
+Layout:
+    * one slot per product, in product id order, with numeric columns in
+      ``array`` buffers and the text columns in plain lists; slots never
+      move (removed products leave a tombstone until the next load)
+    * a sorted index of folded codes, used to put an exact code hit first
+    * an n-gram index mapping every 1-, 2- and 3-gram of the folded
+      "code name" text to the sorted slots of the products containing it
+
+Queries of up to three characters are a single posting-list lookup. Longer
+ones verify the shortest posting of their trigrams against the folded text,
+or, while the user keeps typing, the cached matches of the previous
+keystroke. Matching is a case- and diacritic-insensitive substring match on
+code or name, i.e. ``ilike('%q%')`` plus folding, in id order with an exact
+code match first.
+
+The index lives in one process: like the writer queue it assumes a single
+API worker owns the database.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from . import models
+from .utils.text import fold_vietnamese
+
+_EPOCH = datetime(1970, 1, 1)
+_LOAD_CHUNK = 10_000
+_RECENT_QUERIES = 32
+
+
+def _to_seconds(value: Optional[datetime]) -> float:
+    return (value - _EPOCH).total_seconds() if value else 0.0
+
+
+def _from_seconds(value: float) -> datetime:
+    return _EPOCH + timedelta(seconds=value)
+
+
+def _grams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    grams.update(text[i:i + 3] for i in range(len(text) - 2))
+    return grams
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.ready = False
+        self._live = 0
+        self._ids = array("i")
+        self._alive = bytearray()
+        self._prices = array("d")
+        self._quantities = array("i")
+        self._created = array("d")
+        self._updated = array("d")
+        self._codes: List[str] = []
+        self._names: List[str] = []
+        self._texts: List[str] = []
+        self._code_keys: List[str] = []
+        self._code_slots = array("i")
+        self._postings: Dict[str, array] = {}
+        self._recent: "OrderedDict[str, Sequence[int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return self._live
+
+    async def load(self, session_factory) -> None:
+        """Build the index from the products table and swap it in."""
+        fresh = CatalogIndex()
+        async with session_factory() as db:
+            result = await db.stream(
+                select(
+                    models.Product.id, models.Product.code, models.Product.name,
+                    models.Product.price, models.Product.quantity,
+                    models.Product.created_at, models.Product.updated_at,
+                )
+                .order_by(models.Product.id)
+                .execution_options(yield_per=_LOAD_CHUNK)
+            )
+            async for rows in result.partitions():
+                for row in rows:
+                    fresh._append(*row)
+        fresh._index_codes()
+        fresh.ready = True
+        self.__dict__.update(fresh.__dict__)
+
+    def _append(self, id, code, name, price, quantity, created_at, updated_at) -> int:
+        slot = len(self._ids)
+        self._ids.append(id)
+        self._alive.append(1)
+        self._codes.append(code)
+        self._names.append(name)
+        self._texts.append(fold_vietnamese(f"{code} {name}"))
+        self._prices.append(price)
+        self._quantities.append(quantity or 0)
+        self._created.append(_to_seconds(created_at))
+        self._updated.append(_to_seconds(updated_at))
+        self._index_text(slot)
+        self._live += 1
+        return slot
+
+    def _index_text(self, slot: int) -> None:
+        postings = self._postings
+        for gram in _grams(self._texts[slot]):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array("i")
+            if not posting or posting[-1] < slot:
+                posting.append(slot)
+            else:
+                posting.insert(bisect_left(posting, slot), slot)
+
+    def _unindex_text(self, slot: int) -> None:
+        for gram in _grams(self._texts[slot]):
+            posting = self._postings[gram]
+            del posting[bisect_left(posting, slot)]
+            if not posting:
+                del self._postings[gram]
+
+    def _index_codes(self) -> None:
+        codes = sorted(
+            (fold_vietnamese(code), slot)
+            for slot, code in enumerate(self._codes) if self._alive[slot]
+        )
+        self._code_keys = [code for code, _ in codes]
+        self._code_slots = array("i", (slot for _, slot in codes))
+
+    def _slot(self, product_id: int) -> Optional[int]:
+        slot = bisect_left(self._ids, product_id)
+        if slot < len(self._ids) and self._ids[slot] == product_id:
+            return slot
+        return None
+
+    # Incremental maintenance, called after the write has committed
+
+    def upsert(self, product) -> None:
+        """Add or replace a product (ORM object, row or ``schemas.Product``)."""
+        self.upsert_many([product])
+
+    def upsert_many(self, products) -> None:
+        """Add or replace several products, re-sorting the code index once."""
+        if not self.ready:
+            return
+        changed = False
+        for product in products:
+            changed |= self._upsert(product)
+        if changed:
+            self._index_codes()
+
+    def _upsert(self, product) -> bool:
+        """Apply one product; returns whether its code or name changed."""
+        slot = self._slot(product.id)
+        if (slot is not None and self._alive[slot]
+                and (self._codes[slot], self._names[slot]) == (product.code, product.name)):
+            # Text unchanged: only the numeric columns move
+            self._prices[slot] = product.price
+            self._quantities[slot] = product.quantity or 0
+            self._updated[slot] = _to_seconds(product.updated_at)
+            return False
+
+        self._recent.clear()
+        if slot is None and self._ids and product.id < self._ids[-1]:
+            # Ids only grow in practice; keep slots in id order if one doesn't
+            self._append(product.id, product.code, product.name, product.price,
+                         product.quantity, product.created_at, product.updated_at)
+            self._reorder()
+            return False
+        if slot is None:
+            slot = self._append(product.id, product.code, product.name, product.price,
+                                product.quantity, product.created_at, product.updated_at)
+        else:
+            if self._alive[slot]:
+                self._unindex_text(slot)
+                self._live -= 1
+            self._alive[slot] = 1
+            self._live += 1
+            self._codes[slot], self._names[slot] = product.code, product.name
+            self._texts[slot] = fold_vietnamese(f"{product.code} {product.name}")
+            self._prices[slot] = product.price
+            self._quantities[slot] = product.quantity or 0
+            self._created[slot] = _to_seconds(product.created_at)
+            self._updated[slot] = _to_seconds(product.updated_at)
+            self._index_text(slot)
+        return True
+
+    def remove(self, product_id: int) -> None:
+        slot = self._slot(product_id)
+        if slot is None or not self._alive[slot]:
+            return
+        self._recent.clear()
+        self._unindex_text(slot)
+        self._alive[slot] = 0
+        self._live -= 1
+        self._index_codes()
+
+    def adjust_quantity(self, product_id: int, delta: int) -> None:
+        """Apply a committed stock movement."""
+        slot = self._slot(product_id) if self.ready else None
+        if slot is not None:
+            self._quantities[slot] += delta
+
+    def _reorder(self) -> None:
+        rows = sorted(
+            (self._ids[slot], self._codes[slot], self._names[slot], self._prices[slot],
+             self._quantities[slot], _from_seconds(self._created[slot]),
+             _from_seconds(self._updated[slot]))
+            for slot in range(len(self._ids)) if self._alive[slot]
+        )
+        fresh = CatalogIndex()
+        for row in rows:
+            fresh._append(*row)
+        fresh._index_codes()
+        fresh.ready = True
+        self.__dict__.update(fresh.__dict__)
+
+    # Lookups
+
+    def _row(self, slot: int) -> dict:
+        return {
+            "id": self._ids[slot],
+            "code": self._codes[slot],
+            "name": self._names[slot],
+            "price": self._prices[slot],
+            "quantity": self._quantities[slot],
+            "created_at": _from_seconds(self._created[slot]),
+            "updated_at": _from_seconds(self._updated[slot]),
+        }
+
+    def get(self, product_id: int) -> Optional[dict]:
+        """A live product by id, or None."""
+        slot = self._slot(product_id)
+        if slot is None or not self._alive[slot]:
+            return None
+        return self._row(slot)
+
+    def _matching_slots(self, needle: str) -> Sequence[int]:
+        """Sorted slots of the live products whose folded text contains ``needle``."""
+        if not needle:
+            return [slot for slot, alive in enumerate(self._alive) if alive]
+        if len(needle) <= 3:
+            return self._postings.get(needle, ())
+
+        cached = self._recent.get(needle)
+        if cached is not None:
+            self._recent.move_to_end(needle)
+            return cached
+
+        # Narrowest candidate set: an earlier, shorter query contained in
+        # this one (the previous keystroke) or the rarest trigram
+        candidates = None
+        for previous, slots in self._recent.items():
+            if previous in needle and (candidates is None or len(slots) < len(candidates)):
+                candidates = slots
+        for i in range(len(needle) - 2):
+            posting = self._postings.get(needle[i:i + 3], ())
+            if candidates is None or len(posting) < len(candidates):
+                candidates = posting
+
+        texts = self._texts
+        slots = [slot for slot in candidates if needle in texts[slot]]
+        self._recent[needle] = slots
+        if len(self._recent) > _RECENT_QUERIES:
+            self._recent.popitem(last=False)
+        return slots
+
+    def search(
+        self, query: str, skip: int = 0, limit: int = 10, after: Optional[int] = None
+    ) -> Tuple[int, List[dict], Optional[int]]:
+        """Return the total number of matches, one page of product rows and
+        the keyset position after the page (``None`` on the last page).
+
+        ``after`` continues from a previous page's position instead of
+        skipping ``skip`` matches.
+        """
+        needle = fold_vietnamese(query)
+        slots = self._matching_slots(needle)
+
+        # A scanned or typed exact code goes first; the rest stay in id order
+        exact = None
+        position = bisect_left(self._code_keys, needle)
+        if needle and position < len(self._code_keys) and self._code_keys[position] == needle:
+            exact = self._code_slots[position]
+
+        if after is not None:
+            # Keyset page: matches with a larger id, the exact hit was on page one
+            start = bisect_left(slots, bisect_right(self._ids, after))
+            rest = [slot for slot in slots[start:start + limit + 2] if slot != exact]
+            page, more = rest[:limit], len(rest) > limit
+        elif exact is None:
+            page, more = slots[skip:skip + limit], skip + limit < len(slots)
+        else:
+            # Page of [exact] + slots-without-exact, sliced without copying slots
+            at = bisect_left(slots, exact)
+            start, end = max(skip - 1, 0), skip + limit - 1
+            page = list(slots[start:min(end, at)]) + list(slots[max(start, at) + 1:end + 1])
+            if skip == 0:
+                page.insert(0, exact)
+            more = skip + limit < len(slots)
+
+        next_after = None
+        if more:
+            ordered = [slot for slot in page if slot != exact or after is not None]
+            next_after = self._ids[ordered[-1]] if ordered else 0
+        return len(slots), [self._row(slot) for slot in page], next_after
+
+
+catalog_index = CatalogIndex()
@@ -0,0 +1,99 @@
+"""Gzip-compressed snapshot of the whole catalog, for bootstrapping terminals.
+
+The body is JSON with one array per product instead of one object, so field
+names are sent once rather than once per product::
+
+    {"cursor": "<epoch>.<seq>",
+     "columns": ["id", "code", "name", "price", "quantity", "created_at", "updated_at"],
+     "rows": [[1, "SP001", "Cà phê sữa", 25000.0, 12, "2024-...", "2024-..."], ...],
+     "count": 1}
+
+It is stored and sent gzip-compressed (``Content-Encoding: gzip``), which
+browsers decode natively. ``cursor`` is the catalog sync cursor the snapshot
+was taken at (see ``catalog_sync``), so a terminal continues with
+``/products/changes?since=<cursor>`` afterwards.
+
+The snapshot is rebuilt only when products are added, removed, renamed or
+repriced (``catalog_sync_state.catalog_seq``), not on every sale: its stock
+levels may be older than the current ones, and the changes after its cursor
+bring the terminal up to date. The catalog version is the ETag, so terminals
+that already have the snapshot get a 304.
+"""
+import asyncio
+import json
+import zlib
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .catalog_sync import encode_sync_cursor
+
+SNAPSHOT_COLUMNS = ("id", "code", "name", "price", "quantity", "created_at", "updated_at")
+SNAPSHOT_BATCH_SIZE = 10_000
+SNAPSHOT_COMPRESS_LEVEL = 6
+
+
+def _compress_rows(compressor, rows, first: bool) -> bytes:
+    encoded = ",".join(
+        json.dumps([
+            value.isoformat() if hasattr(value, "isoformat") else value for value in row
+        ], ensure_ascii=False, separators=(",", ":"))
+        for row in rows
+    )
+    return compressor.compress((encoded if first else "," + encoded).encode())
+
+
+class CatalogSnapshot:
+    def __init__(self):
+        self.version: Optional[Tuple[str, int]] = None  # (epoch, catalog_seq) it was built at
+        self.etag: Optional[str] = None
+        self.body: Optional[bytes] = None
+        self.count = 0
+        self._lock = asyncio.Lock()
+
+    def _stale(self, version: Tuple[str, int]) -> bool:
+        # Only a newer catalog replaces the snapshot: a request whose read
+        # transaction began before the last build must not put back an older one
+        return self.version is None or self.version[0] != version[0] or self.version[1] < version[1]
+
+    async def get(self, db: AsyncSession) -> Tuple[str, bytes]:
+        """The current ``(etag, gzip body)``, rebuilding it if the catalog
+        changed since it was last built."""
+        state = await db.get(models.CatalogSyncState, 1)
+        if state is None:
+            raise HTTPException(status_code=503, detail="Catalog sync is not initialized")
+        version = (state.epoch, state.catalog_seq)
+        if self._stale(version):
+            async with self._lock:
+                if self._stale(version):
+                    cursor = encode_sync_cursor(state.epoch, state.seq)
+                    body, count = await self._build(db, cursor)
+                    self.version, self.etag = version, f'"{state.epoch}.{state.catalog_seq}"'
+                    self.body, self.count = body, count
+        return self.etag, self.body
+
+    async def _build(self, db: AsyncSession, cursor: str) -> Tuple[bytes, int]:
+        # Same read transaction as the sync state above, so the rows are the
+        # catalog exactly as of ``cursor``
+        columns = [getattr(models.Product, name) for name in SNAPSHOT_COLUMNS]
+        result = await db.stream(
+            select(*columns).order_by(models.Product.id)
+            .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+        )
+        compressor = zlib.compressobj(SNAPSHOT_COMPRESS_LEVEL, zlib.DEFLATED, 31)  # gzip container
+        header = json.dumps({"cursor": cursor, "columns": SNAPSHOT_COLUMNS}, separators=(",", ":"))
+        chunks: List[bytes] = [compressor.compress(header[:-1].encode() + b',"rows":[')]
+        count = 0
+        async for rows in result.partitions():
+            chunks.append(await run_in_threadpool(_compress_rows, compressor, rows, count == 0))
+            count += len(rows)
+        chunks.append(compressor.compress(f'],"count":{count}}}'.encode()))
+        chunks.append(compressor.flush())
+        return b"".join(chunks), count
+
+
+catalog_snapshot = CatalogSnapshot()
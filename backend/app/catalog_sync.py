@@ -0,0 +1,95 @@
+"""Incremental catalog sync for offline terminals.
+
+Every insert or update of a product stamps it with the next value of a
+catalog-wide change sequence, and every delete leaves a tombstone carrying
+its own sequence number (triggers in migration 4, so imports and raw SQL are
+covered as well as the ORM). A terminal remembers the sequence it has synced
+up to and asks only for what changed after it.
+
+Cursor format: ``"<epoch>.<seq>"``, e.g. ``"3f9c0a1b2d4e5f60.1842"``.
+
+* ``epoch`` identifies the database the sequence belongs to. It is created
+  with the database; a cursor from another epoch (a restored backup, a new
+  server) cannot be compared and the response starts over from 0 with
+  ``reset`` set, telling the terminal to drop its local catalog first.
+* ``seq`` is the last change the terminal has applied. An empty cursor
+  means a full sync.
+
+Sequence numbers are taken inside the writing transaction, and SQLite
+commits one writer at a time, so a reader that sees change ``n`` also sees
+every change before it: walking the cursor never skips a write.
+"""
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 5000
+
+
+def encode_sync_cursor(epoch: str, seq: int) -> str:
+    return f"{epoch}.{seq}"
+
+
+def decode_sync_cursor(cursor: str) -> Tuple[str, int]:
+    """Split a cursor into ``(epoch, seq)``; raises a 400 if it is malformed."""
+    epoch, _, seq = cursor.partition(".")
+    if not epoch or not seq.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    return epoch, int(seq)
+
+
+def changes_after(model, seq: int, limit: int):
+    """Rows of ``model`` (products or tombstones) changed after ``seq``, oldest first."""
+    return select(model).where(model.change_seq > seq).order_by(model.change_seq).limit(limit)
+
+
+async def changes_since(
+    db: AsyncSession,
+    since: Optional[str] = None,
+    limit: int = DEFAULT_CHANGES_LIMIT
+) -> schemas.ProductChanges:
+    """Products created or updated, and products deleted, after ``since``.
+
+    At most ``limit`` changes are returned, oldest first; ``has_more`` says
+    whether the returned cursor should be requested again straight away.
+    Terminals apply ``deleted`` before ``items``.
+    """
+    state = await db.get(models.CatalogSyncState, 1)
+    if state is None:
+        raise HTTPException(status_code=503, detail="Catalog sync is not initialized")
+
+    seq, reset = 0, False
+    if since:
+        epoch, seq = decode_sync_cursor(since)
+        if epoch != state.epoch or seq > state.seq:
+            seq, reset = 0, True
+
+    products = (await db.execute(changes_after(models.Product, seq, limit + 1))).scalars().all()
+    tombstones = (await db.execute(changes_after(models.ProductTombstone, seq, limit + 1))).scalars().all()
+
+    changes = sorted([*products, *tombstones], key=lambda change: change.change_seq)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        seq = changes[-1].change_seq
+
+    items = [change for change in changes if isinstance(change, models.Product)]
+    # An id that was deleted and then reused shows up as both; the product wins
+    live_ids = {product.id for product in items}
+    deleted = [
+        schemas.ProductTombstone(id=tombstone.product_id, code=tombstone.code)
+        for tombstone in changes
+        if isinstance(tombstone, models.ProductTombstone) and tombstone.product_id not in live_ids
+    ]
+    return schemas.ProductChanges(
+        cursor=encode_sync_cursor(state.epoch, seq),
+        reset=reset,
+        has_more=has_more,
+        items=items,
+        deleted=deleted
+    )
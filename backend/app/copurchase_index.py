@@ -0,0 +1,170 @@
+"""In-process co-purchase index for "also bought with" recommendations.
+
+For every product the index keeps the products most often bought in the
+same invoice, with how often, and how many invoices the product was in. A
+cart's recommendations add up, over the products in the cart, the share of
+each one's invoices that also had the candidate: a strong link from a rarely
+sold product counts as much as one from a best seller.
+
+Memory is fixed per product: ``COPURCHASE_SLOTS`` (neighbor id, count)
+pairs in flat ``array`` buffers indexed by product id, 8 bytes a slot, so
+100k products at the default 32 slots take about 26 MB however many
+invoices there are. A product's slots are a Space-Saving summary: a new
+neighbor takes a free slot, or else replaces the least counted one and
+inherits its count plus one. Every neighbor bought with the product in more
+than 1/``COPURCHASE_SLOTS`` of its co-purchases is kept, and the counts of
+the kept ones are at most over-estimated by the replaced count.
+
+The index is built from ``invoice_items`` in the background at startup,
+and rebuilt on request (``POST /products/recommendations/rebuild``);
+checkouts add their basket after they commit. Baskets recorded while a
+build runs are replayed on the new index, so none is lost. Like the catalog
+index it lives in one process.
+"""
+import os
+from array import array
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import func, select
+
+from . import models
+
+COPURCHASE_SLOTS = int(os.getenv("COPURCHASE_SLOTS", "32"))
+# Products of a basket paired with each other; a wholesale order with
+# hundreds of lines says little about what goes together
+MAX_BASKET_PRODUCTS = 50
+# Lines counted between awaits: the build shares the event loop with
+# checkouts, so each chunk is kept to a few milliseconds of work
+_LOAD_CHUNK = 1000
+
+
+class CopurchaseIndex:
+    def __init__(self, slots: int = COPURCHASE_SLOTS):
+        self.slots = slots
+        self.ready = False
+        self.loading = False
+        self.baskets = 0
+        self._neighbors = array("i")  # product id * slots + n -> neighbor id, 0 if free
+        self._counts = array("i")
+        self._product_baskets = array("i")  # product id -> invoices it was in
+        self._pending: List[Tuple[int, List[int]]] = []
+
+    def memory_bytes(self) -> int:
+        return sum(
+            buffer.itemsize * len(buffer)
+            for buffer in (self._neighbors, self._counts, self._product_baskets)
+        )
+
+    def _grow(self, product_id: int) -> None:
+        size = len(self._product_baskets)
+        if product_id < size:
+            return
+        # Room for ids a quarter past the largest seen, so new products
+        # don't copy the buffers one by one
+        extra = max(product_id + 1 - size, size // 4)
+        self._product_baskets.extend(array("i", bytes(4 * extra)))
+        self._neighbors.extend(array("i", bytes(4 * extra * self.slots)))
+        self._counts.extend(array("i", bytes(4 * extra * self.slots)))
+
+    def _count(self, product_id: int, neighbor_id: int) -> None:
+        neighbors, counts = self._neighbors, self._counts
+        start = product_id * self.slots
+        end = start + self.slots
+        try:
+            counts[neighbors.index(neighbor_id, start, end)] += 1
+            return
+        except ValueError:
+            pass
+        try:
+            slot = neighbors.index(0, start, end)
+            floor = 0
+        except ValueError:
+            window = counts[start:end]
+            floor = min(window)
+            slot = start + window.index(floor)
+        neighbors[slot] = neighbor_id
+        counts[slot] = floor + 1
+
+    def _add(self, product_ids: Sequence[int]) -> None:
+        basket = list(dict.fromkeys(product_ids))[:MAX_BASKET_PRODUCTS]
+        if not basket:
+            return
+        self._grow(max(basket))
+        self.baskets += 1
+        for product_id in basket:
+            self._product_baskets[product_id] += 1
+            for neighbor_id in basket:
+                if neighbor_id != product_id:
+                    self._count(product_id, neighbor_id)
+
+    # Incremental maintenance, called after the invoice has committed
+
+    def record(self, invoice_id: int, product_ids: Sequence[int]) -> None:
+        """Add the basket of a new invoice."""
+        if self.loading:
+            self._pending.append((invoice_id, list(product_ids)))
+        if self.ready:
+            self._add(product_ids)
+
+    async def load(self, session_factory) -> None:
+        """Build the index from the invoices and swap it in."""
+        if self.loading:
+            return
+        self.loading = True
+        self._pending = []
+        try:
+            fresh = CopurchaseIndex(self.slots)
+            async with session_factory() as db:
+                last_invoice_id = await db.scalar(select(func.max(models.Invoice.id))) or 0
+                result = await db.stream(
+                    select(models.InvoiceItem.invoice_id, models.InvoiceItem.product_id)
+                    .where(models.InvoiceItem.invoice_id <= last_invoice_id)
+                    .order_by(models.InvoiceItem.invoice_id)
+                    .execution_options(yield_per=_LOAD_CHUNK)
+                )
+                invoice_id, basket = None, []
+                async for rows in result.partitions():
+                    for row_invoice_id, product_id in rows:
+                        if row_invoice_id != invoice_id:
+                            fresh._add(basket)
+                            invoice_id, basket = row_invoice_id, []
+                        basket.append(product_id)
+                fresh._add(basket)
+            # Invoices committed while the build ran
+            for invoice_id, product_ids in self._pending:
+                if invoice_id > last_invoice_id:
+                    fresh._add(product_ids)
+            fresh.ready = True
+            self.__dict__.update(fresh.__dict__)
+        finally:
+            self.loading = False
+            self._pending = []
+
+    # Lookups
+
+    def neighbors(self, product_id: int) -> List[Tuple[int, int]]:
+        """(neighbor id, times bought together) of a product, most first."""
+        if product_id >= len(self._product_baskets):
+            return []
+        start = product_id * self.slots
+        pairs = zip(self._neighbors[start:start + self.slots], self._counts[start:start + self.slots])
+        return sorted(((neighbor, count) for neighbor, count in pairs if neighbor), key=lambda pair: -pair[1])
+
+    def recommend(self, product_ids: Sequence[int]) -> List[Tuple[int, float]]:
+        """Products bought with the cart ``product_ids`` and not in it, as
+        (product id, score), best first."""
+        cart = set(product_ids)
+        scores = {}
+        slots = self.slots
+        for product_id in cart:
+            if product_id <= 0 or product_id >= len(self._product_baskets) or not self._product_baskets[product_id]:
+                continue
+            baskets = self._product_baskets[product_id]
+            start = product_id * slots
+            for neighbor, count in zip(self._neighbors[start:start + slots], self._counts[start:start + slots]):
+                if neighbor and neighbor not in cart:
+                    scores[neighbor] = scores.get(neighbor, 0.0) + count / baskets
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+copurchase_index = CopurchaseIndex()
@@ -1,17 +1,154 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import os
+from dataclasses import dataclass, replace
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .models import Base
 
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./pos.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./pos.db")
+
+
+@dataclass
+class SQLiteProfile:
+    """Connection tuning applied to every SQLite connection an engine opens.
+
+    The PRAGMAs are per-connection (``journal_mode=WAL`` is also persisted in
+    the database file), so they are issued from a ``connect`` hook rather than
+    once at startup. Every field can be overridden with a ``SQLITE_<FIELD>``
+    environment variable, e.g. ``SQLITE_BUSY_TIMEOUT=10000``.
+    """
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024  # bytes
+    cache_size: int = -64000  # negative values are KiB, i.e. ~64MB
+    temp_store: str = "MEMORY"
+    busy_timeout: int = 5000  # milliseconds
+    begin_mode: str = "IMMEDIATE"  # writers take the lock up front instead of upgrading
+    query_only: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls, prefix: str = "SQLITE_") -> "SQLiteProfile":
+        """Build a profile from environment variables, keeping defaults for unset ones."""
+        profile = cls()
+        for name, default in vars(cls()).items():
+            value = os.getenv(f"{prefix}{name.upper()}")
+            if value is None:
+                continue
+            if isinstance(default, bool):
+                setattr(profile, name, value.lower() in ("1", "true", "yes", "on"))
+            else:
+                setattr(profile, name, type(default)(value))
+        return profile
+
+    def pragmas(self) -> List[str]:
+        pragmas = [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA cache_size={self.cache_size}",
+            f"PRAGMA temp_store={self.temp_store}",
+            f"PRAGMA busy_timeout={self.busy_timeout}",
+        ]
+        if self.query_only:
+            # Must come last: journal_mode above may still need to write
+            pragmas.append("PRAGMA query_only=ON")
+        return pragmas
+
+    def for_readers(self) -> "SQLiteProfile":
+        """Derive the profile of the read-only engine used by GET endpoints."""
+        return replace(
+            self,
+            begin_mode="DEFERRED",
+            query_only=True,
+            pool_size=int(os.getenv("SQLITE_READ_POOL_SIZE", self.pool_size * 2)),
+            max_overflow=int(os.getenv("SQLITE_READ_MAX_OVERFLOW", self.max_overflow)),
+        )
+
+
+def _is_file_db(url: str) -> bool:
+    return ":memory:" not in url and "mode=memory" not in url
+
+
+def create_engine_for_profile(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    profile: Optional[SQLiteProfile] = None
+) -> AsyncEngine:
+    """Create an async engine, tuned with ``profile`` when one is given.
+
+    Without a profile the engine behaves like SQLAlchemy's aiosqlite default:
+    rollback journal, ``synchronous=FULL`` and a new connection per session.
+    """
+    if profile is None:
+        return create_async_engine(url, connect_args={"check_same_thread": False})
+
+    pool_args = {}
+    if _is_file_db(url):
+        # aiosqlite defaults to NullPool for files; keep warm connections instead
+        pool_args = {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": profile.pool_size,
+            "max_overflow": profile.max_overflow,
+            "pool_timeout": profile.pool_timeout,
+        }
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    tuned_engine = create_async_engine(
+        url,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": profile.busy_timeout / 1000,
+        },
+        **pool_args
+    )
+
+    @event.listens_for(tuned_engine.sync_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        # Take over transaction control from the driver so BEGIN can be
+        # IMMEDIATE for writers and SAVEPOINTs behave (see the aiosqlite
+        # "Serializable isolation / Savepoints" notes in SQLAlchemy's docs)
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in profile.pragmas():
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    @event.listens_for(tuned_engine.sync_engine, "begin")
+    def begin_transaction(conn):
+        conn.exec_driver_sql(f"BEGIN {profile.begin_mode}")
+
+    return tuned_engine
+
+
+# Set SQLITE_PROFILE=default to fall back to SQLite's stock settings
+engine_profile = (
+    None if os.getenv("SQLITE_PROFILE", "tuned") == "default"
+    else SQLiteProfile.from_env()
 )
 
+engine = create_engine_for_profile(SQLALCHEMY_DATABASE_URL, engine_profile)
+
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Separate pool for reads: deferred, query-only transactions that never take
+# the write lock, so they run in parallel with the single WAL writer
+read_engine = create_engine_for_profile(
+    SQLALCHEMY_DATABASE_URL,
+    engine_profile.for_readers() if engine_profile else None
+)
+
+ReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -26,3 +163,8 @@ async def get_db():
             raise
         finally:
             await session.close()
+
+async def get_read_db():
+    """Session for read-only endpoints; it is never committed."""
+    async with ReadSessionLocal() as session:
+        yield session
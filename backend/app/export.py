@@ -0,0 +1,103 @@
+"""Streaming CSV / NDJSON exports of sales lines and the stock ledger.
+
+Rows are read through a server-side cursor (``AsyncSession.stream`` with
+``yield_per``) and encoded batch by batch in the threadpool, so memory stays
+the size of one batch however long the date range is. Each row is a flat
+join (invoice line with its invoice and product), never ORM objects.
+
+CSV starts with a UTF-8 BOM so spreadsheet programs read Vietnamese names
+correctly.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from starlette.concurrency import run_in_threadpool
+
+from . import models, schemas
+from .rollups import local_midnight
+
+EXPORT_BATCH_SIZE = 5000
+
+MEDIA_TYPES = {
+    schemas.ExportFormat.CSV: "text/csv; charset=utf-8",
+    schemas.ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def day_range(start: date, end: date):
+    """``[start, end]`` as stored (UTC) datetimes, the end day included.
+    Days are the server's local days, like the reports and invoice numbers."""
+    return local_midnight(start), local_midnight(end + timedelta(days=1))
+
+
+def invoice_lines(start: date, end: date) -> Select:
+    """One row per invoice line, oldest invoice first. Invoices without
+    lines still get a row."""
+    since, until = day_range(start, end)
+    return (
+        select(
+            models.Invoice.id.label("invoice_id"),
+            models.Invoice.invoice_number,
+            models.Invoice.created_at,
+            models.Invoice.total_amount,
+            models.InvoiceItem.product_id,
+            models.Product.code.label("product_code"),
+            models.Product.name.label("product_name"),
+            models.InvoiceItem.quantity,
+            models.InvoiceItem.unit_price,
+            models.InvoiceItem.total_price,
+        )
+        .outerjoin(models.InvoiceItem, models.InvoiceItem.invoice_id == models.Invoice.id)
+        .outerjoin(models.Product, models.Product.id == models.InvoiceItem.product_id)
+        .where(models.Invoice.created_at >= since, models.Invoice.created_at < until)
+        .order_by(models.Invoice.created_at, models.Invoice.id, models.InvoiceItem.id)
+    )
+
+
+def ledger_entries(start: date, end: date) -> Select:
+    """Stock movements (sales, restocks, corrections), oldest first."""
+    since, until = day_range(start, end)
+    return (
+        select(
+            models.InventoryRecord.id,
+            models.InventoryRecord.created_at,
+            models.InventoryRecord.product_id,
+            models.Product.code.label("product_code"),
+            models.Product.name.label("product_name"),
+            models.InventoryRecord.quantity_change,
+            models.InventoryRecord.notes,
+        )
+        .outerjoin(models.Product, models.Product.id == models.InventoryRecord.product_id)
+        .where(models.InventoryRecord.created_at >= since, models.InventoryRecord.created_at < until)
+        .order_by(models.InventoryRecord.created_at, models.InventoryRecord.id)
+    )
+
+
+def _encode(rows: Sequence, columns: Sequence[str], fmt: schemas.ExportFormat) -> bytes:
+    if fmt == schemas.ExportFormat.NDJSON:
+        return "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=datetime.isoformat) + "\n"
+            for row in rows
+        ).encode()
+    out = io.StringIO()
+    csv.writer(out).writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+    )
+    return out.getvalue().encode()
+
+
+async def export_rows(db: AsyncSession, stmt: Select, fmt: schemas.ExportFormat) -> AsyncIterator[bytes]:
+    """The rows of ``stmt`` as CSV (with a header) or NDJSON, one chunk per
+    batch. ``db`` must stay open until the iterator is exhausted."""
+    columns = list(stmt.selected_columns.keys())
+    if fmt == schemas.ExportFormat.CSV:
+        yield b"\xef\xbb\xbf" + _encode([columns], columns, fmt)
+    result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for rows in result.partitions():
+        yield await run_in_threadpool(_encode, rows, columns, fmt)
@@ -0,0 +1,226 @@
+"""Demand forecasts and reorder points, computed for every product at once.
+
+A batch job builds each product's daily demand over the last
+``HISTORY_DAYS``: units sold (the ``product_sales_daily`` rollup of invoice
+lines) plus stock that left without a sale (negative inventory records
+other than the ones checkout writes: waste, breakage, corrections). The
+series of all products form one matrix, and exponential smoothing with a
+weekly season runs over it a day at a time, every product in the same NumPy
+step.
+
+From the forecast of the next days and the spread of the one-day-ahead
+errors, each product gets
+
+* a reorder point: demand over the lead time plus safety stock, and
+* an order-up-to level: demand over the lead time and the review period
+  (the days until the next order) plus safety stock,
+
+stored in ``restock_plans``. The suggested order is the order-up-to level
+less the stock on hand when it is read, so it follows sales made since the
+run.
+
+The job runs in the API process every ``FORECAST_INTERVAL_HOURS`` (0
+disables it), or once from the command line, e.g. from cron:
+
+    python -m app.forecasting
+
+It needs NumPy; without it the job logs an error and plans are not updated.
+"""
+import argparse
+import asyncio
+import math
+import os
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from typing import List, Optional
+
+from sqlalchemy import Integer, delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .write_queue import write_queue
+
+HISTORY_DAYS = 12 * 7
+SEASON_DAYS = 7
+LEVEL_SMOOTHING = 0.2
+SEASON_SMOOTHING = 0.1
+LEAD_TIME_DAYS = int(os.getenv("RESTOCK_LEAD_TIME_DAYS", "3"))
+REVIEW_DAYS = int(os.getenv("RESTOCK_REVIEW_DAYS", "7"))
+SERVICE_LEVEL_Z = float(os.getenv("RESTOCK_SERVICE_LEVEL_Z", "1.65"))  # ~95% of lead times without a stockout
+FORECAST_INTERVAL_HOURS = float(os.getenv("FORECAST_INTERVAL_HOURS", "24"))
+PLAN_WRITE_CHUNK = 5000  # plans per writer-queue unit
+
+# Stock movements checkout writes for each invoice line ("Sale invoice #...");
+# those units are already counted from the invoices
+SALE_NOTES = "Sale invoice #%"
+
+
+def _day_index(column, first: date):
+    return func.cast(func.julianday(column) - func.julianday(first.isoformat()), Integer)
+
+
+async def load_demand(db: AsyncSession, first: date, days: int):
+    """(product ids, demand matrix of products x days from ``first``)."""
+    import numpy as np
+
+    ids = np.array(
+        (await db.execute(select(models.Product.id).order_by(models.Product.id))).scalars().all(),
+        dtype=np.int64
+    )
+    demand = np.zeros((len(ids), days), dtype=np.float32)
+    if not len(ids):
+        return ids, demand
+
+    end = first + timedelta(days=days)
+    sold = (
+        select(
+            models.ProductSalesDaily.product_id,
+            _day_index(models.ProductSalesDaily.day, first).label("day"),
+            models.ProductSalesDaily.quantity,
+        )
+        .where(models.ProductSalesDaily.day >= first, models.ProductSalesDaily.day < end)
+    )
+    # Local days, like the rollups; the margin of a day each side covers
+    # any UTC offset and is cut by the day index below
+    record_day = func.date(models.InventoryRecord.created_at, "localtime")
+    lost = (
+        select(
+            models.InventoryRecord.product_id,
+            _day_index(record_day, first).label("day"),
+            (-func.sum(models.InventoryRecord.quantity_change)).label("quantity"),
+        )
+        .where(
+            models.InventoryRecord.created_at >= datetime.combine(first - timedelta(days=1), time.min),
+            models.InventoryRecord.created_at < datetime.combine(end + timedelta(days=1), time.min),
+            models.InventoryRecord.quantity_change < 0,
+            models.InventoryRecord.notes.is_(None) | models.InventoryRecord.notes.not_like(SALE_NOTES),
+        )
+        .group_by(models.InventoryRecord.product_id, record_day)
+    )
+    for stmt in (sold, lost):
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            continue
+        product_ids, day_indexes, quantities = (np.array(column) for column in zip(*rows))
+        positions = np.searchsorted(ids, product_ids).clip(max=len(ids) - 1)
+        keep = (ids[positions] == product_ids) & (day_indexes >= 0) & (day_indexes < days)
+        np.add.at(demand, (positions[keep], day_indexes[keep]), quantities[keep].astype(np.float32))
+    return ids, demand
+
+
+def fit_seasonal(demand, alpha: float = LEVEL_SMOOTHING, gamma: float = SEASON_SMOOTHING):
+    """Exponential smoothing with an additive weekly season, for every row
+    of ``demand`` at once. Returns (level, season by day of the cycle, RMS
+    of the one-day-ahead errors); column ``t`` of ``demand`` is at cycle
+    position ``t % SEASON_DAYS``."""
+    import numpy as np
+
+    products, days = demand.shape
+    level = demand.mean(axis=1)
+    season = np.stack(
+        [demand[:, day::SEASON_DAYS].mean(axis=1) for day in range(SEASON_DAYS)], axis=1
+    ) - level[:, None]
+    squared_errors = np.zeros(products, dtype=np.float64)
+    for t in range(days):
+        position = t % SEASON_DAYS
+        error = demand[:, t] - (level + season[:, position])
+        squared_errors += error.astype(np.float64) ** 2
+        level = level + alpha * error
+        season[:, position] += gamma * (1 - alpha) * error
+    return level, season, np.sqrt(squared_errors / max(days, 1))
+
+
+def plan_restock(demand, lead_time: int = LEAD_TIME_DAYS, review: int = REVIEW_DAYS, z: float = SERVICE_LEVEL_Z):
+    """(forecast units per day, reorder point, order-up-to level) per row of
+    ``demand``, whose last column is yesterday."""
+    import numpy as np
+
+    level, season, sigma = fit_seasonal(demand)
+    days = demand.shape[1]
+    horizon = max(lead_time + review, SEASON_DAYS)
+    positions = (days + np.arange(horizon)) % SEASON_DAYS
+    forecast = np.clip(level[:, None] + season[:, positions], 0, None)
+    lead_demand = forecast[:, :lead_time].sum(axis=1)
+    cover_demand = forecast[:, :lead_time + review].sum(axis=1)
+    reorder_point = np.ceil(lead_demand + z * sigma * math.sqrt(lead_time))
+    order_up_to = np.maximum(np.ceil(cover_demand + z * sigma * math.sqrt(lead_time + review)), reorder_point)
+    return forecast[:, :SEASON_DAYS].mean(axis=1), reorder_point.astype(np.int64), order_up_to.astype(np.int64)
+
+
+async def save_plans(db: AsyncSession, plans: List[dict]) -> None:
+    """Write unit upserting a chunk of plans."""
+    stmt = insert(models.RestockPlan)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.RestockPlan.product_id],
+        set_={
+            "daily_demand": stmt.excluded.daily_demand,
+            "reorder_point": stmt.excluded.reorder_point,
+            "order_up_to": stmt.excluded.order_up_to,
+            "computed_at": stmt.excluded.computed_at,
+        }
+    ), plans)
+
+
+async def drop_stale_plans(db: AsyncSession, computed_at: datetime) -> None:
+    """Write unit removing the plans of products gone since the last run."""
+    await db.execute(delete(models.RestockPlan).where(models.RestockPlan.computed_at < computed_at))
+
+
+async def run_forecast(session_factory, today: Optional[date] = None) -> int:
+    """Forecast every product from the history up to yesterday and store the
+    plans; returns the number of products planned."""
+    today = today or date.today()
+    computed_at = datetime.utcnow()
+    first = today - timedelta(days=HISTORY_DAYS)
+    async with session_factory() as db:
+        ids, demand = await load_demand(db, first, HISTORY_DAYS)
+    daily_demand, reorder_point, order_up_to = await run_in_threadpool(plan_restock, demand)
+
+    columns = zip(ids.tolist(), daily_demand.tolist(), reorder_point.tolist(), order_up_to.tolist())
+    plans = [
+        {"product_id": product_id, "daily_demand": demand, "reorder_point": rop,
+         "order_up_to": level, "computed_at": computed_at}
+        for product_id, demand, rop, level in columns
+    ]
+    for start in range(0, len(plans), PLAN_WRITE_CHUNK):
+        await write_queue.submit(partial(save_plans, plans=plans[start:start + PLAN_WRITE_CHUNK]))
+    await write_queue.submit(partial(drop_stale_plans, computed_at=computed_at))
+    return len(plans)
+
+
+async def forecast_schedule(session_factory, interval_hours: float = FORECAST_INTERVAL_HOURS) -> None:
+    """Background task: run the forecast when the stored plans are older than
+    the interval, then again every interval."""
+    interval = timedelta(hours=interval_hours)
+    while True:
+        async with session_factory() as db:
+            last_run = await db.scalar(select(func.max(models.RestockPlan.computed_at)))
+        due = (last_run + interval - datetime.utcnow()).total_seconds() if last_run else 0
+        if due > 0:
+            await asyncio.sleep(due)
+            continue
+        try:
+            planned = await run_forecast(session_factory)
+            print(f"Restock plans updated for {planned} products")
+        except Exception as e:
+            # Keep serving the previous plans; try again next interval
+            print(f"Restock forecast failed: {e}")
+        # Also after a run that wrote no plans (an empty catalog), whose
+        # time the loop above cannot see
+        await asyncio.sleep(interval.total_seconds())
+
+
+async def main() -> None:
+    from .database import ReadSessionLocal
+
+    started = datetime.utcnow()
+    planned = await run_forecast(ReadSessionLocal)
+    await write_queue.stop()
+    print(f"Restock plans updated for {planned} products in {(datetime.utcnow() - started).total_seconds():.1f} s")
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+    asyncio.run(main())
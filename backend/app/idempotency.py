@@ -0,0 +1,237 @@
+"""``Idempotency-Key`` support for POST and PATCH requests.
+
+A client that retries a request after a timeout sends the same key again.
+The first request with a key runs as usual and its status, headers and
+body are kept for ``IDEMPOTENCY_TTL`` seconds; a retry gets that stored
+response back (with ``Idempotent-Replayed: true``) without running the
+endpoint, so a sale or a stock movement is applied once. A retry arriving
+while the first request is still running waits for it to finish.
+
+Keys are scoped to method, path and query string, and a key reused with a
+different body is rejected with 422; bodies are compared by their first
+``MAX_HASHED_BODY`` bytes and their length, so an upload is not held in
+memory. Responses with a 5xx status are not kept, so the request can be
+retried for real. Response bodies over ``MAX_STORED_BODY`` bytes are not
+kept either, only their status, length and digest: a retry of such a
+request gets a 409 saying it was already applied, rather than running it
+again. The store is in memory, like the other caches of this
+single-process API.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+MAX_KEY_LENGTH = 255
+IDEMPOTENT_METHODS = ("POST", "PATCH")
+# Bytes of the body hashed into the fingerprint; past that only its length
+MAX_HASHED_BODY = int(os.getenv("IDEMPOTENCY_MAX_HASHED_BODY", str(1024 * 1024)))
+# Largest response body kept for replay
+MAX_STORED_BODY = int(os.getenv("IDEMPOTENCY_MAX_STORED_BODY", str(256 * 1024)))
+
+
+class StoredResponse:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.status: Optional[int] = None
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.body: Optional[bytes] = b""  # None when it was too large to keep
+        self.body_length = 0
+        self.body_digest = ""
+        self.expires_at = 0.0
+        self.done = asyncio.Event()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.replays = 0
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[StoredResponse, bool]:
+        """The entry of ``key`` and whether the caller owns it (must run the
+        request and then ``complete`` or ``release`` it)."""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.done.is_set() and entry.expires_at <= now:
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            return entry, False
+
+        entry = StoredResponse(fingerprint)
+        self._entries[key] = entry
+        # Oldest first: drop expired entries, then completed ones over the limit
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if oldest is entry or not oldest.done.is_set():
+                break
+            if oldest.expires_at > now and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[oldest_key]
+        return entry, True
+
+    def complete(self, entry: StoredResponse) -> None:
+        entry.expires_at = time.monotonic() + self.ttl
+        entry.done.set()
+
+    def release(self, key: str, entry: StoredResponse) -> None:
+        """Forget a key whose request failed; waiting retries run it again."""
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+        entry.done.set()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def _send_json(send, status: int, detail: str, headers: List[Tuple[bytes, bytes]] = ()) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, entry: StoredResponse) -> None:
+    if entry.body is None:
+        await _send_json(
+            send, 409,
+            f"The request with this Idempotency-Key was already applied (status {entry.status}); "
+            f"its {entry.body_length}-byte response was too large to keep (sha256 {entry.body_digest})",
+            [(b"idempotent-replayed", b"true")]
+        )
+        return
+    await send({
+        "type": "http.response.start",
+        "status": entry.status,
+        "headers": entry.headers + [(b"idempotent-replayed", b"true")],
+    })
+    await send({"type": "http.response.body", "body": entry.body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware honoring the ``Idempotency-Key`` request header."""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store if store is not None else idempotency_store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+        key = None
+        for name, value in scope["headers"]:
+            if name == b"idempotency-key":
+                key = value.decode("latin-1")
+                break
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        # The start of the body is read up front to fingerprint it, then
+        # handed to the app ahead of the rest, which is not buffered here
+        # (catalog uploads stream to disk)
+        chunks = []
+        read = 0
+        more_body = True
+        while more_body and read < MAX_HASHED_BODY:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            read += len(chunks[-1])
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        digest = hashlib.sha256(body)
+        if more_body:
+            # Longer bodies are told apart by their start and their length
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    digest.update(b"\0" + value)
+        fingerprint = digest.hexdigest()
+        store = self.store
+        query = scope.get("query_string", b"").decode("latin-1")
+        scoped_key = f"{scope['method']} {scope['path']}?{query} {key}"
+
+        while True:
+            entry, owner = store.claim(scoped_key, fingerprint)
+            if owner:
+                break
+            await entry.done.wait()
+            if entry.status is not None:
+                if entry.fingerprint != fingerprint:
+                    await _send_json(send, 422, "Idempotency-Key was used with a different request body")
+                    return
+                store.replays += 1
+                await _replay(send, entry)
+                return
+            # The first request failed and released the key: claim it again
+
+        body_sent = False
+
+        async def receive_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            return await receive()
+
+        status = None
+        headers: List[Tuple[bytes, bytes]] = []
+        response_body = []
+        response_length = 0
+        response_digest = hashlib.sha256()
+        finished = False
+
+        async def capture(message):
+            nonlocal status, headers, response_length, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response_length += len(chunk)
+                response_digest.update(chunk)
+                if response_length <= MAX_STORED_BODY:
+                    response_body.append(chunk)
+                else:
+                    response_body.clear()
+                finished = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, capture)
+        finally:
+            # Kept even if sending failed: a client that gave up may be gone
+            # by the time the response is sent, but the write is done and
+            # its retry must get the replay
+            if finished and status < 500:
+                entry.status = status
+                entry.headers = headers
+                entry.body = b"".join(response_body) if response_length <= MAX_STORED_BODY else None
+                entry.body_length = response_length
+                entry.body_digest = response_digest.hexdigest()
+                store.complete(entry)
+            else:
+                store.release(scoped_key, entry)
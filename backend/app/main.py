@@ -5,8 +5,14 @@ from temporalio.client import Client
 from temporalio.worker import Worker
 import asyncio
 import os
-from .database import init_db
-from .routers import products, inventory, invoices, health, auth
+from .database import init_db, ReadSessionLocal
+from .migrations import run_migrations
+from .write_queue import write_queue
+from .catalog_index import catalog_index
+from .copurchase_index import copurchase_index
+from .idempotency import IdempotencyMiddleware
+from .forecasting import FORECAST_INTERVAL_HOURS, forecast_schedule
+from .routers import products, inventory, invoices, reports, health, auth
 from .workflows.auth_workflow import SignInWorkflow, VerifyOTPWorkflow
 from .activities.auth_activities import (
     validate_email_activity,
@@ -20,6 +26,8 @@ from .activities.auth_activities import (
 load_dotenv()
 app = FastAPI(title="Simple POS API")
 
+# Retried POSTs carrying an Idempotency-Key replay the stored response
+app.add_middleware(IdempotencyMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -34,6 +42,7 @@ app.add_middleware(
 app.include_router(products.router)
 app.include_router(inventory.router)
 app.include_router(invoices.router)
+app.include_router(reports.router)
 app.include_router(health.router)
 app.include_router(auth.router)
 
@@ -72,6 +81,17 @@ async def init_temporal_worker():
 async def startup_event():
     try:
         await init_db()
+        applied = await run_migrations()
+        if applied:
+            print(f"Applied database migrations: {applied}")
+        await catalog_index.load(ReadSessionLocal)
+        print(f"Catalog index loaded: {len(catalog_index)} products")
+        # Reads every invoice line, so it is built in the background;
+        # recommendations are empty until it is ready
+        app.state.copurchase_task = asyncio.create_task(copurchase_index.load(ReadSessionLocal))
+        if FORECAST_INTERVAL_HOURS > 0:
+            # Reorder points for /inventory/restock, recomputed in the background
+            app.state.forecast_task = asyncio.create_task(forecast_schedule(ReadSessionLocal))
         print("Database initialized successfully")
         if os.getenv("ENV", "DEV") == "DEV":
             # Initialize Temporal worker
@@ -80,6 +100,15 @@ async def startup_event():
         print(f"Startup error: {e}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("forecast_task", "copurchase_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    # Let queued checkouts commit before the process exits
+    await write_queue.stop()
+
 @app.get("/")
 async def root():
     return {
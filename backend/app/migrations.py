@@ -0,0 +1,198 @@
+"""Versioned schema migrations applied at startup.
+
+``Base.metadata.create_all`` only creates missing tables and never alters
+existing ones, so anything that has to reach databases created by an older
+release (indexes, columns, triggers) is added here as a numbered migration.
+Each migration runs once, inside the startup transaction, and is recorded in
+``schema_migrations``.
+
+A migration step is either a SQL string or a callable taking the connection.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .database import engine
+from .rollups import INVOICE_DAY, INVOICE_HOUR, rebuild_rollups
+
+Step = Union[str, Callable[[Connection], None]]
+
+
+def add_column(table: str, column: str, definition: str) -> Step:
+    """Step adding ``column`` unless ``create_all`` already created it."""
+    def step(conn: Connection) -> None:
+        columns = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "indexes for hot router queries", [
+        # inventory history: WHERE product_id = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS ix_inventory_records_product_created "
+        "ON inventory_records (product_id, created_at DESC)",
+        # invoice items loaded per invoice (selectinload)
+        "CREATE INDEX IF NOT EXISTS ix_invoice_items_invoice_id "
+        "ON invoice_items (invoice_id)",
+        # invoice list ordered by date
+        "CREATE INDEX IF NOT EXISTS ix_invoices_created_at "
+        "ON invoices (created_at)",
+        # OTP verification: latest unused, unexpired attempt of a user
+        "CREATE INDEX IF NOT EXISTS ix_otp_attempts_user_used_expires "
+        "ON otp_attempts (user_id, used, expires_at)",
+    ]),
+    (2, "products_fts full-text index", [
+        # unicode61 folds the combining diacritics; "đ" has no decomposition
+        # so the triggers map it to "d" themselves. rowid is the product id.
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "code, name, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts (rowid, code, name) "
+        "VALUES (NEW.id, NEW.code, replace(replace(NEW.name, 'đ', 'd'), 'Đ', 'D')); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF code, name ON products BEGIN "
+        "DELETE FROM products_fts WHERE rowid = OLD.id; "
+        "INSERT INTO products_fts (rowid, code, name) "
+        "VALUES (NEW.id, NEW.code, replace(replace(NEW.name, 'đ', 'd'), 'Đ', 'D')); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+        "DELETE FROM products_fts WHERE rowid = OLD.id; "
+        "END",
+        "INSERT INTO products_fts (rowid, code, name) "
+        "SELECT id, code, replace(replace(name, 'đ', 'd'), 'Đ', 'D') FROM products",
+    ]),
+    (3, "keyset index for inventory history", [
+        # Walked backwards, (product_id, created_at) plus the implicit rowid
+        # serves ORDER BY created_at DESC, id DESC and the (created_at, id)
+        # cursor comparison; the DESC index of version 1 cannot do the id part.
+        "DROP INDEX IF EXISTS ix_inventory_records_product_created",
+        "CREATE INDEX IF NOT EXISTS ix_inventory_records_product_created_at "
+        "ON inventory_records (product_id, created_at)",
+    ]),
+    (4, "catalog change sequence for delta sync", [
+        add_column("products", "change_seq", "INTEGER NOT NULL DEFAULT 0"),
+        "CREATE INDEX IF NOT EXISTS ix_products_change_seq ON products (change_seq)",
+        "CREATE INDEX IF NOT EXISTS ix_products_updated_at ON products (updated_at)",
+        # A fresh epoch per database: cursors issued by another database (or
+        # before a restore) no longer match and force a full resync.
+        "INSERT OR IGNORE INTO catalog_sync_state (id, seq, epoch) "
+        "VALUES (1, 0, lower(hex(randomblob(8))))",
+        # Existing products become the first changes, in id order
+        "UPDATE products SET change_seq = id",
+        "UPDATE catalog_sync_state SET seq = (SELECT COALESCE(MAX(id), 0) FROM products) WHERE id = 1",
+        # Every write to products takes the next sequence number. The WHEN
+        # clause keeps the trigger's own UPDATE from firing it again.
+        "CREATE TRIGGER IF NOT EXISTS products_change_seq_insert AFTER INSERT ON products BEGIN "
+        "UPDATE catalog_sync_state SET seq = seq + 1 WHERE id = 1; "
+        "UPDATE products SET change_seq = (SELECT seq FROM catalog_sync_state WHERE id = 1) "
+        "WHERE id = NEW.id; "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS products_change_seq_update AFTER UPDATE ON products "
+        "WHEN NEW.change_seq = OLD.change_seq BEGIN "
+        "UPDATE catalog_sync_state SET seq = seq + 1 WHERE id = 1; "
+        "UPDATE products SET change_seq = (SELECT seq FROM catalog_sync_state WHERE id = 1) "
+        "WHERE id = NEW.id; "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS products_change_seq_delete AFTER DELETE ON products BEGIN "
+        "UPDATE catalog_sync_state SET seq = seq + 1 WHERE id = 1; "
+        "INSERT INTO product_tombstones (change_seq, product_id, code, deleted_at) "
+        "SELECT seq, OLD.id, OLD.code, CURRENT_TIMESTAMP FROM catalog_sync_state WHERE id = 1; "
+        "END",
+    ]),
+    (5, "per-day invoice number sequences", [
+        # Continue each day's numbering after the invoices that already exist
+        "INSERT INTO invoice_sequences (store_id, day, last_value) "
+        "SELECT 0, substr(invoice_number, 5, 8), MAX(CAST(substr(invoice_number, 14) AS INTEGER)) "
+        "FROM invoices WHERE invoice_number LIKE 'INV-________-%' GROUP BY substr(invoice_number, 5, 8) "
+        "ON CONFLICT (store_id, day) DO UPDATE SET last_value = MAX(last_value, excluded.last_value)",
+    ]),
+    (6, "client transaction id of offline sales", [
+        add_column("invoices", "client_txn_id", "VARCHAR(36)"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_invoices_client_txn_id ON invoices (client_txn_id)",
+    ]),
+    (7, "stock ledger by date", [
+        # Date-range exports of the ledger across all products
+        "CREATE INDEX IF NOT EXISTS ix_inventory_records_created_at ON inventory_records (created_at)",
+    ]),
+    (8, "sales rollups", [
+        # Each sale is added to the rollups in its own transaction (see
+        # app/rollups.py). Lines find their day through their invoice, which
+        # is always inserted first.
+        "CREATE TRIGGER IF NOT EXISTS sales_rollup_invoice AFTER INSERT ON invoices BEGIN "
+        "INSERT INTO sales_daily (day, invoice_count, units, revenue) "
+        f"VALUES ({INVOICE_DAY.format('NEW.')}, 1, 0, COALESCE(NEW.total_amount, 0)) "
+        "ON CONFLICT (day) DO UPDATE SET invoice_count = invoice_count + 1, "
+        "revenue = revenue + excluded.revenue; "
+        "INSERT INTO sales_hourly (day, hour, invoice_count, revenue) "
+        f"VALUES ({INVOICE_DAY.format('NEW.')}, {INVOICE_HOUR.format('NEW.')}, 1, COALESCE(NEW.total_amount, 0)) "
+        "ON CONFLICT (day, hour) DO UPDATE SET invoice_count = invoice_count + 1, "
+        "revenue = revenue + excluded.revenue; "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS sales_rollup_item AFTER INSERT ON invoice_items BEGIN "
+        "INSERT INTO product_sales_daily (day, product_id, quantity, revenue) "
+        f"SELECT {INVOICE_DAY.format('')}, NEW.product_id, NEW.quantity, NEW.total_price "
+        "FROM invoices WHERE id = NEW.invoice_id "
+        "ON CONFLICT (day, product_id) DO UPDATE SET quantity = quantity + excluded.quantity, "
+        "revenue = revenue + excluded.revenue; "
+        "INSERT INTO product_sales_monthly (month, product_id, quantity, revenue) "
+        f"SELECT date({INVOICE_DAY.format('')}, 'start of month'), NEW.product_id, NEW.quantity, NEW.total_price "
+        "FROM invoices WHERE id = NEW.invoice_id "
+        "ON CONFLICT (month, product_id) DO UPDATE SET quantity = quantity + excluded.quantity, "
+        "revenue = revenue + excluded.revenue; "
+        "UPDATE sales_daily SET units = units + NEW.quantity "
+        f"WHERE day = (SELECT {INVOICE_DAY.format('')} FROM invoices WHERE id = NEW.invoice_id); "
+        "END",
+        # Backfill from the invoices already recorded
+        rebuild_rollups,
+    ]),
+    (9, "catalog version of the snapshot", [
+        # Counts changes to what a terminal's catalog is made of: products
+        # added, removed, renamed or repriced, but not stock movements, which
+        # the change sequence also counts and every sale makes
+        add_column("catalog_sync_state", "catalog_seq", "INTEGER NOT NULL DEFAULT 0"),
+        "CREATE TRIGGER IF NOT EXISTS products_catalog_seq_insert AFTER INSERT ON products BEGIN "
+        "UPDATE catalog_sync_state SET catalog_seq = catalog_seq + 1 WHERE id = 1; "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS products_catalog_seq_update AFTER UPDATE OF code, name, price ON products "
+        "WHEN OLD.code IS NOT NEW.code OR OLD.name IS NOT NEW.name OR OLD.price IS NOT NEW.price BEGIN "
+        "UPDATE catalog_sync_state SET catalog_seq = catalog_seq + 1 WHERE id = 1; "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS products_catalog_seq_delete AFTER DELETE ON products BEGIN "
+        "UPDATE catalog_sync_state SET catalog_seq = catalog_seq + 1 WHERE id = 1; "
+        "END",
+    ]),
+]
+
+
+def apply_migrations(conn: Connection) -> List[int]:
+    """Apply pending migrations on ``conn`` and return the versions applied."""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    newly_applied = []
+    for version, name, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.exec_driver_sql(step)
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+            {"v": version, "n": name, "t": datetime.utcnow()}
+        )
+        newly_applied.append(version)
+    return newly_applied
+
+
+async def run_migrations(target: AsyncEngine = engine) -> List[int]:
+    async with target.begin() as conn:
+        return await conn.run_sync(apply_migrations)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import uuid
@@ -39,11 +39,32 @@ class Product(Base):
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Catalog change sequence, stamped by triggers on every insert/update (see migrations)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0", index=True)
 
     inventory_records = relationship("InventoryRecord", back_populates="product")
     invoice_items = relationship("InvoiceItem", back_populates="product")
 
+class ProductTombstone(Base):
+    """A deleted product, kept so offline terminals can sync the deletion."""
+    __tablename__ = "product_tombstones"
+
+    change_seq = Column(Integer, primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    code = Column(String(50), nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+class CatalogSyncState(Base):
+    """Single row holding the catalog change counters."""
+    __tablename__ = "catalog_sync_state"
+
+    id = Column(Integer, primary_key=True)
+    seq = Column(Integer, nullable=False, default=0)
+    # Bumped only by changes to code, name or price and by inserts and deletes
+    catalog_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    epoch = Column(String(32), nullable=False)  # changes if the catalog is rebuilt from scratch
+
 class InventoryRecord(Base):
     __tablename__ = "inventory_records"
     
@@ -60,11 +81,21 @@ class Invoice(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String(50), unique=True, index=True)
+    # UUID a terminal gives a sale made offline, so a replayed sale is recorded once
+    client_txn_id = Column(String(36), unique=True, index=True, nullable=True)
     total_amount = Column(Float, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     items = relationship("InvoiceItem", back_populates="invoice", lazy="selectin")
 
+class InvoiceSequence(Base):
+    """Last invoice number handed out per store and day (INV-YYYYMMDD-XXXX)."""
+    __tablename__ = "invoice_sequences"
+
+    store_id = Column(Integer, primary_key=True, default=0)  # 0 until stores exist
+    day = Column(String(8), primary_key=True)  # YYYYMMDD
+    last_value = Column(Integer, nullable=False, default=0)
+
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
     
@@ -77,3 +108,50 @@ class InvoiceItem(Base):
     
     invoice = relationship("Invoice", back_populates="items")
     product = relationship("Product", back_populates="invoice_items")
+
+class SalesDaily(Base):
+    """Sales per day, kept up to date by triggers (see app/rollups.py)."""
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)  # server's local day
+    invoice_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class SalesHourly(Base):
+    """Sales per hour of each day, kept up to date by triggers."""
+    __tablename__ = "sales_hourly"
+
+    day = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)  # 0-23, local time
+    invoice_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class ProductSalesDaily(Base):
+    """Units and revenue of each product per day, kept up to date by triggers."""
+    __tablename__ = "product_sales_daily"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)  # no foreign key: history outlives deleted products
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class ProductSalesMonthly(Base):
+    """Per-product totals of whole months, so long ranges read a row per
+    product and month instead of per day."""
+    __tablename__ = "product_sales_monthly"
+
+    month = Column(Date, primary_key=True)  # first day of the month
+    product_id = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class RestockPlan(Base):
+    """Reorder point of a product from its demand forecast (app/forecasting.py)."""
+    __tablename__ = "restock_plans"
+
+    product_id = Column(Integer, primary_key=True)
+    daily_demand = Column(Float, nullable=False)  # forecast units per day over the next week
+    reorder_point = Column(Integer, nullable=False)  # restock once stock is at or below this
+    order_up_to = Column(Integer, nullable=False)  # stock an order should bring the product to
+    computed_at = Column(DateTime, nullable=False)
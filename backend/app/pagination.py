@@ -0,0 +1,137 @@
+"""Shared pagination for the list endpoints.
+
+Totals come from ``SELECT COUNT(*)`` over the filtered statement, optionally
+served from a short-lived cache when an approximate number is good enough
+(paging through a year of invoices does not need an exact total per page).
+
+Besides the ``page``/``limit`` OFFSET pages, every list can be walked with
+an opaque cursor: the ordering key of the last row of a page, encoded as
+URL-safe base64 JSON. The next page is then ``WHERE key < cursor`` on an
+index instead of reading and discarding every earlier row.
+"""
+import base64
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+COUNT_CACHE_TTL = float(os.getenv("PAGINATION_COUNT_TTL", "30"))
+COUNT_CACHE_SIZE = 1024
+# Largest page a list endpoint returns
+MAX_PAGE_SIZE = 100
+
+_count_cache: Dict[Tuple, Tuple[float, int]] = {}
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the ordering key of a row as an opaque cursor."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> List[Any]:
+    """Decode a cursor back into values for the ``keys`` columns.
+
+    Raises a 400 for anything that was not produced by ``encode_cursor``
+    for the same ordering.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value) if key.type.python_type is datetime else key.type.python_type(value)
+            for key, value in zip(keys, values)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def count_statement(stmt: Select) -> Select:
+    """``SELECT COUNT(*)`` over the rows of ``stmt``."""
+    return stmt.order_by(None).with_only_columns(func.count(), maintain_column_froms=True)
+
+
+def page_statement(
+    stmt: Select,
+    keys: Sequence,
+    page: int = 1,
+    limit: int = 10,
+    after: Optional[Sequence[Any]] = None,
+    descending: bool = False,
+) -> Select:
+    """One page of ``stmt`` in ``keys`` order: the rows past the key values
+    ``after`` (a decoded cursor) if given, else page ``page``."""
+    if after is not None:
+        key, last = tuple_(*keys), tuple_(*after)
+        stmt = stmt.where(key < last if descending else key > last)
+    else:
+        stmt = stmt.offset((page - 1) * limit)
+    return stmt.order_by(*(key.desc() if descending else key for key in keys)).limit(limit)
+
+
+async def count(db: AsyncSession, stmt: Select, approximate: bool = False) -> int:
+    """Number of rows ``stmt`` returns, computed by the database.
+
+    With ``approximate`` the result may be up to ``PAGINATION_COUNT_TTL``
+    seconds old.
+    """
+    count_stmt = count_statement(stmt)
+    if not approximate:
+        return await db.scalar(count_stmt)
+
+    compiled = count_stmt.compile(db.bind)
+    key = (str(compiled), tuple(sorted(compiled.params.items())))
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    total = await db.scalar(count_stmt)
+    if len(_count_cache) >= COUNT_CACHE_SIZE:
+        _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    keys: Sequence,
+    page: int = 1,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    approximate: bool = False,
+    options: Sequence = (),
+    rows: bool = False,
+) -> dict:
+    """Return ``{"total", "items", "next_cursor"}`` for one page of ``stmt``.
+
+    ``keys`` is the unique ordering of the list, e.g. ``(created_at, id)``;
+    it should match an index so that both the ORDER BY and the cursor
+    comparison are index range scans. A cursor takes precedence over
+    ``page``. ``options`` are loader options for the page query only.
+    With ``rows`` the items are the selected columns as plain rows rather
+    than ORM objects; the ``keys`` must then be among them.
+    """
+    total = await count(db, stmt, approximate)
+
+    after = decode_cursor(cursor, keys) if cursor else None
+    result = await db.execute(
+        page_statement(stmt, keys, page, limit, after, descending).options(*options)
+    )
+    items = result.all() if rows else result.scalars().all()
+
+    next_cursor = None
+    if items and len(items) == limit:
+        next_cursor = encode_cursor([getattr(items[-1], key.key) for key in keys])
+    return {"total": total, "items": items, "next_cursor": next_cursor}
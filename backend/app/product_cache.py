@@ -0,0 +1,74 @@
+"""Bounded LRU of products by exact code, for barcode scans.
+
+Entries are the product's JSON response body, serialized once, so a hit is
+a dictionary lookup and no ORM or pydantic work. The write paths invalidate
+entries after they commit: product create/update, bulk imports and stock
+movements (inventory records and checkout).
+
+A lookup that misses reads the database and then fills the cache. An
+invalidation can land between that read and the fill, so fills carry the
+cache generation observed before the read and are dropped if it moved.
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import schemas
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+
+
+class ProductCache:
+    def __init__(self, max_size: int = PRODUCT_CACHE_SIZE):
+        self.max_size = max_size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+        self._codes: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, code: str) -> Optional[bytes]:
+        entry = self._entries.get(code)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(code)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, product, generation: int) -> bytes:
+        """Serialize ``product`` and cache it unless an invalidation happened
+        after ``generation`` was read. Returns the serialized body."""
+        body = schemas.Product.model_validate(product).model_dump_json().encode()
+        if generation == self.generation:
+            self._entries[product.code] = (product.id, body)
+            self._entries.move_to_end(product.code)
+            self._codes[product.id] = product.code
+            while len(self._entries) > self.max_size:
+                _, (product_id, _) = self._entries.popitem(last=False)
+                self._codes.pop(product_id, None)
+        return body
+
+    def invalidate(self, product_ids: Iterable[int] = (), codes: Iterable[str] = ()) -> None:
+        """Drop the given products, by id (any code they were cached under)
+        or by code."""
+        self.generation += 1
+        for product_id in product_ids:
+            code = self._codes.pop(product_id, None)
+            if code is not None:
+                self._entries.pop(code, None)
+        for code in codes:
+            entry = self._entries.pop(code, None)
+            if entry is not None:
+                self._codes.pop(entry[0], None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._codes.clear()
+
+
+product_cache = ProductCache()
@@ -0,0 +1,381 @@
+"""Chunked bulk upsert of products, from JSON or from uploaded CSV/XLSX files.
+
+Rows are validated one by one, then written in chunks of multi-row
+``INSERT ... ON CONFLICT(code) DO UPDATE ... RETURNING`` statements, each
+chunk one unit of the writer queue. An existing code updates the product's
+name, price and, when the row has one, quantity (recorded in the stock
+ledger) instead of aborting the import. A row without a quantity leaves
+the stock as it is. Bad rows end up in the report with their row number
+rather than failing the whole file.
+"""
+import csv
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache, partial
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import DateTime, bindparam, insert, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.selectable import TextualSelect
+
+from . import models, schemas
+from .analytics import analytics_cache
+from .catalog_index import catalog_index
+from .product_cache import product_cache
+from .write_queue import write_queue
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", "500"))
+# SQLite allows 32766 bound parameters per statement, four per product row
+MAX_CHUNK_SIZE = 8000
+MAX_REPORTED_ERRORS = 1000
+# Ledger note of the stock changes an import makes to existing products
+IMPORT_NOTES = "Catalog import"
+
+products = models.Product.__table__
+# Columns read back from the upsert; change_seq is stamped by a trigger afterwards
+RETURNED = [
+    products.c[name] for name in ("id", "code", "name", "price", "quantity", "created_at", "updated_at")
+]
+
+
+@lru_cache(maxsize=64)
+def upsert_statement(rows: int, set_quantity: bool = True, update_existing: bool = True) -> TextualSelect:
+    """Multi-row upsert for ``rows`` products, cached per shape.
+
+    Written as SQL text: a ``values()`` list makes SQLAlchemy compile a new
+    statement for every chunk, which costs more than the INSERT itself.
+    Without ``set_quantity`` new products start at 0 and existing ones keep
+    their stock; without ``update_existing`` an existing code is an error.
+    """
+    quantity = "quantity_{i}" if set_quantity else "zero"
+    values = ", ".join(
+        f"(:code_{i}, :name_{i}, :price_{i}, :{quantity.format(i=i)}, :now, :now)" for i in range(rows)
+    )
+    on_conflict = ""
+    if update_existing:
+        on_conflict = (
+            "ON CONFLICT (code) DO UPDATE SET name = excluded.name, price = excluded.price, "
+            + ("quantity = excluded.quantity, " if set_quantity else "")
+            + "updated_at = excluded.updated_at "
+        )
+    stmt = text(
+        "INSERT INTO products (code, name, price, quantity, created_at, updated_at) "
+        f"VALUES {values} {on_conflict}"
+        f"RETURNING {', '.join(column.name for column in RETURNED)}"
+    ).bindparams(bindparam("now", type_=DateTime)).columns(*RETURNED)
+    if not set_quantity:
+        stmt = stmt.bindparams(zero=0)
+    return stmt
+
+
+def upsert_params(rows: List[Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+    params = {"now": now}
+    for i, row in enumerate(rows):
+        params[f"code_{i}"] = row["code"]
+        params[f"name_{i}"] = row["name"]
+        params[f"price_{i}"] = row["price"]
+        if row["quantity"] is not None:
+            params[f"quantity_{i}"] = row["quantity"]
+    return params
+
+
+async def _upsert(db: AsyncSession, rows: List[Dict[str, Any]], now: datetime, update_existing: bool) -> List:
+    """Upsert ``rows`` and write a ledger entry for every stock level an
+    update changed. Rows without a quantity leave the stock as it is."""
+    codes = {row["code"] for row in rows if row["quantity"] is not None}
+    stock = {}
+    if codes and update_existing:
+        result = await db.execute(
+            select(models.Product.code, models.Product.quantity).where(models.Product.code.in_(codes))
+        )
+        stock = dict(result.all())
+
+    upserted = []
+    # Consecutive rows of the same kind share a statement, so a code
+    # repeated in the chunk is still applied in row order
+    for set_quantity, group in groupby(rows, key=lambda row: row["quantity"] is not None):
+        group = list(group)
+        result = await db.execute(
+            upsert_statement(len(group), set_quantity, update_existing), upsert_params(group, now)
+        )
+        upserted.extend(result.all())
+
+    moves = []
+    for row in upserted:
+        if row.code in stock and row.quantity != stock[row.code]:
+            moves.append({
+                "product_id": row.id,
+                "quantity_change": row.quantity - stock[row.code],
+                "notes": IMPORT_NOTES,
+            })
+        if row.code in stock or row.code in codes:
+            stock[row.code] = row.quantity
+    if moves:
+        await db.execute(insert(models.InventoryRecord), moves)
+    return upserted
+
+
+async def upsert_chunk(
+    db: AsyncSession,
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    update_existing: bool = True
+) -> Tuple[List, List[schemas.BulkImportError]]:
+    """Write unit for one chunk of ``(row number, product values)`` pairs.
+
+    Returns the upserted product rows and the rows that failed. When the
+    multi-row statement fails, the chunk is retried row by row so a single
+    bad row only costs itself.
+    """
+    now = datetime.utcnow()
+    rows = [row for _, row in chunk]
+    try:
+        async with db.begin_nested():
+            return await _upsert(db, rows, now, update_existing), []
+    except IntegrityError:
+        pass
+
+    upserted, errors = [], []
+    for number, row in chunk:
+        try:
+            async with db.begin_nested():
+                upserted.extend(await _upsert(db, [row], now, update_existing))
+        except IntegrityError as error:
+            errors.append(schemas.BulkImportError(row=number, code=row["code"], error=str(error.orig)))
+    return upserted, errors
+
+
+def report_errors(report: schemas.BulkImportReport, errors: Iterable[schemas.BulkImportError]) -> None:
+    """Count every error but keep only the first ``MAX_REPORTED_ERRORS``."""
+    for error in errors:
+        report.error_count += 1
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(error)
+
+
+def validate_rows(
+    rows: Iterable[Tuple[int, Dict[str, Any]]],
+    report: schemas.BulkImportReport,
+    seen: Optional[set]
+) -> Iterable[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(row number, values)`` for valid rows, reporting the others.
+
+    With a ``seen`` set, a code that already appeared earlier in the same
+    import is reported as a duplicate and the first occurrence wins.
+    Without one, a repeated code simply updates the product again.
+    """
+    for number, row in rows:
+        try:
+            product = schemas.ProductCreate.model_validate(row)
+        except ValidationError as error:
+            detail = "; ".join(
+                f"{'.'.join(map(str, item['loc'])) or 'row'}: {item['msg']}" for item in error.errors()
+            )
+            code = row.get("code") if isinstance(row, dict) else None
+            report_errors(report, [schemas.BulkImportError(row=number, code=code, error=detail)])
+            continue
+        if seen is not None:
+            if product.code in seen:
+                report_errors(report, [schemas.BulkImportError(
+                    row=number, code=product.code, error=f"Duplicate product code {product.code} found."
+                )])
+                continue
+            seen.add(product.code)
+        values = product.model_dump()
+        if "quantity" not in product.model_fields_set:
+            values["quantity"] = None  # keep the stock of an existing product
+        yield number, values
+
+
+async def upsert_products(
+    rows: Iterable[Tuple[int, Dict[str, Any]]],
+    chunk_size: Optional[int] = None,
+    items: Optional[List] = None,
+    report: Optional[schemas.BulkImportReport] = None,
+    unique_codes: bool = True,
+    update_existing: bool = True,
+) -> schemas.BulkImportReport:
+    """Validate and upsert ``(row number, values)`` pairs chunk by chunk.
+
+    ``rows`` may be a generator, so a file is never held in memory as a
+    whole. Upserted product rows are appended to ``items`` when given.
+    Progress accumulates in ``report``, which can be polled while running.
+    ``unique_codes=False`` skips remembering every code of the import, for
+    inputs too large for that; a repeated code then updates the product.
+    ``update_existing=False`` reports a code that already exists as an
+    error instead of updating the product.
+    """
+    chunk_size = min(chunk_size or DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE)
+    report = report or schemas.BulkImportReport()
+    seen = set() if unique_codes else None
+
+    async def flush(chunk):
+        upserted, errors = await write_queue.submit(
+            partial(upsert_chunk, chunk=chunk, update_existing=update_existing)
+        )
+        # Rows keep their created_at on update, so a fresh one means inserted;
+        # a code repeated within the chunk returns the same id twice
+        inserted = len({row.id for row in upserted if row.created_at == row.updated_at})
+        report.inserted += inserted
+        report.updated += len(upserted) - inserted
+        report_errors(report, errors)
+        catalog_index.upsert_many(upserted)
+        product_cache.invalidate(product_ids=[row.id for row in upserted])
+        analytics_cache.invalidate()
+        if items is not None:
+            items.extend(upserted)
+
+    chunk = []
+    for number, row in validate_rows(rows, report, seen):
+        chunk.append((number, row))
+        if len(chunk) >= chunk_size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    return report
+
+
+# File imports
+#
+# An uploaded catalog is copied to a temporary file during the request and
+# imported by a background job. Rows are read from disk one at a time, so
+# memory use depends on the chunk size, not on the file size.
+
+REQUIRED_HEADERS = ("code", "name", "price", "quantity")
+MAX_IMPORT_JOBS = 100
+
+import_jobs: "OrderedDict[str, schemas.ImportJob]" = OrderedDict()
+
+
+def file_kind(filename: Optional[str]) -> str:
+    suffix = os.path.splitext(filename or "")[1].lower()
+    if suffix in ("", ".csv", ".txt"):
+        return "csv"
+    if suffix == ".xlsx":
+        return "xlsx"
+    raise HTTPException(status_code=400, detail="Only CSV and XLSX files can be imported.")
+
+
+async def save_upload(upload: UploadFile) -> Tuple[str, str]:
+    """Copy an upload to a temporary file and check its header row.
+
+    Returns the path and file kind; the caller owns (and deletes) the file.
+    """
+    kind = file_kind(upload.filename)
+    fd, path = tempfile.mkstemp(prefix="product-import-", suffix=f".{kind}")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            await run_in_threadpool(shutil.copyfileobj, upload.file, out, 1 << 20)
+        header = await run_in_threadpool(read_header, path, kind)
+    except BaseException:
+        os.unlink(path)
+        raise
+    if header is None:
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=f"{kind.upper()} file is empty.")
+    if not set(REQUIRED_HEADERS) <= set(header):
+        os.unlink(path)
+        raise HTTPException(status_code=400, detail=f"{kind.upper()} file is missing required headers.")
+    return path, kind
+
+
+def _header(values) -> List[str]:
+    return [str(value).strip().lower() if value is not None else "" for value in values]
+
+
+def read_header(path: str, kind: str) -> Optional[List[str]]:
+    """Normalized header row of the file, or None when it has no rows."""
+    if os.path.getsize(path) == 0:
+        return None
+    for _, header, _ in _file_rows(path, kind):
+        return header
+    return None
+
+
+def _file_rows(path: str, kind: str) -> Iterator[Tuple[int, List[str], Sequence]]:
+    """Yield ``(row number, header, values)`` for every row after the header."""
+    if kind == "xlsx":
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise HTTPException(status_code=400, detail="XLSX import needs openpyxl installed on the server.")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = _header(next(rows, ()))
+            if not any(header):
+                return
+            yield 1, header, ()
+            for number, values in enumerate(rows, start=2):
+                yield number, header, values
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = csv.reader(f)
+            header = _header(next(rows, ()))
+            if not any(header):
+                return
+            yield 1, header, ()
+            for values in rows:
+                yield rows.line_num, header, values
+
+
+def _cell(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet numbers: 12345.0 -> "12345"
+    return str(value).strip() if value is not None else ""
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def file_rows(path: str, kind: str, job: schemas.ImportJob) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(row number, values)`` for the data rows of a catalog file.
+
+    Blank cells are left out of the row, so a blank quantity keeps the stock
+    of an existing product (and a new one starts at 0).
+    """
+    for number, header, values in _file_rows(path, kind):
+        if number == 1 or all(_blank(value) for value in values):
+            continue
+        job.rows_read += 1
+        row = {}
+        for column, value in zip(header, values):
+            if column in REQUIRED_HEADERS and not _blank(value):
+                row[column] = _cell(value) if column in ("code", "name") else value
+        yield number, row
+
+
+def create_job(filename: str) -> schemas.ImportJob:
+    job = schemas.ImportJob(job_id=uuid4().hex, filename=filename, created_at=datetime.utcnow())
+    import_jobs[job.job_id] = job
+    while len(import_jobs) > MAX_IMPORT_JOBS:
+        import_jobs.popitem(last=False)
+    return job
+
+
+async def run_import(job: schemas.ImportJob, path: str, kind: str, chunk_size: Optional[int] = None) -> None:
+    """Background task importing a saved catalog file into ``job``."""
+    job.status = schemas.ImportJobStatus.RUNNING
+    try:
+        await upsert_products(
+            file_rows(path, kind, job), chunk_size=chunk_size, report=job.report, unique_codes=False
+        )
+        job.status = schemas.ImportJobStatus.COMPLETED
+    except Exception as error:
+        job.status = schemas.ImportJobStatus.FAILED
+        job.detail = getattr(error, "detail", None) or str(error)
+    finally:
+        job.finished_at = datetime.utcnow()
+        os.unlink(path)
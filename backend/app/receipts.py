@@ -0,0 +1,182 @@
+"""Rendered receipts (the invoice print page), cached by invoice id.
+
+An invoice does not change once recorded, so its receipt is rendered once
+and reprints come from a bounded LRU of the rendered HTML. Receipts are
+warmed in the background after checkout, and printed as they were first
+rendered (product code and name included).
+
+Thermal printers get ESC/POS bytes instead (``utils.escpos``), cached the
+same way per invoice, paper width and mode; raster receipts are drawn in
+the threadpool.
+
+Batch printing streams one document of many receipts: Jinja's
+``generate()`` (through a buffered ``stream()``) runs in a worker thread (StreamingResponse iterates sync
+iterators in the threadpool), and pulls receipts chunk by chunk; the
+database reads of each chunk are sent back to the event loop.
+"""
+import os
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterator, List, Tuple
+
+from anyio import from_thread
+from fastapi import HTTPException
+from jinja2 import Environment, PackageLoader, select_autoescape
+from markupsafe import Markup
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
+
+from . import models, schemas
+from .utils.escpos import ReceiptFontError, render_raster, render_text
+
+# (invoice number, receipt HTML)
+Receipt = Tuple[str, Markup]
+
+RECEIPT_CACHE_SIZE = int(os.getenv("RECEIPT_CACHE_SIZE", "2000"))
+RECEIPT_BATCH_CHUNK = 25
+ESCPOS_PAPER = int(os.getenv("ESCPOS_PAPER", "80"))  # mm, warmed after checkout
+
+env = Environment(
+    loader=PackageLoader("app", "templates"),
+    autoescape=select_autoescape(['html', 'xml'])
+)
+
+
+def render_receipt(invoice: models.Invoice) -> Receipt:
+    """The receipt of ``invoice``; items and their products must be loaded."""
+    return invoice.invoice_number, Markup(env.get_template("_receipt.html").render(invoice=invoice))
+
+
+class ReceiptCache:
+    def __init__(self, max_size: int = RECEIPT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        receipt = self._entries.get(key)
+        if receipt is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return receipt
+
+    def put_many(self, receipts: Dict[Hashable, object]) -> None:
+        for key, receipt in receipts.items():
+            self._entries[key] = receipt
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+receipt_cache = ReceiptCache()
+# ESC/POS bytes by (invoice id, paper width, mode)
+escpos_cache = ReceiptCache()
+
+
+def _load_invoices(invoice_ids: List[int]):
+    return (
+        select(models.Invoice)
+        .where(models.Invoice.id.in_(invoice_ids))
+        .options(selectinload(models.Invoice.items).selectinload(models.InvoiceItem.product))
+    )
+
+
+async def load_uncached(db: AsyncSession, invoice_ids: List[int]) -> Tuple[Dict[int, Receipt], List[models.Invoice]]:
+    """Cached receipts of ``invoice_ids`` and the invoices of the others,
+    with items and products loaded for rendering."""
+    cached = {}
+    for invoice_id in invoice_ids:
+        receipt = receipt_cache.get(invoice_id)
+        if receipt is not None:
+            cached[invoice_id] = receipt
+    missing = [invoice_id for invoice_id in invoice_ids if invoice_id not in cached]
+    if not missing:
+        return cached, []
+    result = await db.execute(_load_invoices(missing))
+    return cached, list(result.scalars().all())
+
+
+async def get_receipts(db: AsyncSession, invoice_ids: List[int]) -> Dict[int, Receipt]:
+    """Receipts of ``invoice_ids`` that exist, rendering and caching the
+    ones not cached yet."""
+    receipts, invoices = await load_uncached(db, invoice_ids)
+    rendered = {invoice.id: render_receipt(invoice) for invoice in invoices}
+    receipt_cache.put_many(rendered)
+    receipts.update(rendered)
+    return receipts
+
+
+async def get_escpos(db: AsyncSession, invoice_id: int, paper: int, mode: schemas.EscposMode) -> bytes:
+    """ESC/POS bytes of an invoice's receipt; 404 if there is no such invoice."""
+    key = (invoice_id, paper, mode)
+    data = escpos_cache.get(key)
+    if data is not None:
+        return data
+    invoice = (await db.execute(_load_invoices([invoice_id]))).scalar_one_or_none()
+    if invoice is None:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    if mode == schemas.EscposMode.TEXT:
+        data = render_text(invoice, paper)
+    else:
+        try:
+            data = await run_in_threadpool(render_raster, invoice, paper)
+        except ImportError:
+            raise HTTPException(status_code=400, detail="Raster receipts need Pillow installed on the server.")
+        except ReceiptFontError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    escpos_cache.put_many({key: data})
+    return data
+
+
+async def warm_receipts(session_factory, invoice_ids: List[int]) -> None:
+    """Background task rendering the receipts of new invoices, as HTML and
+    as ESC/POS text for the default paper."""
+    async with session_factory() as db:
+        invoices = (await db.execute(_load_invoices(invoice_ids))).scalars().all()
+    receipt_cache.put_many({invoice.id: render_receipt(invoice) for invoice in invoices})
+    escpos_cache.put_many({
+        (invoice.id, ESCPOS_PAPER, schemas.EscposMode.TEXT): render_text(invoice, ESCPOS_PAPER)
+        for invoice in invoices
+    })
+
+
+def render_page(receipt: Receipt) -> str:
+    """The print page of a single receipt."""
+    invoice_number, html = receipt
+    return env.get_template("invoice_template.html").render(invoice_number=invoice_number, receipt=html)
+
+
+def _receipts_in_thread(db: AsyncSession, invoice_ids: List[int]) -> Iterator[Markup]:
+    for start in range(0, len(invoice_ids), RECEIPT_BATCH_CHUNK):
+        chunk = invoice_ids[start:start + RECEIPT_BATCH_CHUNK]
+        cached, invoices = from_thread.run(load_uncached, db, chunk)
+        rendered = {invoice.id: render_receipt(invoice) for invoice in invoices}
+        from_thread.run_sync(receipt_cache.put_many, rendered)
+        for invoice_id in chunk:
+            receipt = cached.get(invoice_id) or rendered.get(invoice_id)
+            if receipt is not None:
+                yield receipt[1]
+
+
+def receipt_document(db: AsyncSession, invoice_ids: List[int]) -> Iterator[str]:
+    """One printable document of the receipts of ``invoice_ids``, in order.
+
+    A sync iterator to be consumed from a worker thread (as StreamingResponse
+    does); ``db`` must stay open until it is exhausted.
+    """
+    stream = env.get_template("invoice_batch_template.html").stream(
+        receipts=_receipts_in_thread(db, invoice_ids), count=len(invoice_ids)
+    )
+    # generate() yields small fragments; each one sent is a thread hop
+    stream.enable_buffering(size=64)
+    return stream
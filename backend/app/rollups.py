@@ -0,0 +1,120 @@
+"""Sales rollups: totals by day, by hour of day and by product per day and
+per month.
+
+Triggers (migration 8) add every new invoice and invoice line to the rollups
+inside the transaction that records the sale, so a report reads a few rows
+per day (or month) of its range instead of scanning ``invoices`` and
+``invoice_items``, and a dashboard costs the same however long the history
+grows. Days and hours are the server's local time, like the day in invoice
+numbers.
+
+Invoices are never edited or deleted, so the triggers only handle inserts.
+``rebuild_rollups`` recomputes the rollups from the invoices; migration 8
+runs it as the backfill, and it can be run by hand after changing invoices
+outside the API, or after moving the server to another time zone:
+
+    python -m app.rollups [--since YYYY-MM-DD]
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Select
+
+from . import models
+
+# Local day and hour of an invoice's created_at (stored in UTC)
+INVOICE_DAY = "date({0}created_at, 'localtime')"
+INVOICE_HOUR = "CAST(strftime('%H', {0}created_at, 'localtime') AS INTEGER)"
+
+
+def local_midnight(day: date) -> datetime:
+    """Local midnight of ``day`` as naive UTC, like the stored created_at."""
+    return datetime.combine(day, time.min).astimezone(timezone.utc).replace(tzinfo=None)
+
+REBUILD_STEPS = [
+    "DELETE FROM sales_daily WHERE day >= :since",
+    "DELETE FROM sales_hourly WHERE day >= :since",
+    "DELETE FROM product_sales_daily WHERE day >= :since",
+    "DELETE FROM product_sales_monthly WHERE month >= date(:since, 'start of month')",
+    "INSERT INTO product_sales_daily (day, product_id, quantity, revenue) "
+    f"SELECT {INVOICE_DAY.format('invoices.')}, invoice_items.product_id, "
+    "SUM(invoice_items.quantity), SUM(invoice_items.total_price) "
+    "FROM invoice_items JOIN invoices ON invoices.id = invoice_items.invoice_id "
+    f"WHERE {INVOICE_DAY.format('invoices.')} >= :since GROUP BY 1, 2",
+    # The first month may be partly before :since; it is rebuilt whole
+    "INSERT INTO product_sales_monthly (month, product_id, quantity, revenue) "
+    "SELECT date(day, 'start of month'), product_id, SUM(quantity), SUM(revenue) "
+    "FROM product_sales_daily WHERE day >= date(:since, 'start of month') GROUP BY 1, 2",
+    "INSERT INTO sales_hourly (day, hour, invoice_count, revenue) "
+    f"SELECT {INVOICE_DAY.format('')}, {INVOICE_HOUR.format('')}, COUNT(*), SUM(total_amount) "
+    f"FROM invoices WHERE {INVOICE_DAY.format('')} >= :since GROUP BY 1, 2",
+    "INSERT INTO sales_daily (day, invoice_count, units, revenue) "
+    "SELECT day, SUM(invoice_count), 0, SUM(revenue) FROM sales_hourly "
+    "WHERE day >= :since GROUP BY day",
+    "UPDATE sales_daily SET units = ("
+    "SELECT SUM(quantity) FROM product_sales_daily WHERE product_sales_daily.day = sales_daily.day"
+    ") WHERE day >= :since AND day IN (SELECT day FROM product_sales_daily WHERE day >= :since)",
+]
+
+
+def rebuild_rollups(conn: Connection, since: Optional[date] = None) -> None:
+    """Recompute the rollups of the days from ``since`` on (all days if
+    None). Run it in a write transaction so no sale lands half counted."""
+    # Days are 'YYYY-MM-DD' text, all after year 0
+    params = {"since": (since or date.min).isoformat()}
+    for step in REBUILD_STEPS:
+        conn.execute(text(step), params)
+
+
+def next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _product_totals(rollup, column, since: date, before: date) -> Select:
+    return (
+        select(
+            rollup.product_id,
+            func.sum(rollup.quantity).label("quantity"),
+            func.sum(rollup.revenue).label("revenue"),
+        )
+        .where(column >= since, column < before)
+        .group_by(rollup.product_id)
+    )
+
+
+def product_totals(start: date, end: date) -> List[Select]:
+    """Queries of units and revenue per product from ``start`` to ``end``
+    (days, inclusive), to be added up: whole months come from the monthly
+    rollup, the days before and after them from the daily one."""
+    until = end + timedelta(days=1)
+    first_month = start if start.day == 1 else next_month(start)
+    after_months = max(first_month, until.replace(day=1))
+    daily, monthly = models.ProductSalesDaily, models.ProductSalesMonthly
+
+    if first_month == after_months:
+        return [_product_totals(daily, daily.day, start, until)]
+    queries = [_product_totals(monthly, monthly.month, first_month, after_months)]
+    if start < first_month:
+        queries.append(_product_totals(daily, daily.day, start, first_month))
+    if after_months < until:
+        queries.append(_product_totals(daily, daily.day, after_months, until))
+    return queries
+
+
+async def main(since: Optional[date]) -> None:
+    from .database import engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_rollups, since)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", type=date.fromisoformat, default=None,
+                        help="first day to rebuild (default: all history)")
+    asyncio.run(main(parser.parse_args().since))
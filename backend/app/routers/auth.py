@@ -19,6 +19,14 @@ r2_storage = R2Storage()
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def latest_valid_otp(user_id: str, now: datetime):
+    """The user's newest OTP attempt that is unused and not expired."""
+    return select(models.OTPAttempt).where(
+        models.OTPAttempt.user_id == user_id,
+        models.OTPAttempt.used == False,
+        models.OTPAttempt.expires_at > now
+    ).order_by(models.OTPAttempt.created_at.desc()).limit(1)
+
 async def get_current_user(
     request: Request,
     db: AsyncSession = Depends(get_db)
@@ -225,13 +233,7 @@ async def verify_otp(
         raise HTTPException(status_code=404, detail="User not found")
 
     # Find latest unused OTP attempt
-    stmt = select(models.OTPAttempt).where(
-        models.OTPAttempt.user_id == user.id,
-        models.OTPAttempt.used == False,
-        models.OTPAttempt.expires_at > datetime.utcnow()
-    ).order_by(models.OTPAttempt.created_at.desc()).limit(1)
-    
-    result = await db.execute(stmt)
+    result = await db.execute(latest_valid_otp(user.id, datetime.utcnow()))
     otp_attempt = result.scalar_one_or_none()
 
     if not otp_attempt:
@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import time
 from datetime import datetime
-from ..database import get_db
+from ..database import get_read_db
 from typing import Dict
 
 router = APIRouter(tags=["health"])
@@ -14,7 +14,6 @@ async def check_database(db: AsyncSession) -> Dict[str, str]:
     try:
         # Execute a simple query to check database connectivity
         await db.execute(text("SELECT 1"))
-        await db.commit()
         end_time = time.perf_counter()
         response_time = f"{(end_time - start_time) * 1000:.2f}ms"
         return {"status": "ok", "responseTime": response_time}
@@ -33,7 +32,7 @@ async def check_database(db: AsyncSession) -> Dict[str, str]:
 )
 async def health_check(
     response: Response,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Health check endpoint that verifies API and database status.
@@ -1,50 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, text, bindparam, DateTime
 from sqlalchemy.orm import selectinload
-from typing import List
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime
+from typing import List, Optional
+from functools import partial
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_read_db
+from ..export import MEDIA_TYPES, export_rows, ledger_entries
+from ..pagination import MAX_PAGE_SIZE, paginate
+from ..write_queue import write_queue
+from ..catalog_index import catalog_index
+from ..product_cache import product_cache
+from ..analytics import analytics_cache
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
-@router.post("/record", response_model=schemas.InventoryRecord)
-async def create_inventory_record(
-    record: schemas.InventoryRecordCreate,
-    db: AsyncSession = Depends(get_db)
-):
-    # Verify product exists
+DEFAULT_LOW_STOCK_THRESHOLD = 10
+MAX_RESTOCK_ITEMS = 1000
+# Order of a product's history, newest first
+HISTORY_KEYS = (models.InventoryRecord.created_at, models.InventoryRecord.id)
+
+# Adds a (possibly negative) change to a product's stock unless that would
+# take it below zero; no row comes back when it would
+ADJUST_STOCK = text(
+    "UPDATE products SET quantity = quantity + :change, updated_at = :now "
+    "WHERE id = :product_id AND quantity + :change >= 0 "
+    "RETURNING quantity, updated_at"
+).bindparams(bindparam("now", type_=DateTime)).columns(
+    models.Product.quantity, models.Product.updated_at
+)
+
+def history_query(product_id: int):
+    """Stock movements of a product, unordered; paged in ``HISTORY_KEYS`` order."""
+    return select(models.InventoryRecord).filter(models.InventoryRecord.product_id == product_id)
+
+async def record_stock_change(
+    db: AsyncSession,
+    record: schemas.InventoryRecordCreate
+) -> schemas.InventoryRecord:
+    """Write unit for a stock movement; runs inside the writer queue's transaction."""
+    # Verify product exists; populate_existing: other units of the batch may
+    # hold this product
     result = await db.execute(
         select(models.Product).filter(models.Product.id == record.product_id)
+        .execution_options(populate_existing=True)
     )
     product = result.scalar_one_or_none()
     
     if product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    # Check and change in one statement, as the stock seen above may be stale
+    result = await db.execute(ADJUST_STOCK, {
+        "product_id": record.product_id,
+        "change": record.quantity_change,
+        "now": datetime.utcnow()
+    })
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=400, detail="Insufficient stock")
+    set_committed_value(product, "quantity", row.quantity)
+    set_committed_value(product, "updated_at", row.updated_at)
+    
     # Create inventory record
     db_record = models.InventoryRecord(**record.model_dump())
     db.add(db_record)
     
-    # Update product quantity
-    product.quantity += record.quantity_change
-    
-    if product.quantity < 0:
-        raise HTTPException(status_code=400, detail="Insufficient stock")
-    
-    await db.commit()
-    await db.refresh(db_record)
+    await db.flush()
+    return schemas.InventoryRecord.model_validate(db_record)
+
+@router.post("/record", response_model=schemas.InventoryRecord)
+async def create_inventory_record(record: schemas.InventoryRecordCreate):
+    db_record = await write_queue.submit(partial(record_stock_change, record=record))
+    catalog_index.adjust_quantity(record.product_id, record.quantity_change)
+    product_cache.invalidate(product_ids=[record.product_id])
+    analytics_cache.invalidate(since=date.today())
     return db_record
 
 @router.get("/history/{product_id}", response_model=schemas.InventoryResponse)
 async def get_inventory_history(
     product_id: int,
-    page: int = 1,
-    limit: int = 10,
-    db: AsyncSession = Depends(get_db)
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    approximate: bool = False,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    skip = (page - 1) * limit
-    
     # Verify product exists
     product_result = await db.execute(
         select(models.Product).filter(models.Product.id == product_id)
@@ -52,38 +96,78 @@ async def get_inventory_history(
     if product_result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Get total count
-    count_result = await db.execute(
-        select(models.InventoryRecord)
-        .filter(models.InventoryRecord.product_id == product_id)
+    return await paginate(
+        db,
+        history_query(product_id),
+        HISTORY_KEYS,
+        page=page, limit=limit, cursor=cursor, descending=True, approximate=approximate,
+        options=[selectinload(models.InventoryRecord.product)]
     )
-    total = len(count_result.scalars().all())
-    
-    # Get paginated results
-    result = await db.execute(
-        select(models.InventoryRecord)
-        .filter(models.InventoryRecord.product_id == product_id)
-        .options(selectinload(models.InventoryRecord.product))
-        .order_by(models.InventoryRecord.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    records = result.scalars().all()
-    
-    return {
-        "total": total,
-        "items": records
-    }
 
 @router.get("/low-stock", response_model=List[schemas.Product])
 async def get_low_stock_products(
-    threshold: int = 10,
-    db: AsyncSession = Depends(get_db)
+    threshold: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
+    """Products at or below ``threshold``, or without one, at or below their
+    forecast reorder point (``DEFAULT_LOW_STOCK_THRESHOLD`` until the
+    forecast has planned them)."""
+    if threshold is not None:
+        level = threshold
+    else:
+        level = func.coalesce(models.RestockPlan.reorder_point, DEFAULT_LOW_STOCK_THRESHOLD)
     result = await db.execute(
         select(models.Product)
-        .filter(models.Product.quantity <= threshold)
+        .outerjoin(models.RestockPlan, models.RestockPlan.product_id == models.Product.id)
+        .filter(models.Product.quantity <= level)
         .order_by(models.Product.quantity)
     )
     products = result.scalars().all()
     return products
+
+@router.get("/restock", response_model=List[schemas.RestockRecommendation])
+async def get_restock_recommendations(
+    limit: int = Query(100, ge=1, le=MAX_RESTOCK_ITEMS),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Products at or below their reorder point, with the quantity to order,
+    the ones that run out soonest first. Read from the plans of the last
+    forecast run (app/forecasting.py)."""
+    plan = models.RestockPlan
+    order_quantity = plan.order_up_to - models.Product.quantity
+    result = await db.execute(
+        select(models.Product, plan)
+        .join(plan, plan.product_id == models.Product.id)
+        .filter(models.Product.quantity <= plan.reorder_point, order_quantity > 0)
+        .order_by(plan.daily_demand == 0, models.Product.quantity / plan.daily_demand, order_quantity.desc())
+        .limit(limit)
+    )
+    return [
+        schemas.RestockRecommendation(
+            product=schemas.Product.model_validate(product),
+            daily_demand=restock.daily_demand,
+            reorder_point=restock.reorder_point,
+            order_up_to=restock.order_up_to,
+            order_quantity=restock.order_up_to - product.quantity,
+            days_of_cover=product.quantity / restock.daily_demand if restock.daily_demand > 0 else None,
+            computed_at=restock.computed_at
+        )
+        for product, restock in result.all()
+    ]
+
+@router.get("/export")
+async def export_inventory(
+    start: date,
+    end: date,
+    format: schemas.ExportFormat = schemas.ExportFormat.CSV,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Stock movements from ``start`` to ``end`` (days, inclusive), streamed
+    as CSV or NDJSON."""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return StreamingResponse(
+        export_rows(db, ledger_entries(start, end), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="inventory-{start}-{end}.{format.value}"'}
+    )
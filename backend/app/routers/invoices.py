@@ -1,95 +1,372 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, func, text, bindparam, DateTime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from datetime import datetime
-from typing import List
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime, time, timedelta
+from functools import partial
+from typing import Dict, List, Optional
+import json
 from .. import models, schemas
-from ..database import get_db
-from fastapi.responses import HTMLResponse
-from jinja2 import Environment, PackageLoader, select_autoescape
+from ..database import get_read_db, ReadSessionLocal
+from ..pagination import MAX_PAGE_SIZE, paginate
+from ..write_queue import write_queue
+from ..catalog_index import catalog_index
+from ..copurchase_index import copurchase_index
+from ..product_cache import product_cache
+from ..analytics import analytics_cache
+from ..utils.escpos import PAPER_COLUMNS
+from ..export import MEDIA_TYPES, export_rows, invoice_lines
+from ..receipts import get_escpos, get_receipts, receipt_document, render_page, warm_receipts
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
-# Setup Jinja2 template environment
-env = Environment(
-    loader=PackageLoader("app", "templates"),
-    autoescape=select_autoescape(['html', 'xml'])
+MAX_BATCH_INVOICES = 1000
+MAX_PRINT_BATCH = 1000
+# Sales recorded per writer-queue unit, so a large replay does not hold the
+# writer for the whole request
+REPLAY_CHUNK_SIZE = 100
+
+# Stock for every line of a sale in one statement, taken only where enough is
+# left; RETURNING lists the products that were decremented. The WHERE clause
+# makes the check and the decrement one atomic step, so two tills selling
+# the last unit cannot both succeed.
+DECREMENT_STOCK = text(
+    "UPDATE products SET quantity = products.quantity - json_extract(line.value, '$.quantity'), "
+    "updated_at = :now "
+    "FROM json_each(:lines) AS line "
+    "WHERE products.id = json_extract(line.value, '$.product_id') "
+    "AND products.quantity >= json_extract(line.value, '$.quantity') "
+    "RETURNING products.id, products.quantity, products.updated_at"
+).bindparams(bindparam("now", type_=DateTime)).columns(
+    models.Product.id, models.Product.quantity, models.Product.updated_at
 )
 
-@router.post("/", response_model=schemas.Invoice)
-async def create_invoice(
-    invoice: schemas.InvoiceCreate,
-    db: AsyncSession = Depends(get_db)
-):
-    # Generate invoice number (format: INV-YYYYMMDD-XXXX)
-    today = datetime.now()
-    count_result = await db.execute(
-        select(models.Invoice).filter(
-            models.Invoice.invoice_number.like(f"INV-{today.strftime('%Y%m%d')}%")
-        )
+# Next invoice number of a store's day in one statement. It runs in the
+# sale's write transaction, and SQLite has one writer at a time, so two
+# checkouts cannot read the same value; the cost does not grow with sales.
+NEXT_INVOICE_SEQUENCE = text(
+    "INSERT INTO invoice_sequences (store_id, day, last_value) VALUES (:store_id, :day, :count) "
+    "ON CONFLICT (store_id, day) DO UPDATE SET last_value = last_value + excluded.last_value "
+    "RETURNING last_value"
+)
+DEFAULT_STORE_ID = 0
+
+async def next_invoice_numbers(
+    db: AsyncSession, today: datetime, count: int, store_id: int = DEFAULT_STORE_ID
+) -> List[str]:
+    """Allocate the next ``count`` INV-YYYYMMDD-XXXX numbers of ``today``."""
+    day = today.strftime('%Y%m%d')
+    result = await db.execute(NEXT_INVOICE_SEQUENCE, {"store_id": store_id, "day": day, "count": count})
+    last_value = result.scalar_one()
+    return [f"INV-{day}-{str(value).zfill(4)}" for value in range(last_value - count + 1, last_value + 1)]
+
+async def next_invoice_number(db: AsyncSession, today: datetime, store_id: int = DEFAULT_STORE_ID) -> str:
+    """Allocate the next INV-YYYYMMDD-XXXX number of ``today``."""
+    return (await next_invoice_numbers(db, today, 1, store_id))[0]
+
+async def take_stock(db: AsyncSession, sold: Dict[int, int]) -> None:
+    """Decrement the stock of ``sold`` (product id -> units), all or nothing.
+
+    One IN query for the products and one conditional UPDATE; raises 404 for
+    a missing product and 400 when one is short, leaving it to the caller's
+    savepoint to undo the other decrements.
+    """
+    # populate_existing: other units of the batch may hold these products
+    result = await db.execute(
+        select(models.Product).where(models.Product.id.in_(list(sold)))
+        .execution_options(populate_existing=True)
     )
-    today_invoices = len(count_result.scalars().all())
-    invoice_number = f"INV-{today.strftime('%Y%m%d')}-{str(today_invoices + 1).zfill(4)}"
+    products = {product.id: product for product in result.scalars().all()}
+    for product_id in sold:
+        if product_id not in products:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
     
-    # Create invoice
-    db_invoice = models.Invoice(invoice_number=invoice_number)
-    db.add(db_invoice)
-    await db.flush()  # Get invoice ID
-    
-    total_amount = 0
-    
-    # Process each item
-    for item in invoice.items:
-        # Get product
-        result = await db.execute(
-            select(models.Product).filter(models.Product.id == item.product_id)
-        )
-        product = result.scalar_one_or_none()
-        
-        if product is None:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
-        
-        if product.quantity < item.quantity:
+    result = await db.execute(DECREMENT_STOCK, {
+        "lines": json.dumps([{"product_id": product_id, "quantity": n} for product_id, n in sold.items()]),
+        "now": datetime.utcnow()
+    })
+    decremented = {row.id: row for row in result.all()}
+    for product_id in sold:
+        if product_id not in decremented:
             raise HTTPException(
                 status_code=400,
-                detail=f"Insufficient stock for product {product.name}"
+                detail=f"Insufficient stock for product {products[product_id].name}"
             )
-        
-        # Create invoice item
-        total_price = item.quantity * item.unit_price
-        db_item = models.InvoiceItem(
-            invoice_id=db_invoice.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            total_price=total_price
-        )
-        db.add(db_item)
-        
-        # Update product quantity
-        product.quantity -= item.quantity
-        
-        # Create inventory record
-        inventory_record = models.InventoryRecord(
-            product_id=product.id,
-            quantity_change=-item.quantity,
-            notes=f"Sale invoice #{invoice_number}"
-        )
-        db.add(inventory_record)
-        
-        total_amount += total_price
+    for row in decremented.values():
+        set_committed_value(products[row.id], "quantity", row.quantity)
+        set_committed_value(products[row.id], "updated_at", row.updated_at)
+
+async def checkout(
+    db: AsyncSession,
+    invoice: schemas.InvoiceBase,
+    client_txn_id: Optional[str] = None
+) -> schemas.Invoice:
+    """Write unit for a sale; runs inside the writer queue's transaction.
+
+    Set-based whatever the number of lines: one IN query for the products,
+    one conditional UPDATE for the stock, one INSERT each for the invoice
+    items and the inventory records.
+    """
+    # Units sold per product; a product may appear on several lines
+    sold: Dict[int, int] = {}
+    for item in invoice.items:
+        sold[item.product_id] = sold.get(item.product_id, 0) + item.quantity
     
-    db_invoice.total_amount = total_amount
-    await db.commit()
-    await db.refresh(db_invoice)
+    # Raising rolls back this unit's savepoint, and with it the decrements
+    # of the other lines
+    await take_stock(db, sold)
     
+    invoice_number = await next_invoice_number(db, datetime.now())
+    total_amount = sum(item.quantity * item.unit_price for item in invoice.items)
+    result = await db.execute(
+        insert(models.Invoice).values(
+            invoice_number=invoice_number, client_txn_id=client_txn_id, total_amount=total_amount
+        ).returning(models.Invoice.id, models.Invoice.created_at)
+    )
+    invoice_id, created_at = result.one()
+    
+    # Plain multi-row INSERTs: with RETURNING in parameter order SQLAlchemy
+    # sends one statement per row on SQLite. An empty VALUES list would
+    # compile to DEFAULT VALUES, so an empty cart inserts nothing.
+    if invoice.items:
+        await db.execute(insert(models.InvoiceItem).values([
+            {
+                "invoice_id": invoice_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "total_price": item.quantity * item.unit_price
+            }
+            for item in invoice.items
+        ]))
+        await db.execute(insert(models.InventoryRecord).values([
+            {
+                "product_id": item.product_id,
+                "quantity_change": -item.quantity,
+                "notes": f"Sale invoice #{invoice_number}"
+            }
+            for item in invoice.items
+        ]))
+    items = (await db.scalars(
+        select(models.InvoiceItem).where(models.InvoiceItem.invoice_id == invoice_id)
+        .order_by(models.InvoiceItem.id)
+    )).all()
+    
+    return schemas.Invoice(
+        id=invoice_id,
+        invoice_number=invoice_number,
+        total_amount=total_amount,
+        created_at=created_at,
+        items=[schemas.InvoiceItem.model_validate(item) for item in items]
+    )
+
+@router.post("/", response_model=schemas.Invoice)
+async def create_invoice(invoice: schemas.InvoiceCreate, background_tasks: BackgroundTasks):
+    db_invoice = await write_queue.submit(partial(checkout, invoice=invoice))
+    for item in invoice.items:
+        catalog_index.adjust_quantity(item.product_id, -item.quantity)
+    product_cache.invalidate(product_ids=[item.product_id for item in invoice.items])
+    analytics_cache.invalidate(since=date.today())
+    copurchase_index.record(db_invoice.id, [item.product_id for item in invoice.items])
+    # The till prints the receipt right after checkout
+    background_tasks.add_task(warm_receipts, ReadSessionLocal, [db_invoice.id])
     return db_invoice
 
+async def record_sales(
+    db: AsyncSession,
+    sales: Dict[str, schemas.InvoiceBase]
+) -> Dict[str, tuple]:
+    """Record several sales with one statement per table, not per sale.
+
+    ``sales`` maps client_txn_id to sale. The stock of the whole chunk is
+    taken at once, so one missing product or short line fails them all
+    (HTTPException) and the caller falls back to ``checkout`` per sale.
+    Returns client_txn_id -> (invoice id, invoice number).
+    """
+    sold: Dict[int, int] = {}
+    for invoice in sales.values():
+        for item in invoice.items:
+            sold[item.product_id] = sold.get(item.product_id, 0) + item.quantity
+    await take_stock(db, sold)
+    
+    numbers = dict(zip(sales, await next_invoice_numbers(db, datetime.now(), len(sales))))
+    await db.execute(insert(models.Invoice), [
+        {
+            "invoice_number": numbers[client_txn_id],
+            "client_txn_id": client_txn_id,
+            "total_amount": sum(item.quantity * item.unit_price for item in invoice.items)
+        }
+        for client_txn_id, invoice in sales.items()
+    ])
+    result = await db.execute(
+        select(models.Invoice.client_txn_id, models.Invoice.id)
+        .where(models.Invoice.client_txn_id.in_(list(sales)))
+    )
+    invoice_ids = {row.client_txn_id: row.id for row in result.all()}
+    
+    lines = [
+        (client_txn_id, item) for client_txn_id, invoice in sales.items() for item in invoice.items
+    ]
+    # Sales without lines have no items or stock moves to write (an empty
+    # parameter list would insert one row of defaults)
+    if lines:
+        await db.execute(insert(models.InvoiceItem), [
+            {
+                "invoice_id": invoice_ids[client_txn_id],
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "total_price": item.quantity * item.unit_price
+            }
+            for client_txn_id, item in lines
+        ])
+        await db.execute(insert(models.InventoryRecord), [
+            {
+                "product_id": item.product_id,
+                "quantity_change": -item.quantity,
+                "notes": f"Sale invoice #{numbers[client_txn_id]}"
+            }
+            for client_txn_id, item in lines
+        ])
+    return {client_txn_id: (invoice_ids[client_txn_id], numbers[client_txn_id]) for client_txn_id in sales}
+
+async def replay_invoices(
+    db: AsyncSession,
+    invoices: List[schemas.OfflineInvoiceCreate]
+) -> List[schemas.InvoiceBatchResult]:
+    """Write unit recording a chunk of offline sales.
+
+    The chunk is first recorded at once (``record_sales``); if any sale of
+    it cannot be, each sale is recorded in its own savepoint so only that
+    one fails. Sales whose ``client_txn_id`` is already recorded come back
+    as duplicates with the invoice they created the first time.
+    """
+    ids = [str(invoice.client_txn_id) for invoice in invoices]
+    result = await db.execute(
+        select(models.Invoice.client_txn_id, models.Invoice.id, models.Invoice.invoice_number)
+        .where(models.Invoice.client_txn_id.in_(ids))
+    )
+    recorded = {row.client_txn_id: (row.id, row.invoice_number) for row in result.all()}
+    
+    # First occurrence of each sale not recorded yet
+    new: Dict[str, schemas.InvoiceBase] = {}
+    for client_txn_id, invoice in zip(ids, invoices):
+        if client_txn_id not in recorded:
+            new.setdefault(client_txn_id, invoice)
+    
+    created = set()
+    failed: Dict[str, str] = {}
+    try:
+        if new:
+            async with db.begin_nested():
+                recorded.update(await record_sales(db, new))
+            created.update(new)
+    except (HTTPException, IntegrityError):
+        for client_txn_id, invoice in new.items():
+            try:
+                async with db.begin_nested():
+                    db_invoice = await checkout(db, invoice, client_txn_id=client_txn_id)
+            except HTTPException as e:
+                failed[client_txn_id] = e.detail
+                continue
+            except IntegrityError as e:
+                # A duplicate client_txn_id was recorded meanwhile by another
+                # server process; any other constraint fails the sale
+                result = await db.execute(
+                    select(models.Invoice.id, models.Invoice.invoice_number)
+                    .where(models.Invoice.client_txn_id == client_txn_id)
+                )
+                row = result.one_or_none()
+                if row is None:
+                    failed[client_txn_id] = str(e.orig)
+                else:
+                    recorded[client_txn_id] = (row.id, row.invoice_number)
+                continue
+            recorded[client_txn_id] = (db_invoice.id, db_invoice.invoice_number)
+            created.add(client_txn_id)
+    
+    results = []
+    for client_txn_id in ids:
+        if client_txn_id in failed:
+            results.append(schemas.InvoiceBatchResult(
+                client_txn_id=client_txn_id, status=schemas.InvoiceBatchStatus.FAILED,
+                error=failed[client_txn_id]
+            ))
+            continue
+        invoice_id, invoice_number = recorded[client_txn_id]
+        if client_txn_id in created:
+            # Later occurrences in the same request are duplicates
+            created.discard(client_txn_id)
+            status = schemas.InvoiceBatchStatus.CREATED
+        else:
+            status = schemas.InvoiceBatchStatus.DUPLICATE
+        results.append(schemas.InvoiceBatchResult(
+            client_txn_id=client_txn_id, status=status,
+            invoice_id=invoice_id, invoice_number=invoice_number
+        ))
+    return results
+
+@router.post("/batch", response_model=schemas.InvoiceBatchResponse)
+async def create_invoice_batch(invoices: List[schemas.OfflineInvoiceCreate]):
+    """Record sales made offline, replayed by a terminal that is back online.
+
+    Safe to retry: every sale carries a client-generated ``client_txn_id``
+    and is recorded at most once. A sale that cannot be recorded (missing
+    product, not enough stock) fails alone.
+    """
+    if len(invoices) > MAX_BATCH_INVOICES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_INVOICES} sales per request")
+    
+    results = []
+    for start in range(0, len(invoices), REPLAY_CHUNK_SIZE):
+        chunk = invoices[start:start + REPLAY_CHUNK_SIZE]
+        chunk_results = await write_queue.submit(partial(replay_invoices, invoices=chunk))
+        created = [
+            (invoice, result.invoice_id) for invoice, result in zip(chunk, chunk_results)
+            if result.status == schemas.InvoiceBatchStatus.CREATED
+        ]
+        for invoice, invoice_id in created:
+            for item in invoice.items:
+                catalog_index.adjust_quantity(item.product_id, -item.quantity)
+            copurchase_index.record(invoice_id, [item.product_id for item in invoice.items])
+        product_cache.invalidate(product_ids=[item.product_id for invoice, _ in created for item in invoice.items])
+        analytics_cache.invalidate(since=date.today())
+        results.extend(chunk_results)
+    
+    counts = {status: 0 for status in schemas.InvoiceBatchStatus}
+    for result in results:
+        counts[result.status] += 1
+    return schemas.InvoiceBatchResponse(
+        created=counts[schemas.InvoiceBatchStatus.CREATED],
+        duplicates=counts[schemas.InvoiceBatchStatus.DUPLICATE],
+        failed=counts[schemas.InvoiceBatchStatus.FAILED],
+        results=results
+    )
+
+@router.get("/export")
+async def export_invoices(
+    start: date,
+    end: date,
+    format: schemas.ExportFormat = schemas.ExportFormat.CSV,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Sales lines from ``start`` to ``end`` (days, inclusive), streamed as
+    CSV or NDJSON with one row per invoice line."""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return StreamingResponse(
+        export_rows(db, invoice_lines(start, end), format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="invoices-{start}-{end}.{format.value}"'}
+    )
+
 @router.get("/{invoice_id}", response_model=schemas.Invoice)
 async def get_invoice(
     invoice_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     result = await db.execute(
         select(models.Invoice)
@@ -105,51 +382,116 @@ async def get_invoice(
     
     return invoice
 
+@router.get("/print/batch", response_class=HTMLResponse)
+async def print_invoice_batch(
+    ids: Optional[str] = None,
+    day: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Print many receipts as one document, e.g. a day's reprints.
+
+    Invoices are given as comma-separated ``ids`` (printed in that order) or
+    as a ``day`` (YYYY-MM-DD, oldest first). The document is streamed and
+    rendered off the event loop.
+    """
+    if ids:
+        try:
+            wanted = [int(value) for value in ids.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if len(wanted) > MAX_PRINT_BATCH:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_PRINT_BATCH} invoices per document")
+        result = await db.execute(select(models.Invoice.id).where(models.Invoice.id.in_(wanted)))
+        found = set(result.scalars().all())
+        invoice_ids = [invoice_id for invoice_id in dict.fromkeys(wanted) if invoice_id in found]
+    elif day:
+        start = datetime.combine(day, time.min)
+        result = await db.execute(
+            select(models.Invoice.id)
+            .where(models.Invoice.created_at >= start, models.Invoice.created_at < start + timedelta(days=1))
+            .order_by(models.Invoice.created_at, models.Invoice.id)
+            .limit(MAX_PRINT_BATCH + 1)
+        )
+        invoice_ids = list(result.scalars().all())
+        if len(invoice_ids) > MAX_PRINT_BATCH:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_PRINT_BATCH} invoices per document")
+    else:
+        raise HTTPException(status_code=400, detail="Give ids or day")
+    if not invoice_ids:
+        raise HTTPException(status_code=404, detail="No invoices found")
+    
+    return StreamingResponse(receipt_document(db, invoice_ids), media_type="text/html; charset=utf-8")
+
 @router.get("/print/{invoice_id}", response_class=HTMLResponse)
 async def print_invoice(
     invoice_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    result = await db.execute(
-        select(models.Invoice)
-        .filter(models.Invoice.id == invoice_id)
-        .options(
-            selectinload(models.Invoice.items).selectinload(models.InvoiceItem.product)
-        )
-    )
-    invoice = result.scalar_one_or_none()
-    
-    if invoice is None:
+    receipts = await get_receipts(db, [invoice_id])
+    if invoice_id not in receipts:
         raise HTTPException(status_code=404, detail="Invoice not found")
     
-    template = env.get_template("invoice_template.html")
-    return template.render(invoice=invoice)
+    return render_page(receipts[invoice_id])
+
+@router.get("/print/{invoice_id}/escpos")
+async def print_invoice_escpos(
+    invoice_id: int,
+    paper: int = 80,
+    mode: schemas.EscposMode = schemas.EscposMode.TEXT,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """The receipt as ESC/POS bytes for a 58 or 80 mm thermal printer."""
+    if paper not in PAPER_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"paper must be one of {sorted(PAPER_COLUMNS)} (mm)")
+    data = await get_escpos(db, invoice_id, paper, mode)
+    return Response(content=data, media_type="application/octet-stream")
+
+# Columns of the summary list: no items, only how many there are
+INVOICE_SUMMARY_COLUMNS = (
+    models.Invoice.id,
+    models.Invoice.invoice_number,
+    models.Invoice.total_amount,
+    models.Invoice.created_at,
+    select(func.count(models.InvoiceItem.id))
+    .where(models.InvoiceItem.invoice_id == models.Invoice.id)
+    .scalar_subquery().label("item_count"),
+)
+# Order of the invoice list, newest first. ix_invoices_created_at serves both
+# keys: a SQLite index ends with the rowid, which is the invoice id
+INVOICE_LIST_KEYS = (models.Invoice.created_at, models.Invoice.id)
 
 @router.get("/", response_model=schemas.InvoiceResponse)
 async def list_invoices(
-    page: int = 1,
-    limit: int = 10,
-    db: AsyncSession = Depends(get_db)
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    approximate: bool = False,
+    view: schemas.InvoiceListView = schemas.InvoiceListView.FULL,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    skip = (page - 1) * limit
-    
-    # Get total count
-    count_result = await db.execute(select(models.Invoice))
-    total = len(count_result.scalars().all())
-    
-    # Get paginated results
-    result = await db.execute(
-        select(models.Invoice)
-        .options(
-            selectinload(models.Invoice.items).selectinload(models.InvoiceItem.product)
+    """List invoices, newest first.
+
+    ``view=summary`` returns ``InvoiceSummaryResponse`` instead: the invoice
+    columns and an item count, read as plain rows with no items loaded.
+    Details come from ``GET /invoices/{invoice_id}``.
+    """
+    keys = INVOICE_LIST_KEYS
+    if view == schemas.InvoiceListView.SUMMARY:
+        result = await paginate(
+            db, select(*INVOICE_SUMMARY_COLUMNS), keys,
+            page=page, limit=limit, cursor=cursor, descending=True, approximate=approximate, rows=True
         )
-        .order_by(models.Invoice.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    invoices = result.scalars().all()
+        body = schemas.InvoiceSummaryResponse(
+            total=result["total"],
+            items=[row._asdict() for row in result["items"]],
+            next_cursor=result["next_cursor"]
+        ).model_dump_json()
+        return Response(content=body, media_type="application/json")
     
-    return {
-        "total": total,
-        "items": invoices
-    }
+    return await paginate(
+        db,
+        select(models.Invoice),
+        keys,
+        page=page, limit=limit, cursor=cursor, descending=True, approximate=approximate,
+        options=[selectinload(models.Invoice.items)]
+    )
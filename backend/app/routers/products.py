@@ -1,27 +1,189 @@
-from fastapi import APIRouter, Depends, HTTPException
+import gzip
+import json
+from datetime import datetime
+from functools import partial
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, Query, Response, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
-from typing import List, Dict
+from sqlalchemy import select, or_, func, literal_column, table, column, text, bindparam, DateTime
+from sqlalchemy.exc import IntegrityError
+from typing import Any, List, Dict, Optional
 from .. import models, schemas
-from ..database import get_db
+from ..database import get_db, get_read_db, ReadSessionLocal
+from ..catalog_index import catalog_index
+from ..copurchase_index import copurchase_index
+from ..catalog_snapshot import catalog_snapshot
+from ..catalog_sync import DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT, changes_since
+from ..product_cache import product_cache
+from ..analytics import analytics_cache
+from ..pagination import MAX_PAGE_SIZE, paginate, encode_cursor, decode_cursor
+from ..product_import import create_job, import_jobs, run_import, save_upload, upsert_products
+from ..utils.text import fts_match_expression
+from ..write_queue import write_queue
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# FTS5 table maintained by triggers (see migrations); rowid is the product id
+products_fts = table("products_fts", column("rowid"))
+FTS_RANK_LIMIT = 2000
+# Keyset order of search results (the catalog index also returns id order)
+SEARCH_KEYS = (models.Product.id,)
+MAX_LOOKUP_CODES = 200
+MAX_LOOKUP_IDS = 500
+DEFAULT_RECOMMENDATIONS = 10
+MAX_RECOMMENDATIONS = 50
+MAX_PATCH_ITEMS = 10000
+# Every patch in one UPDATE ... FROM json_each. The writer runs units inside
+# a SAVEPOINT, where each separate statement grows SQLite's in-memory
+# statement journal: 10k patches took 17s as an executemany, 0.2s like this.
+PATCH_PRODUCTS = text(
+    "UPDATE products SET "
+    "code = coalesce(json_extract(patch.value, '$.code'), products.code), "
+    "name = coalesce(json_extract(patch.value, '$.name'), products.name), "
+    "price = coalesce(json_extract(patch.value, '$.price'), products.price), "
+    "quantity = coalesce(json_extract(patch.value, '$.quantity'), products.quantity), "
+    "updated_at = :now "
+    "FROM json_each(:patches) AS patch "
+    "WHERE products.id = json_extract(patch.value, '$.id')"
+).bindparams(bindparam("now", type_=DateTime))
+
 @router.post("/bulk", response_model=List[schemas.Product])
 async def bulk_create_products(
     products: List[schemas.ProductCreate],
-    db: AsyncSession = Depends(get_db)
+    chunk_size: Optional[int] = Query(None, gt=0),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    db_products = []
+    codes = set()
     for product in products:
-        db_product = models.Product(**product.model_dump())
-        db.add(db_product)
-        db_products.append(db_product)
+        if product.code in codes:
+            raise HTTPException(status_code=400, detail=f"Duplicate product code {product.code} found.")
+        codes.add(product.code)
     
-    await db.commit()
-    for product in db_products:
-        await db.refresh(product)
-    return db_products
+    # Creates only, as it always has: an existing code fails the request
+    # (updating existing products is POST /products/bulk/upsert)
+    existing = await db.scalar(
+        select(models.Product.code).where(models.Product.code.in_(codes)).limit(1)
+    )
+    if existing is not None:
+        raise HTTPException(status_code=400, detail=f"Product code {existing} already exists.")
+
+    items = []
+    report = await upsert_products(
+        enumerate((product.model_dump() for product in products), start=1),
+        chunk_size=chunk_size,
+        items=items,
+        update_existing=False
+    )
+    if report.errors:
+        raise HTTPException(status_code=400, detail=report.errors[0].error)
+    return items
+
+@router.post("/bulk/upsert", response_model=schemas.BulkImportReport)
+async def bulk_upsert_products(
+    products: List[Dict[str, Any]],
+    chunk_size: Optional[int] = Query(None, gt=0)
+):
+    """Insert new products and update existing codes; invalid rows are
+    reported by position instead of rejecting the request."""
+    return await upsert_products(enumerate(products, start=1), chunk_size=chunk_size)
+
+async def apply_product_patches(
+    db: AsyncSession,
+    patches: List[schemas.ProductPatch]
+) -> schemas.ProductPatchReport:
+    """Write unit for PATCH /products/bulk; runs inside the writer queue's transaction.
+
+    All patches go out as one UPDATE statement. If that hits a constraint
+    (a code already taken), it is retried patch by patch so only the
+    conflicting ones fail.
+    """
+    now = datetime.utcnow()
+    ids = [patch.id for patch in patches]
+    result = await db.execute(select(models.Product.id).where(models.Product.id.in_(ids)))
+    existing = set(result.scalars().all())
+    
+    results: List[Optional[schemas.ProductPatchResult]] = []
+    pending = {}  # product id -> position of its result
+    rows = []
+    for patch in patches:
+        values = patch.model_dump(exclude_unset=True, exclude_none=True)
+        outcome = None
+        if patch.id in pending:
+            outcome = schemas.ProductPatchResult(
+                id=patch.id, status=schemas.ProductPatchStatus.FAILED, error="Duplicate product id in request"
+            )
+        elif patch.id not in existing:
+            outcome = schemas.ProductPatchResult(id=patch.id, status=schemas.ProductPatchStatus.NOT_FOUND)
+        elif len(values) == 1:
+            outcome = schemas.ProductPatchResult(
+                id=patch.id, status=schemas.ProductPatchStatus.FAILED, error="No fields to update"
+            )
+        else:
+            rows.append(values)
+            pending[patch.id] = len(results)
+        results.append(outcome)
+    
+    try:
+        async with db.begin_nested():
+            if rows:
+                await db.execute(PATCH_PRODUCTS, {"patches": json.dumps(rows), "now": now})
+    except IntegrityError:
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(PATCH_PRODUCTS, {"patches": json.dumps([row]), "now": now})
+            except IntegrityError as error:
+                results[pending.pop(row["id"])] = schemas.ProductPatchResult(
+                    id=row["id"], status=schemas.ProductPatchStatus.FAILED, error=str(error.orig)
+                )
+    
+    # populate_existing refreshes products other units of the batch already loaded
+    result = await db.execute(
+        select(models.Product).where(models.Product.id.in_(list(pending)))
+        .execution_options(populate_existing=True)
+    )
+    for product in result.scalars().all():
+        results[pending[product.id]] = schemas.ProductPatchResult(
+            id=product.id, status=schemas.ProductPatchStatus.UPDATED,
+            product=schemas.Product.model_validate(product)
+        )
+    return schemas.ProductPatchReport(updated=len(pending), results=results)
+
+@router.patch("/bulk", response_model=schemas.ProductPatchReport)
+async def bulk_patch_products(patches: List[schemas.ProductPatch]):
+    """Partially update many products in one transaction. Only the fields
+    given in a patch change; each patch gets its own result."""
+    if len(patches) > MAX_PATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PATCH_ITEMS} products per request")
+    
+    report = await write_queue.submit(partial(apply_product_patches, patches=patches))
+    updated = [result.product for result in report.results if result.product is not None]
+    catalog_index.upsert_many(updated)
+    product_cache.invalidate(product_ids=[product.id for product in updated])
+    analytics_cache.invalidate()
+    return report
+
+@router.post("/import", response_model=schemas.ImportJob, status_code=202)
+async def import_products(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    chunk_size: Optional[int] = Query(None, gt=0)
+):
+    """Start importing a CSV or XLSX catalog (code, name, price, quantity).
+
+    The header is checked right away; rows are imported by a background job
+    whose progress is at ``GET /products/import/{job_id}``.
+    """
+    path, kind = await save_upload(file)
+    job = create_job(file.filename)
+    background_tasks.add_task(run_import, job, path, kind, chunk_size)
+    return job
+
+@router.get("/import/{job_id}", response_model=schemas.ImportJob)
+async def get_import_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
 
 @router.post("/", response_model=schemas.Product)
 async def create_product(
@@ -32,17 +194,129 @@ async def create_product(
     db.add(db_product)
     await db.commit()
     await db.refresh(db_product)
+    catalog_index.upsert(db_product)
     return db_product
 
+@router.get("/", response_model=schemas.ProductBatchResponse)
+async def get_products(
+    ids: str = Query(..., description="Comma-separated product ids"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Fetch several products by id in one query, in the order asked for;
+    unknown ids are listed in ``missing``."""
+    try:
+        wanted = list(dict.fromkeys(int(product_id) for product_id in ids.split(",") if product_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(wanted) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_IDS} ids per request")
+    
+    result = await db.execute(select(models.Product).where(models.Product.id.in_(wanted)))
+    found = {product.id: product for product in result.scalars().all()}
+    return {
+        "items": [found[product_id] for product_id in wanted if product_id in found],
+        "missing": [product_id for product_id in wanted if product_id not in found]
+    }
+
+@router.get("/by-code/{code}", response_model=schemas.Product)
+async def get_product_by_code(
+    code: str,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Exact code lookup for barcode scans, served from the product cache."""
+    body = product_cache.get(code)
+    if body is None:
+        generation = product_cache.generation
+        result = await db.execute(
+            select(models.Product).filter(models.Product.code == code)
+        )
+        product = result.scalar_one_or_none()
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = product_cache.put(product, generation)
+    return Response(content=body, media_type="application/json")
+
+@router.get("/by-codes", response_model=schemas.ProductLookupResponse)
+async def get_products_by_codes(
+    codes: str = Query(..., description="Comma-separated product codes"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Exact lookup of several codes; unknown codes are listed in ``missing``."""
+    wanted = list(dict.fromkeys(code.strip() for code in codes.split(",") if code.strip()))
+    if len(wanted) > MAX_LOOKUP_CODES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_CODES} codes per request")
+    
+    bodies = {code: product_cache.get(code) for code in wanted}
+    uncached = [code for code, body in bodies.items() if body is None]
+    if uncached:
+        generation = product_cache.generation
+        result = await db.execute(
+            select(models.Product).where(models.Product.code.in_(uncached))
+        )
+        for product in result.scalars().all():
+            bodies[product.code] = product_cache.put(product, generation)
+    
+    found = [bodies[code] for code in wanted if bodies[code] is not None]
+    missing = [code for code in wanted if bodies[code] is None]
+    content = b'{"items":[' + b",".join(found) + b'],"missing":' + json.dumps(missing).encode() + b"}"
+    return Response(content=content, media_type="application/json")
+
+@router.get("/changes", response_model=schemas.ProductChanges)
+async def get_product_changes(
+    since: Optional[str] = Query(None, description="Cursor from the previous sync, \"<epoch>.<seq>\""),
+    limit: int = Query(DEFAULT_CHANGES_LIMIT, gt=0, le=MAX_CHANGES_LIMIT),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Products created, updated or deleted since ``since`` (everything when
+    omitted). Request again with the returned cursor while ``has_more``."""
+    return await changes_since(db, since, limit)
+
+@router.get("/snapshot")
+async def get_product_snapshot(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """The whole catalog as compact gzip'd JSON rows (format in
+    app/catalog_snapshot.py), with the catalog version as ETag."""
+    etag, body = await catalog_snapshot.get(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in (accept_encoding or ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/search", response_model=schemas.ProductResponse)
 async def search_products(
     query: str,
-    page: int = 1,
-    limit: int = 10,
-    db: AsyncSession = Depends(get_db)
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    mode: Optional[schemas.ProductSearchMode] = None,
+    cursor: Optional[str] = None,
+    approximate: bool = False,
+    db: AsyncSession = Depends(get_read_db)
 ):
     skip = (page - 1) * limit
     
+    # Served from the in-memory catalog unless another mode is asked for
+    # or the catalog has not been loaded
+    if mode in (None, schemas.ProductSearchMode.MEMORY) and catalog_index.ready:
+        after = decode_cursor(cursor, SEARCH_KEYS)[0] if cursor else None
+        total, items, next_after = catalog_index.search(query, skip, limit, after)
+        return {
+            "total": total,
+            "items": items,
+            "next_cursor": encode_cursor([next_after]) if next_after is not None else None
+        }
+    
+    if mode == schemas.ProductSearchMode.FTS:
+        if cursor:
+            raise HTTPException(status_code=400, detail="Full-text search results are paged by page number")
+        return await search_products_fts(query, skip, limit, db)
+    
     # Create search query
     search_query = select(models.Product).where(
         or_(
@@ -51,23 +325,102 @@ async def search_products(
         )
     )
     
-    # Get total count
-    result = await db.execute(select(models.Product).where(search_query.whereclause))
-    total = len(result.scalars().all())
+    return await paginate(
+        db, search_query, SEARCH_KEYS,
+        page=page, limit=limit, cursor=cursor, approximate=approximate
+    )
+
+async def search_products_fts(query: str, skip: int, limit: int, db: AsyncSession):
+    """Search the products_fts index; every query term matches as a prefix."""
+    match = fts_match_expression(query)
+    if not match:
+        return {"total": 0, "items": []}
+    
+    fts_table = literal_column("products_fts")
+    matches = fts_table.op("MATCH")(match)
+    total = await db.scalar(
+        select(func.count()).select_from(products_fts).where(matches)
+    )
+    
+    # Ranking every hit of a one-letter prefix costs far more than it is
+    # worth, so large result sets come back in catalog order instead.
+    # Code hits weigh more than name hits.
+    if total <= FTS_RANK_LIMIT:
+        order_by = (func.bm25(fts_table, 10.0, 1.0), products_fts.c.rowid)
+    else:
+        order_by = (products_fts.c.rowid,)
+    result = await db.execute(
+        select(products_fts.c.rowid).where(matches)
+        .order_by(*order_by)
+        .offset(skip)
+        .limit(limit)
+    )
+    ids = result.scalars().all()
     
-    # Get paginated results
-    result = await db.execute(search_query.offset(skip).limit(limit))
-    products = result.scalars().all()
+    result = await db.execute(
+        select(models.Product).where(models.Product.id.in_(ids))
+    )
+    products = {product.id: product for product in result.scalars().all()}
     
     return {
         "total": total,
-        "items": products
+        "items": [products[id] for id in ids if id in products]
     }
 
+@router.get("/recommendations", response_model=List[schemas.RecommendedProduct])
+async def get_recommendations(
+    ids: str = Query(..., description="Comma-separated product ids in the cart"),
+    limit: int = Query(DEFAULT_RECOMMENDATIONS, ge=1, le=MAX_RECOMMENDATIONS),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Products also bought with the ones in the cart, in stock, best first.
+
+    Empty until the co-purchase index has been built after startup.
+    """
+    try:
+        cart = list(dict.fromkeys(int(product_id) for product_id in ids.split(",") if product_id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(cart) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_IDS} ids per request")
+
+    scored = copurchase_index.recommend(cart)
+    if not catalog_index.ready:
+        result = await db.execute(
+            select(models.Product).where(models.Product.id.in_([product_id for product_id, _ in scored]))
+        )
+        found = {product.id: schemas.Product.model_validate(product).model_dump() for product in result.scalars().all()}
+        lookup = found.get
+    else:
+        lookup = catalog_index.get
+
+    recommended = []
+    for product_id, score in scored:
+        product = lookup(product_id)
+        if product is None or product["quantity"] <= 0:
+            continue
+        recommended.append({**product, "score": score})
+        if len(recommended) == limit:
+            break
+    return recommended
+
+@router.post("/recommendations/rebuild", response_model=schemas.RecommendationIndexStatus, status_code=202)
+async def rebuild_recommendations(background_tasks: BackgroundTasks):
+    """Rebuild the co-purchase index from all invoices in the background;
+    recommendations keep coming from the current one until it is done."""
+    if not copurchase_index.loading:
+        background_tasks.add_task(copurchase_index.load, ReadSessionLocal)
+    return schemas.RecommendationIndexStatus(
+        ready=copurchase_index.ready,
+        rebuilding=True,
+        baskets=copurchase_index.baskets,
+        memory_bytes=copurchase_index.memory_bytes()
+    )
+
 @router.get("/{product_id}", response_model=schemas.Product)
 async def get_product(
     product_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     result = await db.execute(
         select(models.Product).filter(models.Product.id == product_id)
@@ -98,4 +451,7 @@ async def update_product(
     
     await db.commit()
     await db.refresh(db_product)
+    catalog_index.upsert(db_product)
+    product_cache.invalidate(product_ids=[product_id])
+    analytics_cache.invalidate()
     return db_product
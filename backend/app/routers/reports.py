@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, Date, Integer
+from sqlalchemy.sql import Select
+from datetime import date
+from typing import Dict, List, Optional
+from .. import models, schemas
+from ..database import get_read_db
+from ..rollups import product_totals
+from ..analytics import analytics_page, product_analytics
+
+# Sales reports. They read only the rollup tables (see app/rollups.py), so
+# their cost follows the length of the range asked for, not of the history.
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+MAX_TOP_PRODUCTS = 100
+MAX_ANALYTICS_PAGE = 1000
+
+def revenue_by_period(start: date, end: date, period: schemas.ReportPeriod) -> Select:
+    """Sales of each day, week or month from ``start`` to ``end`` (days,
+    inclusive), labelled with the period's first day."""
+    day = models.SalesDaily.day
+    if period == schemas.ReportPeriod.WEEK:
+        # The Sunday on or after the day, back to its Monday
+        period_start = func.date(day, "weekday 0", "-6 days", type_=Date)
+    elif period == schemas.ReportPeriod.MONTH:
+        period_start = func.date(day, "start of month", type_=Date)
+    else:
+        period_start = day
+    return (
+        select(
+            period_start.label("period_start"),
+            func.sum(models.SalesDaily.invoice_count).label("invoice_count"),
+            func.sum(models.SalesDaily.units).label("units"),
+            func.sum(models.SalesDaily.revenue).label("revenue"),
+        )
+        .where(day.between(start, end))
+        .group_by(period_start)
+        .order_by(period_start)
+    )
+
+async def top_products(
+    db: AsyncSession, start: date, end: date, order: schemas.TopProductsOrder, limit: int
+) -> List[schemas.TopProduct]:
+    """The ``limit`` best selling products from ``start`` to ``end``."""
+    sold: Dict[int, List[float]] = {}
+    for stmt in product_totals(start, end):
+        for product_id, quantity, revenue in (await db.execute(stmt)).all():
+            totals = sold.setdefault(product_id, [0, 0.0])
+            totals[0] += quantity
+            totals[1] += revenue
+    key = 0 if order == schemas.TopProductsOrder.QUANTITY else 1
+    top = sorted(sold.items(), key=lambda item: (-item[1][key], item[0]))[:limit]
+
+    result = await db.execute(
+        select(models.Product.id, models.Product.code, models.Product.name)
+        .where(models.Product.id.in_([product_id for product_id, _ in top]))
+    )
+    names = {product_id: (code, name) for product_id, code, name in result.all()}
+    products = []
+    for product_id, (quantity, revenue) in top:
+        code, name = names.get(product_id, (None, None))  # deleted since
+        products.append(schemas.TopProduct(
+            product_id=product_id, code=code, name=name, quantity=quantity, revenue=revenue
+        ))
+    return products
+
+def hourly_sales(start: date, end: date) -> Select:
+    """Sales by weekday and hour from ``start`` to ``end``; hours without
+    sales are left out."""
+    weekday = func.cast(func.strftime("%w", models.SalesHourly.day), Integer)
+    return (
+        select(
+            weekday.label("weekday"),
+            models.SalesHourly.hour,
+            func.sum(models.SalesHourly.invoice_count).label("invoice_count"),
+            func.sum(models.SalesHourly.revenue).label("revenue"),
+        )
+        .where(models.SalesHourly.day.between(start, end))
+        .group_by(weekday, models.SalesHourly.hour)
+        .order_by(weekday, models.SalesHourly.hour)
+    )
+
+def check_range(start: date, end: date) -> None:
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+@router.get("/revenue", response_model=List[schemas.RevenuePoint])
+async def get_revenue(
+    start: date,
+    end: date,
+    period: schemas.ReportPeriod = schemas.ReportPeriod.DAY,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Invoices, units and revenue per day, week or month; periods without
+    sales are left out."""
+    check_range(start, end)
+    result = await db.execute(revenue_by_period(start, end, period))
+    return result.mappings().all()
+
+@router.get("/top-products", response_model=List[schemas.TopProduct])
+async def get_top_products(
+    start: date,
+    end: date,
+    order: schemas.TopProductsOrder = schemas.TopProductsOrder.REVENUE,
+    limit: int = Query(10, ge=1, le=MAX_TOP_PRODUCTS),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Best selling products by revenue or units sold."""
+    check_range(start, end)
+    return await top_products(db, start, end, order, limit)
+
+@router.get("/hourly", response_model=List[schemas.HourlySales])
+async def get_hourly_sales(
+    start: date,
+    end: date,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Heatmap cells: sales by weekday and hour of day."""
+    check_range(start, end)
+    result = await db.execute(hourly_sales(start, end))
+    return result.mappings().all()
+
+@router.get("/products", response_model=schemas.ProductAnalyticsResponse)
+async def get_product_analytics(
+    start: date,
+    end: date,
+    abc_class: Optional[schemas.AbcClass] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(100, ge=1, le=MAX_ANALYTICS_PAGE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """ABC class, velocity, sell-through and changes against the previous
+    period of every product, best revenue first."""
+    check_range(start, end)
+    analytics = await product_analytics(db, start, end)
+    return analytics_page(analytics, start, end, abc_class, page, limit)
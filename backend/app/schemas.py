@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from uuid import UUID
 
@@ -22,6 +22,55 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductPatch(BaseModel):
+    id: int
+    code: Optional[str] = Field(None, min_length=1, max_length=50)
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+    price: Optional[float] = Field(None, gt=0)
+    quantity: Optional[int] = Field(None, ge=0)
+
+class ProductPatchStatus(str, Enum):
+    UPDATED = "updated"
+    NOT_FOUND = "not_found"
+    FAILED = "failed"
+
+class ProductPatchResult(BaseModel):
+    id: int
+    status: ProductPatchStatus
+    error: Optional[str] = None
+    product: Optional[Product] = None
+
+class ProductPatchReport(BaseModel):
+    updated: int = 0
+    results: List[ProductPatchResult]  # one per patch, in request order
+
+class BulkImportError(BaseModel):
+    row: int  # 1-based position in the request body or file
+    code: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: List[BulkImportError] = []  # the first 1000 errors
+
+class ImportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ImportJob(BaseModel):
+    job_id: str
+    filename: str
+    status: ImportJobStatus = ImportJobStatus.PENDING
+    rows_read: int = 0
+    report: BulkImportReport = Field(default_factory=BulkImportReport)
+    detail: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
 # Inventory Schemas
 class InventoryRecordBase(BaseModel):
     product_id: int
@@ -61,6 +110,27 @@ class InvoiceBase(BaseModel):
 class InvoiceCreate(InvoiceBase):
     pass
 
+class OfflineInvoiceCreate(InvoiceBase):
+    client_txn_id: UUID  # generated by the terminal when the sale was made
+
+class InvoiceBatchStatus(str, Enum):
+    CREATED = "created"
+    DUPLICATE = "duplicate"  # recorded by an earlier replay
+    FAILED = "failed"
+
+class InvoiceBatchResult(BaseModel):
+    client_txn_id: UUID
+    status: InvoiceBatchStatus
+    invoice_id: Optional[int] = None
+    invoice_number: Optional[str] = None
+    error: Optional[str] = None
+
+class InvoiceBatchResponse(BaseModel):
+    created: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    results: List[InvoiceBatchResult]  # one per transaction, in request order
+
 class Invoice(BaseModel):
     id: int
     invoice_number: str
@@ -112,6 +182,11 @@ class User(UserBase):
         from_attributes = True
 
 # Search Schemas
+class ProductSearchMode(str, Enum):
+    LIKE = "like"  # substring match on code and name
+    FTS = "fts"  # full-text prefix match, diacritic-insensitive, ranked by bm25
+    MEMORY = "memory"  # in-process catalog index, substring match with folding
+
 class ProductSearch(BaseModel):
     query: str = Field(..., min_length=1)
     page: int = Field(default=1, gt=0)
@@ -121,14 +196,138 @@ class ProductSearch(BaseModel):
 class ProductResponse(BaseModel):
     total: int
     items: List[Product]
+    next_cursor: Optional[str] = None
+
+class ProductBatchResponse(BaseModel):
+    items: List[Product]
+    missing: List[int]  # requested ids that matched no product
+
+class ProductLookupResponse(BaseModel):
+    items: List[Product]
+    missing: List[str]  # requested codes that matched no product
+
+class RecommendedProduct(Product):
+    score: float  # summed share of each cart product's invoices that had this one
+
+class RecommendationIndexStatus(BaseModel):
+    ready: bool
+    rebuilding: bool
+    baskets: int
+    memory_bytes: int
+
+class ProductTombstone(BaseModel):
+    id: int
+    code: str
+
+class ProductChanges(BaseModel):
+    cursor: str  # "<epoch>.<seq>", pass back as ?since= (see app/catalog_sync.py)
+    reset: bool = False  # the cursor was from another catalog: drop local products first
+    has_more: bool = False
+    items: List[Product]
+    deleted: List[ProductTombstone]
 
 class InventoryResponse(BaseModel):
     total: int
     items: List[InventoryRecord]
+    next_cursor: Optional[str] = None
 
 class InvoiceResponse(BaseModel):
     total: int
     items: List[Invoice]
+    next_cursor: Optional[str] = None
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"  # one JSON object per line
+
+class EscposMode(str, Enum):
+    TEXT = "text"  # printer's Vietnamese code page
+    RASTER = "raster"  # lines drawn as bit images, for any printer
+
+class InvoiceListView(str, Enum):
+    FULL = "full"
+    SUMMARY = "summary"  # invoice columns and item count, no items
+
+class InvoiceSummary(BaseModel):
+    id: int
+    invoice_number: str
+    total_amount: float
+    created_at: datetime
+    item_count: int
+
+class InvoiceSummaryResponse(BaseModel):
+    total: int
+    items: List[InvoiceSummary]
+    next_cursor: Optional[str] = None
+
+class ReportPeriod(str, Enum):
+    DAY = "day"
+    WEEK = "week"  # Monday to Sunday
+    MONTH = "month"
+
+class RevenuePoint(BaseModel):
+    period_start: date
+    invoice_count: int
+    units: int
+    revenue: float
+
+class TopProductsOrder(str, Enum):
+    REVENUE = "revenue"
+    QUANTITY = "quantity"
+
+class TopProduct(BaseModel):
+    product_id: int
+    code: Optional[str] = None  # None once the product is deleted
+    name: Optional[str] = None
+    quantity: int
+    revenue: float
+
+class HourlySales(BaseModel):
+    weekday: int  # 0 = Sunday ... 6 = Saturday
+    hour: int  # 0-23, server local time
+    invoice_count: int
+    revenue: float
+
+class AbcClass(str, Enum):
+    A = "A"  # products making the first 80% of revenue
+    B = "B"  # the next 15%
+    C = "C"  # the rest, and products without sales
+
+class ProductAnalytics(BaseModel):
+    product_id: int
+    code: str
+    name: str
+    abc_class: AbcClass
+    units: int
+    revenue: float
+    revenue_share: float  # of the period's revenue
+    velocity: float  # units per day
+    sell_through: float  # units / (units + stock at the end of the period)
+    stock: int
+    previous_units: int
+    previous_revenue: float
+    units_change: int
+    revenue_change: float
+    revenue_change_pct: Optional[float] = None  # None without previous revenue
+
+class ProductAnalyticsResponse(BaseModel):
+    start: date
+    end: date
+    previous_start: date  # the period compared against, of the same length
+    previous_end: date
+    revenue: float
+    previous_revenue: float
+    total: int
+    items: List[ProductAnalytics]
+
+class RestockRecommendation(BaseModel):
+    product: Product
+    daily_demand: float  # forecast units per day
+    reorder_point: int
+    order_up_to: int
+    order_quantity: int  # order_up_to less the stock on hand
+    days_of_cover: Optional[float] = None  # stock / daily demand; None without demand
+    computed_at: datetime
 
 class UserProfile(BaseModel):
     id: UUID
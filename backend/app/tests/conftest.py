@@ -0,0 +1,93 @@
+"""Shared fixtures: a migrated SQLite database per test, its writer queue
+and the server's time zone.
+
+A module picks its rows by overriding ``seed`` (or
+``seed_before_migrations``, for data the migrations have to backfill), or a
+test by parametrizing it: ``@pytest.mark.parametrize("seed", [...])``.
+Each is a ``{model: rows}`` mapping, inserted in order.
+"""
+import os
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import forecasting, models, product_import
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.routers import inventory, invoices, products
+from app.write_queue import WriteQueue
+
+# Modules that write through the app's writer queue
+WRITE_QUEUE_USERS = (forecasting, inventory, invoices, product_import, products)
+
+@pytest.fixture
+def seed():
+    return {}
+
+@pytest.fixture
+def seed_before_migrations():
+    return {}
+
+async def insert_seed(conn, seed):
+    for model, rows in seed.items():
+        if rows:
+            await conn.execute(insert(model), rows)
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'pos.db'}"
+
+@pytest_asyncio.fixture
+async def engine(database_url, seed, seed_before_migrations):
+    """Writer engine of a fresh database, with the schema, the migrations and the seed rows."""
+    engine = create_engine_for_profile(database_url, SQLiteProfile())
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await insert_seed(conn, seed_before_migrations)
+    await run_migrations(engine)
+    async with engine.begin() as conn:
+        await insert_seed(conn, seed)
+    yield engine
+    await engine.dispose()
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(engine, class_=AsyncSession)
+
+@pytest_asyncio.fixture
+async def reader(engine, database_url):
+    """Read-only engine on the same database. Writer sessions begin
+    IMMEDIATE, so a test reading while the queue writes reads through this."""
+    reader = create_engine_for_profile(database_url, SQLiteProfile().for_readers())
+    yield reader
+    await reader.dispose()
+
+@pytest_asyncio.fixture
+async def write_queue(session_factory, monkeypatch):
+    """Writer queue on the test database, in place of the app's."""
+    queue = WriteQueue(session_factory)
+    for module in WRITE_QUEUE_USERS:
+        monkeypatch.setattr(module, "write_queue", queue)
+    yield queue
+    await queue.stop()
+
+@pytest.fixture
+def server_tz():
+    """Report and export days are the server's local days; pin the time
+    zone (UTC unless the test sets another)."""
+    saved = os.environ.get("TZ")
+
+    def set_tz(name):
+        os.environ["TZ"] = name
+        time.tzset()
+
+    set_tz("UTC")
+    yield set_tz
+    if saved is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = saved
+    time.tzset()
@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.catalog_snapshot import SNAPSHOT_COLUMNS, CatalogSnapshot
+from app.routers import products
+
+@pytest.fixture
+def seed():
+    return {models.Product: [
+        {"code": "SP001", "name": "Cà phê sữa", "price": 25000, "quantity": 3},
+        {"code": "SP002", "name": "Trà đá", "price": 5000, "quantity": 10},
+    ]}
+
+async def snapshot_of(engine, snapshot):
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        return await snapshot.get(db)
+
+@pytest.mark.asyncio
+async def test_snapshot_rows_and_cursor(engine):
+    """Test the snapshot holds every product as a row, tagged with the sync cursor."""
+    etag, body = await snapshot_of(engine, CatalogSnapshot())
+    data = json.loads(gzip.decompress(body))
+
+    async with engine.connect() as conn:
+        state = (await conn.execute(select(models.CatalogSyncState))).one()
+    assert data["cursor"] == f"{state.epoch}.{state.seq}"
+    assert etag == f'"{state.epoch}.{state.catalog_seq}"'
+    assert data["columns"] == list(SNAPSHOT_COLUMNS)
+    assert data["count"] == 2
+    rows = [dict(zip(data["columns"], row)) for row in data["rows"]]
+    assert [(row["code"], row["name"], row["price"]) for row in rows] == [
+        ("SP001", "Cà phê sữa", 25000.0), ("SP002", "Trà đá", 5000.0)
+    ]
+
+@pytest.mark.asyncio
+async def test_snapshot_rebuilt_only_after_a_change(engine):
+    """Test the cached snapshot is reused through stock movements and rebuilt when the catalog changes."""
+    snapshot = CatalogSnapshot()
+    etag, body = await snapshot_of(engine, snapshot)
+    assert await snapshot_of(engine, snapshot) == (etag, body)
+    assert (await snapshot_of(engine, snapshot))[1] is body
+
+    async with engine.begin() as conn:
+        await conn.execute(update(models.Product).where(models.Product.code == "SP002").values(quantity=9))
+        # Same values: not a change
+        await conn.execute(update(models.Product).values(name=models.Product.name, price=models.Product.price))
+    assert (await snapshot_of(engine, snapshot))[1] is body
+
+    async with engine.begin() as conn:
+        await conn.execute(update(models.Product).where(models.Product.code == "SP002").values(price=6000))
+    new_etag, new_body = await snapshot_of(engine, snapshot)
+    assert new_etag != etag
+    row = json.loads(gzip.decompress(new_body))["rows"][1]
+    assert (row[3], row[4]) == (6000, 9)
+
+@pytest.mark.asyncio
+async def test_older_read_keeps_the_newer_snapshot(engine, reader):
+    """Test a request that read the catalog before the last rebuild does not put back an older snapshot."""
+    snapshot = CatalogSnapshot()
+    readers = sessionmaker(reader, class_=AsyncSession)
+    async with readers() as old_db:
+        await old_db.get(models.CatalogSyncState, 1)  # its read transaction starts here
+        async with engine.begin() as conn:
+            await conn.execute(update(models.Product).where(models.Product.code == "SP001").values(name="Bạc xỉu"))
+        async with readers() as db:
+            etag, body = await snapshot.get(db)
+        assert await snapshot.get(old_db) == (etag, body)
+    assert json.loads(gzip.decompress(body))["rows"][0][2] == "Bạc xỉu"
+
+@pytest.mark.asyncio
+async def test_snapshot_response_varies_by_encoding(session_factory, monkeypatch):
+    """Test the gzip'd and plain responses are told apart by caches, and a known ETag gets a 304."""
+    monkeypatch.setattr(products, "catalog_snapshot", CatalogSnapshot())
+    async with session_factory() as db:
+        zipped = await products.get_product_snapshot(if_none_match=None, accept_encoding="gzip, br", db=db)
+        plain = await products.get_product_snapshot(if_none_match=None, accept_encoding=None, db=db)
+        cached = await products.get_product_snapshot(if_none_match=zipped.headers["etag"], accept_encoding="gzip", db=db)
+    assert zipped.headers["content-encoding"] == "gzip" and "content-encoding" not in plain.headers
+    assert zipped.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(zipped.body) == plain.body
+    assert cached.status_code == 304
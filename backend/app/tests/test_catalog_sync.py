@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.catalog_sync import changes_since
+
+@pytest.fixture
+def seed():
+    return {models.Product: [
+        {"code": f"SP{i:03d}", "name": f"Product {i}", "price": 1000 * i, "quantity": i}
+        for i in range(1, 6)
+    ]}
+
+async def sync(engine, since=None, limit=500):
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        return await changes_since(db, since, limit)
+
+@pytest.mark.asyncio
+async def test_full_sync_then_only_changes(engine):
+    """Test a cursor returns only the products written or deleted after it."""
+    full = await sync(engine)
+    assert [product.code for product in full.items] == ["SP001", "SP002", "SP003", "SP004", "SP005"]
+    assert not full.has_more and not full.reset
+
+    async with engine.begin() as conn:
+        await conn.execute(update(models.Product).where(models.Product.code == "SP002").values(price=2500))
+        await conn.execute(delete(models.Product).where(models.Product.code == "SP004"))
+        await conn.execute(insert(models.Product), [{"code": "SP006", "name": "New", "price": 1, "quantity": 0}])
+
+    delta = await sync(engine, full.cursor)
+    assert [(product.code, product.price) for product in delta.items] == [("SP002", 2500), ("SP006", 1)]
+    assert [(product.id, product.code) for product in delta.deleted] == [(4, "SP004")]
+
+    assert (await sync(engine, delta.cursor)).items == []
+    assert (await sync(engine, delta.cursor)).cursor == delta.cursor
+
+@pytest.mark.asyncio
+async def test_cursor_walks_pages(engine):
+    """Test small pages cover every change exactly once, in order."""
+    seen, cursor, has_more = [], None, True
+    while has_more:
+        page = await sync(engine, cursor, limit=2)
+        seen += [product.code for product in page.items]
+        cursor, has_more = page.cursor, page.has_more
+    assert seen == ["SP001", "SP002", "SP003", "SP004", "SP005"]
+
+@pytest.mark.asyncio
+async def test_foreign_cursor_resets(engine):
+    """Test a cursor from another catalog restarts from scratch, a malformed one is a 400."""
+    page = await sync(engine, "0000000000000000.3")
+    assert page.reset
+    assert len(page.items) == 5
+
+    with pytest.raises(HTTPException) as exc_info:
+        await sync(engine, "not-a-cursor")
+    assert exc_info.value.status_code == 400
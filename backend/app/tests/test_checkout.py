@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+from functools import partial
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import models, schemas
+from app.routers.inventory import record_stock_change
+from app.routers.invoices import checkout, next_invoice_number
+from app.write_queue import WriteQueue
+
+@pytest.fixture
+def seed():
+    return {models.Product: [
+        {"code": "LAST", "name": "Last units", "price": 10, "quantity": 20},
+        {"code": "PLENTY", "name": "Plenty", "price": 5, "quantity": 1000},
+    ]}
+
+def sale(last: int, plenty: int = 1) -> schemas.InvoiceCreate:
+    return schemas.InvoiceCreate(items=[
+        schemas.InvoiceItemCreate(product_id=2, quantity=plenty, unit_price=5),
+        schemas.InvoiceItemCreate(product_id=1, quantity=last, unit_price=10),
+    ])
+
+@pytest.mark.asyncio
+async def test_checkout_is_set_based(engine):
+    """Test a sale decrements stock, writes items and ledger rows, and merges repeated products."""
+    invoice = schemas.InvoiceCreate(items=[
+        schemas.InvoiceItemCreate(product_id=1, quantity=2, unit_price=10),
+        schemas.InvoiceItemCreate(product_id=2, quantity=1, unit_price=5),
+        schemas.InvoiceItemCreate(product_id=1, quantity=3, unit_price=9),
+    ])
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        result = await checkout(db, invoice)
+        await db.commit()
+        quantities = dict((await db.execute(select(models.Product.code, models.Product.quantity))).all())
+        ledger = (await db.execute(select(func.sum(models.InventoryRecord.quantity_change)))).scalar()
+
+    assert result.total_amount == 52
+    assert [(item.product_id, item.total_price) for item in result.items] == [(1, 20), (2, 5), (1, 27)]
+    assert quantities == {"LAST": 15, "PLENTY": 999}
+    assert ledger == -6
+
+@pytest.mark.asyncio
+async def test_insufficient_line_rolls_back_the_sale(engine):
+    """Test a sale with one short line changes no stock at all."""
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        with pytest.raises(HTTPException) as exc_info:
+            async with db.begin_nested():
+                await checkout(db, sale(last=21))
+        assert exc_info.value.status_code == 400
+        assert "Last units" in exc_info.value.detail
+        quantities = (await db.execute(select(models.Product.quantity).order_by(models.Product.id))).scalars().all()
+    assert quantities == [20, 1000]
+
+@pytest.mark.asyncio
+async def test_concurrent_tills_never_oversell(engine):
+    """Stress test: two writers race 120 sales for 20 units; stock never goes negative."""
+    session_factory = sessionmaker(engine, class_=AsyncSession)
+    # Two queues stand in for two server processes sharing the database
+    queues = [WriteQueue(session_factory, max_batch=8), WriteQueue(session_factory, max_batch=8)]
+    sales = [sale(last=1 + n % 3) for n in range(120)]
+    outcomes = await asyncio.gather(*[
+        queues[n % 2].submit(partial(checkout, invoice=invoice)) for n, invoice in enumerate(sales)
+    ], return_exceptions=True)
+    for queue in queues:
+        await queue.stop()
+
+    sold = [invoice for invoice, outcome in zip(sales, outcomes) if not isinstance(outcome, Exception)]
+    failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    assert all(isinstance(error, HTTPException) and error.status_code == 400 for error in failures)
+
+    async with session_factory() as db:
+        last, plenty = (await db.execute(select(models.Product.quantity).order_by(models.Product.id))).scalars().all()
+        invoices = (await db.execute(select(func.count()).select_from(models.Invoice))).scalar()
+        ledger = (await db.execute(
+            select(func.sum(models.InventoryRecord.quantity_change)).where(models.InventoryRecord.product_id == 1)
+        )).scalar()
+    units = sum(invoice.items[1].quantity for invoice in sold)
+    assert last >= 0
+    assert last == 20 - units == 20 + ledger
+    assert plenty == 1000 - len(sold)
+    assert invoices == len(sold)
+
+    async with session_factory() as db:
+        numbers = (await db.execute(select(models.Invoice.invoice_number))).scalars().all()
+    assert sorted(int(number.rsplit("-", 1)[1]) for number in numbers) == list(range(1, len(sold) + 1))
+
+@pytest.mark.asyncio
+async def test_invoice_numbers_count_per_day_and_store(engine):
+    """Test each store's day has its own sequence, continued from the stored value."""
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        db.add(models.InvoiceSequence(store_id=0, day="20240101", last_value=41))
+        await db.flush()
+        numbers = [
+            await next_invoice_number(db, datetime(2024, 1, 1)),
+            await next_invoice_number(db, datetime(2024, 1, 1, 23, 59)),
+            await next_invoice_number(db, datetime(2024, 1, 2)),
+            await next_invoice_number(db, datetime(2024, 1, 1), store_id=7),
+        ]
+    assert numbers == ["INV-20240101-0042", "INV-20240101-0043", "INV-20240102-0001", "INV-20240101-0001"]
+
+@pytest.mark.asyncio
+async def test_empty_cart_records_an_empty_invoice(engine):
+    """Test a sale with no lines records a zero invoice and touches no stock."""
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        result = await checkout(db, schemas.InvoiceCreate(items=[]))
+        await db.commit()
+        ledger = (await db.execute(select(func.count()).select_from(models.InventoryRecord))).scalar()
+        quantities = (await db.execute(select(models.Product.quantity).order_by(models.Product.id))).scalars().all()
+
+    assert (result.total_amount, result.items) == (0, [])
+    assert ledger == 0
+    assert quantities == [20, 1000]
+
+@pytest.mark.asyncio
+async def test_stock_record_checks_the_current_stock(engine):
+    """Test a stock movement is checked against the stock in the database, not a stale copy in the session."""
+    async with sessionmaker(engine, class_=AsyncSession)() as db:
+        product = await db.get(models.Product, 1)
+        # Another unit of the batch sold most of it without going through this object
+        await db.execute(text("UPDATE products SET quantity = 3 WHERE id = 1"))
+        with pytest.raises(HTTPException) as exc_info:
+            async with db.begin_nested():
+                await record_stock_change(db, schemas.InventoryRecordCreate(product_id=1, quantity_change=-5))
+        assert exc_info.value.status_code == 400
+        await record_stock_change(db, schemas.InventoryRecordCreate(product_id=1, quantity_change=-3))
+        assert product.quantity == 0
+        await db.commit()
+        quantity = (await db.execute(select(models.Product.quantity).where(models.Product.id == 1))).scalar()
+    assert quantity == 0
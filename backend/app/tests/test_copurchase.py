@@ -0,0 +1,107 @@
+from contextlib import asynccontextmanager
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import models, schemas
+from app.catalog_index import CatalogIndex
+from app.copurchase_index import CopurchaseIndex
+from app.routers import invoices, products
+
+def test_space_saving_keeps_frequent_neighbors():
+    """Test a full product keeps its most bought-with neighbors when a new one arrives."""
+    index = CopurchaseIndex(slots=2)
+    index.ready = True
+    for basket in [[1, 2], [1, 2], [1, 2], [1, 3], [1, 3], [1, 4]]:
+        index.record(0, basket)
+
+    assert index.neighbors(1) == [(2, 3), (4, 3)]
+    assert index.neighbors(4) == [(1, 1)]
+    # 1 was in all six invoices, 2 in three: from 2's side, 1 is a sure thing
+    assert index.recommend([2]) == [(1, 1.0)]
+    assert index.recommend([1, 2]) == [(4, 0.5)]
+    # Two 4-byte arrays of slots per product id, plus its basket count
+    assert index.memory_bytes() == (2 * 2 + 1) * 4 * len(index._product_baskets)
+
+def test_baskets_are_distinct_products():
+    """Test a product on several lines of an invoice counts once."""
+    index = CopurchaseIndex(slots=4)
+    index.ready = True
+    index.record(0, [5, 6, 5])
+    assert index.neighbors(5) == [(6, 1)]
+    assert index._product_baskets[5] == 1
+    assert index.recommend([7, 0, -1]) == []
+
+@pytest.fixture
+def seed():
+    return {
+        models.Product: [
+            {"code": "CAFE", "name": "Cà phê", "price": 20, "quantity": 100},
+            {"code": "SUA", "name": "Sữa đặc", "price": 25, "quantity": 100},
+            {"code": "DUONG", "name": "Đường", "price": 15, "quantity": 100},
+            {"code": "BANH", "name": "Bánh mì", "price": 10, "quantity": 0},
+            {"code": "TRA", "name": "Trà", "price": 30, "quantity": 100},
+        ],
+        models.Invoice: [{"invoice_number": f"INV-{n}", "total_amount": 0} for n in range(1, 5)],
+        models.InvoiceItem: [
+            {"invoice_id": invoice_id, "product_id": product_id, "quantity": 1, "unit_price": 1, "total_price": 1}
+            for invoice_id, basket in {1: [1, 2], 2: [1, 2, 3], 3: [1, 4], 4: [5]}.items()
+            for product_id in basket
+        ],
+    }
+
+@pytest.fixture
+def read_sessions(reader, write_queue, monkeypatch):
+    index = CopurchaseIndex()
+    monkeypatch.setattr(invoices, "copurchase_index", index)
+    monkeypatch.setattr(products, "copurchase_index", index)
+    catalog = CatalogIndex()
+    monkeypatch.setattr(invoices, "catalog_index", catalog)
+    monkeypatch.setattr(products, "catalog_index", catalog)
+    return sessionmaker(reader, class_=AsyncSession)
+
+def offline_sale(*product_ids: int) -> schemas.OfflineInvoiceCreate:
+    return schemas.OfflineInvoiceCreate(
+        client_txn_id=uuid4(),
+        items=[schemas.InvoiceItemCreate(product_id=product_id, quantity=1, unit_price=1) for product_id in product_ids]
+    )
+
+@pytest.mark.asyncio
+async def test_recommendations_follow_new_sales(read_sessions):
+    """Test recommendations come from past invoices, skip the cart and products out of stock, and
+    pick up sales made during and after the build."""
+    index = products.copurchase_index
+    async with read_sessions() as db:
+        # Not built yet
+        assert await products.get_recommendations(ids="1", limit=10, db=db) == []
+
+        @asynccontextmanager
+        async def session_then_sale():
+            async with read_sessions() as db:
+                yield db
+            # A till checks out after the build has read the invoices
+            await invoices.create_invoice_batch([offline_sale(1, 3)])
+
+        await index.load(session_then_sale)
+        assert index.ready and index.baskets == 5
+
+        # Without the catalog index, product data is read from the database
+        recommended = await products.get_recommendations(ids="1", limit=10, db=db)
+        assert [(product["code"], product["score"]) for product in recommended] == [
+            ("SUA", pytest.approx(2 / 4)), ("DUONG", pytest.approx(2 / 4))
+        ]
+
+        await products.catalog_index.load(read_sessions)
+        await invoices.create_invoice_batch([offline_sale(2, 5), offline_sale(2, 5)])
+        recommended = await products.get_recommendations(ids="2,1", limit=2, db=db)
+        # DUONG: with 1 in two of its four invoices and with 2 in one of four
+        assert [(product["code"], product["score"]) for product in recommended] == [
+            ("DUONG", pytest.approx(3 / 4)), ("TRA", pytest.approx(2 / 4))
+        ]
+        assert recommended[1]["quantity"] == 98
+
+        with pytest.raises(HTTPException) as exc_info:
+            await products.get_recommendations(ids="1,x", limit=10, db=db)
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+from app.database import SQLiteProfile, create_engine_for_profile
+
+@pytest.mark.asyncio
+async def test_profile_pragmas_applied(database_url):
+    """Test every pooled connection gets the tuned PRAGMAs."""
+    profile = SQLiteProfile(busy_timeout=1234, cache_size=-2000)
+    engine = create_engine_for_profile(database_url, profile)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1  # NORMAL
+            assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 1234
+            assert (await conn.execute(text("PRAGMA cache_size"))).scalar() == -2000
+            assert (await conn.execute(text("PRAGMA temp_store"))).scalar() == 2  # MEMORY
+        assert engine.pool.size() == profile.pool_size
+    finally:
+        await engine.dispose()
+
+def test_profile_from_env(monkeypatch):
+    """Test profile fields can be overridden from the environment."""
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT", "9000")
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "FULL")
+    monkeypatch.setenv("SQLITE_POOL_SIZE", "2")
+    profile = SQLiteProfile.from_env()
+    assert profile.busy_timeout == 9000
+    assert profile.synchronous == "FULL"
+    assert profile.pool_size == 2
+    assert "PRAGMA busy_timeout=9000" in profile.pragmas()
+
+@pytest.mark.asyncio
+async def test_reader_profile_is_query_only(engine, reader):
+    """Test the reader engine runs deferred transactions and refuses writes."""
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        await conn.execute(text("INSERT INTO t VALUES (1)"))
+    async with engine.connect() as write_conn, reader.connect() as read_conn:
+        # A writer holding the lock does not block readers
+        await write_conn.execute(text("INSERT INTO t VALUES (2)"))
+        assert (await read_conn.execute(text("SELECT count(*) FROM t"))).scalar() == 1
+        with pytest.raises(Exception, match="readonly"):
+            await read_conn.execute(text("INSERT INTO t VALUES (3)"))
+        await write_conn.commit()
@@ -0,0 +1,56 @@
+import unicodedata
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from app.utils import escpos
+from app.utils.escpos import (
+    ESC_INIT, FEED_AND_CUT, PAPER_COLUMNS, encode_text, receipt_lines, render_raster, render_text
+)
+
+def invoice():
+    product = SimpleNamespace(code="SP001", name="Cà phê sữa đá thật là ngon, ly lớn có thêm thạch")
+    return SimpleNamespace(
+        invoice_number="INV-20240101-0001",
+        created_at=datetime(2024, 1, 1, 9, 30),
+        total_amount=58000,
+        items=[SimpleNamespace(product=product, quantity=2, unit_price=29000, total_price=58000)],
+    )
+
+def test_encode_vietnamese_round_trip():
+    """Test Vietnamese text survives Windows-1258, with tone marks split where needed."""
+    text = "HÓA ĐƠN BÁN HÀNG Cà phê sữa đá Ượt ạ Tổng cộng"
+    encoded = encode_text(text)
+    assert b"?" not in encoded
+    assert unicodedata.normalize("NFC", encoded.decode("cp1258")) == text
+    # "ữ" has no precomposed form: "ư" then the combining tilde
+    assert encode_text("ữ") == b"\xfd\xde"
+
+@pytest.mark.parametrize("paper", [58, 80])
+def test_receipt_fits_the_paper(paper):
+    """Test every line fits the paper and long product names wrap."""
+    lines = receipt_lines(invoice(), PAPER_COLUMNS[paper])
+    assert all(len(line.text) <= PAPER_COLUMNS[paper] for line in lines)
+    assert lines[-1].text.startswith("Tổng cộng:") and lines[-1].text.endswith("58,000 đ")
+
+    data = render_text(invoice(), paper)
+    assert data.startswith(ESC_INIT) and data.endswith(FEED_AND_CUT)
+    assert encode_text("INV-20240101-0001") in data
+
+def test_raster_receipt():
+    """Test raster receipts are bit images one paper width wide."""
+    data = render_raster(invoice(), 58)
+    assert data.startswith(ESC_INIT) and data.endswith(FEED_AND_CUT)
+    assert b"\x1dv0\x00" + (384 // 8).to_bytes(2, "little") in data
+
+def test_raster_receipt_without_the_font(monkeypatch):
+    """Test a missing receipt font is an error rather than a receipt without Vietnamese letters."""
+    monkeypatch.setattr(escpos, "FONT", "missing.ttf")
+    escpos._font.cache_clear()
+    escpos._raster_line.cache_clear()
+    try:
+        with pytest.raises(escpos.ReceiptFontError, match="missing.ttf"):
+            render_raster(invoice(), 80)
+    finally:
+        escpos._font.cache_clear()
+        escpos._raster_line.cache_clear()
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from app import models
+from app.database import get_read_db
+from app.routers import inventory, invoices
+
+@pytest.fixture
+def seed():
+    return {
+        models.Product: [
+            {"code": "SP001", "name": "Cà phê, sữa", "price": 10, "quantity": 100},
+            {"code": "SP002", "name": "Trà đá", "price": 5, "quantity": 100},
+        ],
+        models.Invoice: [
+            {"invoice_number": f"INV-{day:02d}", "total_amount": 15, "created_at": datetime(2024, 1, day, 23, 59)}
+            for day in (1, 2, 3)
+        ],
+        models.InvoiceItem: [
+            {"invoice_id": invoice_id, "product_id": product_id, "quantity": 1, "unit_price": price, "total_price": price}
+            for invoice_id in (1, 2, 3) for product_id, price in ((1, 10), (2, 5))
+        ],
+        models.InventoryRecord: [
+            {"product_id": 1, "quantity_change": change, "notes": note, "created_at": datetime(2024, 1, day)}
+            for day, change, note in ((1, 50, "restock"), (2, -1, "Sale invoice #INV-02"), (5, -3, "broken"))
+        ],
+    }
+
+@pytest_asyncio.fixture
+async def client(server_tz, session_factory, monkeypatch):
+    monkeypatch.setattr("app.export.EXPORT_BATCH_SIZE", 2)
+
+    async def read_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(invoices.router)
+    app.include_router(inventory.router)
+    app.dependency_overrides[get_read_db] = read_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+@pytest.mark.asyncio
+async def test_invoice_export_csv(client):
+    """Test the CSV export has one row per line of the invoices in the range, end day included."""
+    response = await client.get("/invoices/export", params={"start": "2024-01-01", "end": "2024-01-02"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="invoices-2024-01-01-2024-01-02.csv"' in response.headers["content-disposition"]
+    assert response.content.startswith(b"\xef\xbb\xbf")
+
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert [(row["invoice_number"], row["product_name"]) for row in rows] == [
+        ("INV-01", "Cà phê, sữa"), ("INV-01", "Trà đá"), ("INV-02", "Cà phê, sữa"), ("INV-02", "Trà đá"),
+    ]
+    assert rows[0]["created_at"] == "2024-01-01T23:59:00" and rows[0]["total_price"] == "10.0"
+
+@pytest.mark.asyncio
+async def test_inventory_export_ndjson(client):
+    """Test the ledger export as NDJSON, and that a reversed range is rejected."""
+    response = await client.get(
+        "/inventory/export", params={"start": "2024-01-01", "end": "2024-01-31", "format": "ndjson"}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    entries = [json.loads(line) for line in response.text.splitlines()]
+    assert [(entry["quantity_change"], entry["notes"]) for entry in entries] == [
+        (50, "restock"), (-1, "Sale invoice #INV-02"), (-3, "broken"),
+    ]
+    assert entries[0]["product_code"] == "SP001" and entries[0]["created_at"] == "2024-01-01T00:00:00"
+
+    response = await client.get("/inventory/export", params={"start": "2024-02-01", "end": "2024-01-01"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_export_days_are_local_days(client, server_tz):
+    """Test an export day is the server's local day, like reports and invoice numbers."""
+    # UTC+7: the invoices made at 23:59 UTC belong to the next local day
+    server_tz("ICT-7")
+    response = await client.get(
+        "/invoices/export", params={"start": "2024-01-02", "end": "2024-01-02", "format": "ndjson"}
+    )
+    assert {json.loads(line)["invoice_number"] for line in response.text.splitlines()} == {"INV-01"}
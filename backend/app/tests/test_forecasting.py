@@ -0,0 +1,104 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import forecasting, models
+from app.database import get_read_db
+from app.routers import inventory
+
+np = pytest.importorskip("numpy")
+
+TODAY = date(2024, 3, 25)  # a Monday
+
+def test_plan_follows_weekly_season():
+    """Test steady and weekly demand get matching reorder points, no demand gets none."""
+    days = forecasting.HISTORY_DAYS
+    weekly = np.tile(np.array([0, 0, 0, 0, 0, 0, 14], dtype=np.float32), days // 7)
+    demand = np.stack([np.full(days, 5, dtype=np.float32), weekly, np.zeros(days, dtype=np.float32)])
+
+    daily, reorder_point, order_up_to = forecasting.plan_restock(demand, lead_time=3, review=7, z=1.65)
+
+    assert daily == pytest.approx([5, 2, 0], abs=1e-3)
+    # 3 days of lead time at 5 a day, then 10 days of cover
+    assert (reorder_point[0], order_up_to[0]) == (15, 50)
+    # The next 3 days are quiet ones; the 10 days of cover include one peak
+    assert (reorder_point[1], order_up_to[1]) == (0, 14)
+    assert (reorder_point[2], order_up_to[2]) == (0, 0)
+
+@pytest.mark.asyncio
+async def test_restock_from_forecast(server_tz, engine, write_queue):
+    """Test the forecast counts sales and losses, and restock lists products below their reorder point."""
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Product), [
+            {"code": "FAST", "name": "Nước suối", "price": 5, "quantity": 30},
+            {"code": "SLOW", "name": "Ô dù", "price": 90, "quantity": 3},
+            {"code": "LOSS", "name": "Bánh bao", "price": 10, "quantity": 5},
+        ])
+        # Four weeks of sales: 10 FAST a day, one SLOW a week
+        days = [TODAY - timedelta(days=n) for n in range(1, 29)]
+        await conn.execute(insert(models.Invoice), [
+            {"invoice_number": f"INV-{n}", "total_amount": 50, "created_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=10)}
+            for n, day in enumerate(days, 1)
+        ])
+        await conn.execute(insert(models.InvoiceItem), [
+            {"invoice_id": n, "product_id": 1, "quantity": 10, "unit_price": 5, "total_price": 50}
+            for n in range(1, 29)
+        ] + [
+            {"invoice_id": n, "product_id": 2, "quantity": 1, "unit_price": 90, "total_price": 90}
+            for n in range(1, 29, 7)
+        ])
+        # LOSS never sells, but 4 a day are thrown away; sale records are not counted twice
+        await conn.execute(insert(models.InventoryRecord), [
+            {"product_id": 3, "quantity_change": -4, "notes": "Hết hạn", "created_at": datetime.combine(day, datetime.min.time()) + timedelta(hours=20)}
+            for day in days
+        ] + [
+            {"product_id": 1, "quantity_change": -10, "notes": f"Sale invoice #INV-{n}", "created_at": datetime.combine(day, datetime.min.time())}
+            for n, day in enumerate(days, 1)
+        ])
+
+    session_factory = sessionmaker(engine, class_=AsyncSession)
+    assert await forecasting.run_forecast(session_factory, today=TODAY) == 3
+
+    async def read_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(inventory.router)
+    app.dependency_overrides[get_read_db] = read_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        restock = (await client.get("/inventory/restock")).json()
+        low_stock = (await client.get("/inventory/low-stock")).json()
+        fixed = (await client.get("/inventory/low-stock", params={"threshold": 10})).json()
+
+    # FAST: 30 left is under 3 days at 10 a day (plus safety stock)
+    # LOSS: 5 left at 4 a day; SLOW: 3 left is plenty at one a week
+    assert [item["product"]["code"] for item in restock] == ["LOSS", "FAST"]
+    fast = restock[1]
+    assert fast["daily_demand"] == pytest.approx(10, rel=0.05)
+    assert fast["order_quantity"] == fast["order_up_to"] - 30 >= 70
+    assert restock[0]["days_of_cover"] == pytest.approx(5 / 4, rel=0.1)
+    assert {product["code"] for product in low_stock} == {"FAST", "LOSS"}
+    assert {product["code"] for product in fixed} == {"SLOW", "LOSS"}
+
+@pytest.mark.asyncio
+async def test_schedule_waits_after_a_run_without_plans(engine, monkeypatch):
+    """Test an empty catalog is forecast once per interval, not in a loop."""
+    runs = []
+
+    async def run_forecast(session_factory):
+        runs.append(session_factory)
+        return 0
+
+    monkeypatch.setattr(forecasting, "run_forecast", run_forecast)
+    task = asyncio.create_task(
+        forecasting.forecast_schedule(sessionmaker(engine, class_=AsyncSession), interval_hours=0.1 / 3600)
+    )
+    await asyncio.sleep(0.25)
+    task.cancel()
+    assert 1 <= len(runs) <= 3
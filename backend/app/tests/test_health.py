@@ -2,7 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.main import app
-from app.database import get_db
+from app.database import get_read_db
 
 client = TestClient(app)
 
@@ -14,7 +14,7 @@ async def override_get_db():
     finally:
         await db.close()
 
-app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 def test_health_check():
     """Test health check endpoint returns correct structure."""
@@ -48,10 +48,10 @@ async def test_database_error():
         raise Exception("Database connection error")
         yield None
     
-    app.dependency_overrides[get_db] = error_db
+    app.dependency_overrides[get_read_db] = error_db
     response = client.get("/health")
     assert response.status_code == 503
     assert "Database connection error" in response.json()["detail"]
     
     # Reset the override
-    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
@@ -0,0 +1,162 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from app import idempotency
+from app.idempotency import IdempotencyMiddleware, IdempotencyStore
+
+def make_app(store: IdempotencyStore):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, store=store)
+    app.state.calls = 0
+    app.state.gate = asyncio.Event()
+    app.state.gate.set()
+
+    @app.post("/sales")
+    async def record_sale(sale: dict):
+        app.state.calls += 1
+        await app.state.gate.wait()
+        if sale.get("fail") == "server":
+            raise HTTPException(status_code=503, detail="Try again")
+        if sale.get("fail") == "client":
+            raise HTTPException(status_code=400, detail="Insufficient stock")
+        return {"sale": app.state.calls}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        app.state.calls += 1
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        return {"size": size}
+
+    return app
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_retry_replays_stored_response():
+    """Test a retried request gets the stored response without running the endpoint."""
+    app = make_app(IdempotencyStore())
+    async with client(app) as c:
+        first = await c.post("/sales", json={"total": 10}, headers={"Idempotency-Key": "k1"})
+        retry = await c.post("/sales", json={"total": 10}, headers={"Idempotency-Key": "k1"})
+        other = await c.post("/sales", json={"total": 10}, headers={"Idempotency-Key": "k2"})
+        plain = await c.post("/sales", json={"total": 10})
+
+    assert first.json() == retry.json() == {"sale": 1}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert other.json() == {"sale": 2} and plain.json() == {"sale": 3}
+    assert app.state.calls == 3
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_first():
+    """Test a duplicate arriving while the first request runs waits and gets its response."""
+    app = make_app(IdempotencyStore())
+    app.state.gate.clear()
+    async with client(app) as c:
+        requests = [
+            asyncio.create_task(c.post("/sales", json={"total": 10}, headers={"Idempotency-Key": "k1"}))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        app.state.gate.set()
+        responses = await asyncio.gather(*requests)
+
+    assert app.state.calls == 1
+    assert [response.json() for response in responses] == [{"sale": 1}] * 3
+
+@pytest.mark.asyncio
+async def test_key_reuse_and_errors():
+    """Test a different body is rejected, 4xx responses are kept and 5xx are not."""
+    store = IdempotencyStore()
+    app = make_app(store)
+    async with client(app) as c:
+        await c.post("/sales", json={"total": 10}, headers={"Idempotency-Key": "k1"})
+        reused = await c.post("/sales", json={"total": 99}, headers={"Idempotency-Key": "k1"})
+        assert reused.status_code == 422
+
+        for _ in range(2):
+            response = await c.post("/sales", json={"fail": "client"}, headers={"Idempotency-Key": "k2"})
+            assert response.status_code == 400
+        for _ in range(2):
+            response = await c.post("/sales", json={"fail": "server"}, headers={"Idempotency-Key": "k3"})
+            assert response.status_code == 503
+
+        too_long = await c.post("/sales", json={}, headers={"Idempotency-Key": "k" * 300})
+        assert too_long.status_code == 400
+
+    # k1 once, k2 once (replayed), k3 twice (not kept)
+    assert app.state.calls == 4
+    assert store.replays == 1
+
+@pytest.mark.asyncio
+async def test_expired_keys_are_dropped():
+    """Test entries expire after the TTL and the store stays within its size."""
+    store = IdempotencyStore(ttl=0, max_keys=2)
+    app = make_app(store)
+    async with client(app) as c:
+        for n in range(5):
+            await c.post("/sales", json={"total": n}, headers={"Idempotency-Key": f"k{n}"})
+        again = await c.post("/sales", json={"total": 0}, headers={"Idempotency-Key": "k0"})
+
+    assert again.json() == {"sale": 6}
+    assert len(store) <= 2
+
+@pytest.mark.asyncio
+async def test_query_string_is_part_of_the_key():
+    """Test the same key and body with another query string is another request."""
+    app = make_app(IdempotencyStore())
+    async with client(app) as c:
+        first = await c.post("/sales?mode=a", json={"total": 10}, headers={"Idempotency-Key": "k1"})
+        other = await c.post("/sales?mode=b", json={"total": 10}, headers={"Idempotency-Key": "k1"})
+        retry = await c.post("/sales?mode=a", json={"total": 10}, headers={"Idempotency-Key": "k1"})
+
+    assert (first.json(), other.json(), retry.json()) == ({"sale": 1}, {"sale": 2}, {"sale": 1})
+
+@pytest.mark.asyncio
+async def test_long_body_is_streamed_through(monkeypatch):
+    """Test only the start of a long body is held, the app still gets all of it,
+    and bodies of another length are told apart."""
+    monkeypatch.setattr(idempotency, "MAX_HASHED_BODY", 8)
+    app = make_app(IdempotencyStore())
+
+    def upload(c, parts):
+        async def chunks():
+            for part in parts:
+                yield part
+        length = str(sum(len(part) for part in parts))
+        return c.post("/upload", content=chunks(), headers={"Idempotency-Key": "k1", "Content-Length": length})
+
+    async with client(app) as c:
+        first = await upload(c, [b"a" * 5] * 4)
+        retry = await upload(c, [b"a" * 5] * 4)
+        longer = await upload(c, [b"a" * 5] * 5)
+
+    assert first.json() == retry.json() == {"size": 20}
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert longer.status_code == 422
+    assert app.state.calls == 1
+
+@pytest.mark.asyncio
+async def test_large_response_is_not_kept(monkeypatch):
+    """Test a response over the size cap is not stored, and its retry is told it was applied instead of running again."""
+    monkeypatch.setattr(idempotency, "MAX_STORED_BODY", 12)
+    store = IdempotencyStore()
+    app = make_app(store)
+    async with client(app) as c:
+        small = await c.post("/sales", json={"total": 1}, headers={"Idempotency-Key": "k1"})
+        large = await c.post("/upload", content=b"a" * 1000, headers={"Idempotency-Key": "k2"})
+        small_retry = await c.post("/sales", json={"total": 1}, headers={"Idempotency-Key": "k1"})
+        large_retry = await c.post("/upload", content=b"a" * 1000, headers={"Idempotency-Key": "k2"})
+
+    assert small_retry.json() == small.json() == {"sale": 1}
+    assert large.json() == {"size": 1000}
+    assert large_retry.status_code == 409
+    assert large_retry.headers["idempotent-replayed"] == "true"
+    assert "already applied (status 200)" in large_retry.json()["detail"]
+    assert app.state.calls == 2
+    assert all(entry.body is None or len(entry.body) <= 12 for entry in store._entries.values())
@@ -0,0 +1,92 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from app import models, schemas
+from app.routers import invoices
+
+@pytest.fixture
+def seed():
+    return {models.Product: [{"code": "SP001", "name": "Cà phê", "price": 10, "quantity": 3}]}
+
+@pytest.fixture(autouse=True)
+def small_chunks(write_queue, monkeypatch):
+    monkeypatch.setattr(invoices, "REPLAY_CHUNK_SIZE", 2)
+
+def offline_sale(quantity: int, client_txn_id=None) -> schemas.OfflineInvoiceCreate:
+    return schemas.OfflineInvoiceCreate(
+        client_txn_id=client_txn_id or uuid4(),
+        items=[schemas.InvoiceItemCreate(product_id=1, quantity=quantity, unit_price=10)]
+    )
+
+@pytest.mark.asyncio
+async def test_replay_records_each_sale_once(session_factory):
+    """Test a replayed batch reports per sale and a second replay only finds duplicates."""
+    repeated = uuid4()
+    batch = [offline_sale(1, repeated), offline_sale(5), offline_sale(1), offline_sale(1, repeated)]
+
+    response = await invoices.create_invoice_batch(batch)
+    assert [result.status for result in response.results] == [
+        schemas.InvoiceBatchStatus.CREATED,
+        schemas.InvoiceBatchStatus.FAILED,
+        schemas.InvoiceBatchStatus.CREATED,
+        schemas.InvoiceBatchStatus.DUPLICATE,
+    ]
+    assert (response.created, response.duplicates, response.failed) == (2, 1, 1)
+    assert response.results[3].invoice_id == response.results[0].invoice_id
+    assert "Insufficient stock" in response.results[1].error
+
+    again = await invoices.create_invoice_batch(batch)
+    assert (again.created, again.duplicates, again.failed) == (0, 3, 1)
+
+    async with session_factory() as db:
+        assert (await db.execute(select(func.count()).select_from(models.Invoice))).scalar() == 2
+        assert (await db.execute(select(models.Product.quantity))).scalar() == 1
+
+@pytest.mark.asyncio
+async def test_replay_records_a_chunk_at_once(session_factory):
+    """Test a chunk with enough stock is recorded with its items, stock moves and numbers."""
+    response = await invoices.create_invoice_batch([offline_sale(1), offline_sale(2)])
+    assert (response.created, response.failed) == (2, 0)
+    first, second = (result.invoice_number for result in response.results)
+    assert int(second[-4:]) == int(first[-4:]) + 1
+
+    async with session_factory() as db:
+        items = (await db.execute(select(models.InvoiceItem.invoice_id, models.InvoiceItem.quantity))).all()
+        assert sorted(items) == sorted(zip((r.invoice_id for r in response.results), (1, 2)))
+        records = (await db.execute(select(models.InventoryRecord.notes, models.InventoryRecord.quantity_change))).all()
+        assert sorted(records) == [(f"Sale invoice #{first}", -1), (f"Sale invoice #{second}", -2)]
+        assert (await db.execute(select(models.Product.quantity))).scalar() == 0
+
+@pytest.mark.asyncio
+async def test_replay_of_empty_sales(session_factory):
+    """Test sales without lines are recorded as zero invoices, alone or in a chunk."""
+    empty = schemas.OfflineInvoiceCreate(client_txn_id=uuid4(), items=[])
+    response = await invoices.create_invoice_batch([empty, offline_sale(1), empty])
+    assert [result.status for result in response.results] == [
+        schemas.InvoiceBatchStatus.CREATED,
+        schemas.InvoiceBatchStatus.CREATED,
+        schemas.InvoiceBatchStatus.DUPLICATE,
+    ]
+    response = await invoices.create_invoice_batch([schemas.OfflineInvoiceCreate(client_txn_id=uuid4(), items=[])])
+    assert response.created == 1
+
+    async with session_factory() as db:
+        assert (await db.execute(select(func.count()).select_from(models.Invoice))).scalar() == 3
+        assert (await db.execute(select(func.count()).select_from(models.InvoiceItem))).scalar() == 1
+
+@pytest.mark.asyncio
+async def test_replay_constraint_failure_is_not_a_duplicate(session_factory, monkeypatch):
+    """Test a sale failing a constraint other than its client_txn_id fails alone."""
+    async def chunk_fails(db, sales):
+        raise IntegrityError("INSERT", {}, Exception("chunk"))
+
+    async def sale_fails(db, invoice, client_txn_id=None):
+        raise IntegrityError("INSERT", {}, Exception("CHECK constraint failed: quantity"))
+
+    monkeypatch.setattr(invoices, "record_sales", chunk_fails)
+    monkeypatch.setattr(invoices, "checkout", sale_fails)
+    response = await invoices.create_invoice_batch([offline_sale(1)])
+    assert response.failed == 1
+    assert response.results[0].error == "CHECK constraint failed: quantity"
@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+from app import models, schemas
+from app.database import get_read_db
+from app.pagination import MAX_PAGE_SIZE, count, decode_cursor, encode_cursor, paginate
+from app.routers import inventory, invoices, products
+from app.routers.invoices import list_invoices
+
+@pytest.fixture
+def seed():
+    # Pairs of invoices share a timestamp so the id has to break ties
+    start = datetime(2024, 1, 1)
+    return {models.Invoice: [
+        {"invoice_number": f"INV-{i:03d}", "total_amount": i, "created_at": start + timedelta(minutes=i // 2)}
+        for i in range(25)
+    ]}
+
+@pytest_asyncio.fixture
+async def session(session_factory):
+    async with session_factory() as db:
+        yield db
+
+def test_cursor_round_trip():
+    """Test cursors decode to the typed key values they were made from."""
+    key = (models.Invoice.created_at, models.Invoice.id)
+    values = [datetime(2024, 5, 1, 12, 30, 15, 250), 42]
+    assert decode_cursor(encode_cursor(values), key) == values
+    for bad in ("not-a-cursor", encode_cursor([1]), encode_cursor(["x", 1])):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(bad, key)
+        assert error.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_cursor_pages_match_offset_pages(session):
+    """Test walking invoices by cursor returns the same rows as page numbers."""
+    by_page = []
+    for page in range(1, 5):
+        result = await list_invoices(page=page, limit=7, db=session)
+        by_page += [invoice.invoice_number for invoice in result["items"]]
+
+    by_cursor, cursor = [], None
+    while True:
+        result = await list_invoices(page=1, limit=7, cursor=cursor, db=session)
+        assert result["total"] == 25
+        by_cursor += [invoice.invoice_number for invoice in result["items"]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+
+    assert by_cursor == by_page
+    assert by_cursor == [f"INV-{i:03d}" for i in reversed(range(25))]
+
+@pytest.mark.asyncio
+async def test_summary_view_lists_item_counts(session):
+    """Test the summary list has the same order as the full one, with item counts and no items."""
+    await session.execute(insert(models.InvoiceItem), [
+        {"invoice_id": invoice_id, "product_id": 1, "quantity": 1, "unit_price": 5, "total_price": 5}
+        for invoice_id in (1, 25, 25, 25)
+    ])
+    full = await list_invoices(page=1, limit=10, db=session)
+    response = await list_invoices(page=1, limit=10, view=schemas.InvoiceListView.SUMMARY, db=session)
+    summary = json.loads(response.body)
+
+    assert summary["total"] == 25 and summary["next_cursor"] == full["next_cursor"]
+    assert [row["id"] for row in summary["items"]] == [invoice.id for invoice in full["items"]]
+    assert summary["items"][0] == {
+        "id": 25, "invoice_number": "INV-024", "total_amount": 24.0,
+        "created_at": "2024-01-01T00:12:00", "item_count": 3,
+    }
+    assert all(row["item_count"] == 0 for row in summary["items"][1:])
+
+    response = await list_invoices(page=1, limit=10, cursor=summary["next_cursor"], view="summary", db=session)
+    assert json.loads(response.body)["items"][0]["invoice_number"] == "INV-014"
+
+@pytest.mark.asyncio
+async def test_approximate_count_is_cached(session):
+    """Test approximate totals come from the cache until it expires."""
+    stmt = select(models.Invoice).where(models.Invoice.total_amount >= 10)
+    assert await count(session, stmt, approximate=True) == 15
+    await session.execute(insert(models.Invoice), [{"invoice_number": "INV-100", "total_amount": 100}])
+    assert await count(session, stmt, approximate=True) == 15
+    assert await count(session, stmt) == 16
+    page = await paginate(session, stmt, (models.Invoice.id,), limit=20)
+    assert (page["total"], len(page["items"]), page["next_cursor"]) == (16, 16, None)
+
+@pytest.mark.asyncio
+async def test_empty_page_has_no_cursor(session):
+    """Test a page without rows ends the list instead of failing."""
+    page = await paginate(session, select(models.Invoice), (models.Invoice.id,), limit=0)
+    assert (page["total"], page["items"], page["next_cursor"]) == (25, [], None)
+
+@pytest.mark.parametrize("url", [
+    "/invoices/?limit=0", "/invoices/?page=0", f"/invoices/?limit={MAX_PAGE_SIZE + 1}",
+    "/inventory/history/1?limit=0", "/products/search?query=x&limit=0",
+])
+def test_page_bounds_are_validated(url):
+    """Test list endpoints reject empty, negative and oversized pages."""
+    app = FastAPI()
+    for router in (inventory.router, invoices.router, products.router):
+        app.include_router(router)
+    app.dependency_overrides[get_read_db] = lambda: None
+    assert TestClient(app).get(url).status_code == 422
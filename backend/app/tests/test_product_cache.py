@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from app import schemas
+from app.product_cache import ProductCache
+
+def product(id, code, quantity=1):
+    now = datetime(2024, 1, 1)
+    return schemas.Product(id=id, code=code, name=f"Product {id}", price=1000, quantity=quantity,
+                           created_at=now, updated_at=now)
+
+def test_lru_eviction_and_invalidation():
+    """Test the cache is bounded and invalidates by product id or code."""
+    cache = ProductCache(max_size=2)
+    for id, code in [(1, "A"), (2, "B")]:
+        cache.put(product(id, code), cache.generation)
+    assert cache.get("A") is not None  # A is now most recent
+    cache.put(product(3, "C"), cache.generation)
+    assert (cache.get("B"), len(cache)) == (None, 2)
+
+    cache.invalidate(product_ids=[1])
+    assert cache.get("A") is None
+    cache.invalidate(codes=["C"])
+    assert len(cache) == 0
+
+def test_fill_after_invalidation_is_dropped():
+    """Test a lookup that raced with a write does not cache stale data."""
+    cache = ProductCache()
+    generation = cache.generation
+    cache.invalidate(product_ids=[1])  # stock movement commits meanwhile
+    body = cache.put(product(1, "A", quantity=5), generation)
+    assert b'"quantity":5' in body
+    assert cache.get("A") is None
@@ -0,0 +1,141 @@
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, product_import, schemas
+from app.routers import products
+
+@pytest.fixture
+def seed():
+    return {models.Product: [{"code": "SP001", "name": "Old", "price": 1, "quantity": 1}]}
+
+@pytest.mark.asyncio
+async def test_upsert_reports_bad_rows(engine, write_queue):
+    """Test chunks upsert valid rows and report invalid ones by row number."""
+    rows = [
+        {"code": "SP001", "name": "Cà phê", "price": 25000, "quantity": 5},
+        {"code": "SP002", "name": "Trà đá", "price": 5000},
+        {"code": "SP003", "name": "Bánh mì", "price": "abc", "quantity": 1},
+        {"code": "SP002", "name": "Trà đá lạnh", "price": 6000},
+        {"code": "SP004", "name": "Sữa", "price": 12000, "quantity": 3},
+        {"name": "No code", "price": 1},
+    ]
+    items = []
+    report = await product_import.upsert_products(enumerate(rows, start=1), chunk_size=2, items=items)
+
+    assert (report.inserted, report.updated) == (2, 1)
+    assert [(error.row, error.code) for error in report.errors] == [(3, "SP003"), (4, "SP002"), (6, None)]
+    assert "price" in report.errors[0].error
+    assert [item.code for item in items] == ["SP001", "SP002", "SP004"]
+
+    async with engine.connect() as conn:
+        products = (await conn.execute(select(models.Product).order_by(models.Product.code))).all()
+    assert [(p.code, p.name, p.quantity) for p in products] == [
+        ("SP001", "Cà phê", 5), ("SP002", "Trà đá", 0), ("SP004", "Sữa", 3)
+    ]
+    assert products[0].id == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content, detail", [
+    (b"", "CSV file is empty."),
+    (b"code,name,price\nSP001,Product1,100", "CSV file is missing required headers."),
+])
+async def test_save_upload_checks_header(content, detail):
+    """Test empty files and missing headers are rejected before a job starts."""
+    with pytest.raises(HTTPException) as error:
+        await product_import.save_upload(UploadFile(io.BytesIO(content), filename="products.csv"))
+    assert (error.value.status_code, error.value.detail) == (400, detail)
+
+@pytest.mark.asyncio
+async def test_csv_import_job(engine, write_queue):
+    """Test a CSV file is streamed into the catalog and progress is recorded."""
+    content = (
+        "﻿Code,Name,Price,Quantity,Supplier\n"
+        "SP001,Cà phê sữa,25000,10,A\n"
+        "SP005,\"Bánh mì, pate\",invalid_price,1,A\n"
+        "\n"
+        "SP006,Nước mắm,42000,,B\n"
+        "SP006,Nước mắm Phú Quốc,45000,3,B\n"
+    ).encode()
+    path, kind = await product_import.save_upload(UploadFile(io.BytesIO(content), filename="catalog.csv"))
+    job = product_import.create_job("catalog.csv")
+    await product_import.run_import(job, path, kind, chunk_size=2)
+
+    assert job.status == schemas.ImportJobStatus.COMPLETED
+    assert job.rows_read == 4
+    assert (job.report.inserted, job.report.updated, job.report.error_count) == (1, 2, 1)
+    assert (job.report.errors[0].row, job.report.errors[0].code) == (3, "SP005")
+    assert not os.path.exists(path)
+    async with engine.connect() as conn:
+        products = (await conn.execute(select(models.Product).order_by(models.Product.code))).all()
+    assert [(p.code, p.name, p.price, p.quantity) for p in products] == [
+        ("SP001", "Cà phê sữa", 25000, 10), ("SP006", "Nước mắm Phú Quốc", 45000, 3)
+    ]
+
+@pytest.mark.asyncio
+async def test_xlsx_import_job(engine, write_queue, tmp_path):
+    """Test spreadsheet rows, including numeric codes, are imported."""
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["code", "name", "price", "quantity"])
+    workbook.active.append([8935049500, "Sữa tươi", 32000, 24])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    path, kind = await product_import.save_upload(UploadFile(buffer, filename="catalog.xlsx"))
+    job = product_import.create_job("catalog.xlsx")
+    await product_import.run_import(job, path, kind)
+
+    assert (job.status, job.report.inserted) == (schemas.ImportJobStatus.COMPLETED, 1)
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(models.Product.name).where(models.Product.code == "8935049500"))).scalar() == "Sữa tươi"
+
+@pytest.mark.asyncio
+async def test_upsert_keeps_stock_without_quantity(engine, write_queue):
+    """Test an update without a quantity keeps the stock, and one with a quantity records the change."""
+    report = await product_import.upsert_products(enumerate([
+        {"code": "SP001", "name": "Cà phê", "price": 25000},
+        {"code": "SP002", "name": "Trà đá", "price": 5000, "quantity": 5},
+    ], start=1))
+    assert (report.inserted, report.updated) == (1, 1)
+    report = await product_import.upsert_products(enumerate([
+        {"code": "SP001", "name": "Cà phê", "price": 25000, "quantity": 4},
+        {"code": "SP002", "name": "Trà đá", "price": 5000, "quantity": 5},
+    ], start=1))
+    assert report.updated == 2
+
+    async with engine.connect() as conn:
+        products = (await conn.execute(select(models.Product).order_by(models.Product.code))).all()
+        records = (await conn.execute(select(models.InventoryRecord))).all()
+    assert [(p.code, p.name, p.quantity) for p in products] == [("SP001", "Cà phê", 4), ("SP002", "Trà đá", 5)]
+    assert [(r.product_id, r.quantity_change, r.notes) for r in records] == [(1, 3, product_import.IMPORT_NOTES)]
+
+@pytest.mark.asyncio
+async def test_bulk_create_rejects_existing_codes(engine, reader):
+    """Test POST /products/bulk still only creates products."""
+    async with AsyncSession(reader) as db:
+        with pytest.raises(HTTPException) as error:
+            await products.bulk_create_products(
+                [schemas.ProductCreate(code="SP001", name="Cà phê", price=25000, quantity=9)], chunk_size=None, db=db
+            )
+    assert (error.value.status_code, error.value.detail) == (400, "Product code SP001 already exists.")
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(models.Product.quantity))).scalar() == 1
+
+@pytest.mark.asyncio
+async def test_blank_quantity_keeps_stock(engine, write_queue):
+    """Test a file row with a blank quantity updates the product but not its stock."""
+    content = "code,name,price,quantity\nSP001,Cà phê sữa,25000,\nSP002,Trà đá,5000, \n".encode()
+    path, kind = await product_import.save_upload(UploadFile(io.BytesIO(content), filename="catalog.csv"))
+    job = product_import.create_job("catalog.csv")
+    await product_import.run_import(job, path, kind)
+
+    assert (job.report.inserted, job.report.updated, job.report.error_count) == (1, 1, 0)
+    async with engine.connect() as conn:
+        products = (await conn.execute(select(models.Product).order_by(models.Product.code))).all()
+        assert (await conn.execute(select(models.InventoryRecord))).all() == []
+    assert [(p.code, p.name, p.quantity) for p in products] == [("SP001", "Cà phê sữa", 1), ("SP002", "Trà đá", 0)]
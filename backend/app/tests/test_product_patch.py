@@ -0,0 +1,48 @@
+import pytest
+from app import models, schemas
+from app.routers.products import apply_product_patches, get_products
+
+@pytest.fixture
+def seed():
+    return {models.Product: [
+        {"code": f"SP{i:03d}", "name": f"Product {i}", "price": 1000 * i, "quantity": i}
+        for i in range(1, 4)
+    ]}
+
+@pytest.mark.asyncio
+async def test_get_products_by_ids(session_factory):
+    """Test ids are returned in request order and unknown ids listed as missing."""
+    async with session_factory() as db:
+        response = await get_products(ids="3,1,99,3", db=db)
+    assert [product.code for product in response["items"]] == ["SP003", "SP001"]
+    assert response["missing"] == [99]
+
+@pytest.mark.asyncio
+async def test_bulk_patch_reports_each_item(session_factory):
+    """Test patches apply only their fields and failures stay per item."""
+    patches = [
+        schemas.ProductPatch(id=1, price=1500),
+        schemas.ProductPatch(id=2, code="SP003"),
+        schemas.ProductPatch(id=99, price=1),
+        schemas.ProductPatch(id=3, quantity=0),
+        schemas.ProductPatch(id=1, price=9),
+    ]
+    async with session_factory() as db:
+        report = await apply_product_patches(db, patches)
+        await db.commit()
+
+    assert report.updated == 2
+    assert [result.status for result in report.results] == [
+        schemas.ProductPatchStatus.UPDATED,
+        schemas.ProductPatchStatus.FAILED,
+        schemas.ProductPatchStatus.NOT_FOUND,
+        schemas.ProductPatchStatus.UPDATED,
+        schemas.ProductPatchStatus.FAILED,
+    ]
+    assert "UNIQUE" in report.results[1].error
+
+    async with session_factory() as db:
+        response = await get_products(ids="1,2,3", db=db)
+    assert [(product.code, product.price, product.quantity) for product in response["items"]] == [
+        ("SP001", 1500, 1), ("SP002", 2000, 2), ("SP003", 3000, 0)
+    ]
@@ -0,0 +1,110 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app import models, schemas
+from app.catalog_index import CatalogIndex
+from app.routers.products import search_products
+from app.utils.text import fold_vietnamese, fts_match_expression
+
+PRODUCTS = [
+    {"code": "CF001", "name": "Cà phê sữa đá", "price": 25000, "quantity": 10},
+    {"code": "CF002", "name": "Cà phê đen", "price": 20000, "quantity": 10},
+    {"code": "TR001", "name": "Trà đào cam sả", "price": 35000, "quantity": 10},
+    {"code": "BM001", "name": "Bánh mì thịt", "price": 30000, "quantity": 10},
+]
+
+@pytest.fixture
+def seed():
+    return {models.Product: PRODUCTS}
+
+@pytest_asyncio.fixture
+async def session(session_factory):
+    async with session_factory() as db:
+        yield db
+
+async def fts_codes(db, query):
+    result = await search_products(query=query, page=1, limit=10, mode=schemas.ProductSearchMode.FTS, db=db)
+    return [product.code for product in result["items"]]
+
+def test_fold_vietnamese():
+    """Test diacritics and đ are folded to plain lowercase ASCII."""
+    assert fold_vietnamese("Cà Phê Sữa Đá") == "ca phe sua da"
+    assert fts_match_expression('ca "phe') == '"ca"* "phe"*'
+    assert fts_match_expression("  ") == ""
+
+@pytest.mark.asyncio
+async def test_fts_search_folds_diacritics(session):
+    """Test unaccented and prefix queries match accented names."""
+    assert await fts_codes(session, "ca phe") == ["CF002", "CF001"]
+    assert await fts_codes(session, "cà phê sữa") == ["CF001"]
+    assert await fts_codes(session, "tra dao") == ["TR001"]
+    assert await fts_codes(session, "banh m") == ["BM001"]
+    assert sorted(await fts_codes(session, "cf00")) == ["CF001", "CF002"]
+
+@pytest.mark.asyncio
+async def test_fts_index_follows_product_updates(session):
+    """Test triggers keep the FTS index in sync with product renames."""
+    await session.execute(
+        update(models.Product).where(models.Product.code == "BM001").values(name="Bánh bao")
+    )
+    assert await fts_codes(session, "banh bao") == ["BM001"]
+    assert await fts_codes(session, "thit") == []
+
+@pytest.mark.asyncio
+async def test_catalog_index_search(session):
+    """Test the in-memory index matches substrings with diacritic folding."""
+    index = CatalogIndex()
+    await index.load(sessionmaker(session.bind, class_=AsyncSession))
+    assert len(index) == 4
+
+    total, items, _ = index.search("phê")
+    assert total == 2
+    assert [item["code"] for item in items] == ["CF001", "CF002"]
+    assert index.search("đào cam")[0] == 1
+    assert index.search("ao ca")[0] == 1  # substring, not just word prefix
+    assert index.search("xyz")[0] == 0
+
+    # Exact code first, then the rest in id order, across pages
+    total, items, _ = index.search("CF002", limit=1)
+    assert (total, items[0]["code"]) == (1, "CF002")
+    assert [item["code"] for item in index.search("f0", skip=1, limit=1)[1]] == ["CF002"]
+
+@pytest.mark.asyncio
+async def test_catalog_index_cursor_pages(session):
+    """Test walking search results by cursor visits every match once."""
+    index = CatalogIndex()
+    await index.load(sessionmaker(session.bind, class_=AsyncSession))
+
+    for query in ("a", "CF002", "0"):
+        total, items, after = index.search(query, limit=1)
+        seen = [item["code"] for item in items]
+        while after is not None:
+            _, items, after = index.search(query, limit=1, after=after)
+            seen += [item["code"] for item in items]
+        assert len(seen) == len(set(seen)) == total
+
+@pytest.mark.asyncio
+async def test_catalog_index_incremental_updates(session):
+    """Test upserts, renames and stock movements update the index in place."""
+    index = CatalogIndex()
+    await index.load(sessionmaker(session.bind, class_=AsyncSession))
+    product = (await session.execute(
+        models.Product.__table__.select().where(models.Product.code == "BM001")
+    )).one()
+
+    renamed = schemas.Product(**{**product._mapping, "name": "Bánh bao chay"})
+    index.upsert(renamed)
+    assert index.search("thit")[0] == 0
+    assert index.search("bao chay")[1][0]["id"] == product.id
+
+    index.adjust_quantity(product.id, -3)
+    assert index.search("BM001")[1][0]["quantity"] == 7
+
+    new = schemas.Product(**{**product._mapping, "id": 99, "code": "BM002", "name": "Bánh mì pate"})
+    index.upsert(new)
+    assert [item["id"] for item in index.search("banh")[1]] == [product.id, 99]
+
+    index.remove(99)
+    assert index.search("pate")[0] == 0
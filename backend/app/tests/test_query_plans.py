@@ -0,0 +1,95 @@
+"""EXPLAIN QUERY PLAN checks for the hot queries issued by the routers.
+
+A plan step that scans a whole table (``SCAN <table>`` without an index), or
+sorts a whole table for ORDER BY ... LIMIT, fails the build.
+"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, select, literal_column
+from sqlalchemy.dialects import sqlite
+from app import models, schemas
+from app.catalog_sync import changes_after
+from app.export import invoice_lines, ledger_entries
+from app.migrations import MIGRATIONS, apply_migrations
+from app.pagination import count_statement, page_statement
+from app.rollups import product_totals
+from app.routers.auth import latest_valid_otp
+from app.routers.inventory import HISTORY_KEYS, history_query
+from app.routers.invoices import INVOICE_LIST_KEYS, INVOICE_SUMMARY_COLUMNS
+from app.routers.products import products_fts
+from app.routers.reports import hourly_sales, revenue_by_period
+
+def hot_queries():
+    now = datetime.utcnow()
+    return {
+        "inventory history page": page_statement(history_query(1), HISTORY_KEYS, page=3, descending=True),
+        "inventory history cursor page": page_statement(
+            history_query(1), HISTORY_KEYS, after=(now, 50), descending=True
+        ),
+        "inventory history total": count_statement(history_query(1)),
+        "invoice items of invoices": (
+            select(models.InvoiceItem).where(models.InvoiceItem.invoice_id.in_([1, 2, 3]))
+        ),
+        "invoice list page": page_statement(select(models.Invoice), INVOICE_LIST_KEYS, page=3, descending=True),
+        "invoice list cursor page": page_statement(
+            select(models.Invoice), INVOICE_LIST_KEYS, after=(now, 50), descending=True
+        ),
+        "invoice summary page": page_statement(
+            select(*INVOICE_SUMMARY_COLUMNS), INVOICE_LIST_KEYS, page=2, limit=100, descending=True
+        ),
+        "invoice export": invoice_lines(date(2024, 1, 1), date(2024, 12, 31)),
+        "inventory export": ledger_entries(date(2024, 1, 1), date(2024, 12, 31)),
+        "revenue by day": revenue_by_period(date(2024, 1, 1), date(2024, 12, 31), schemas.ReportPeriod.DAY),
+        "revenue by month": revenue_by_period(date(2024, 1, 1), date(2024, 12, 31), schemas.ReportPeriod.MONTH),
+        "product sales by day": product_totals(date(2024, 1, 10), date(2024, 1, 20))[0],
+        "product sales by month": product_totals(date(2024, 1, 1), date(2024, 12, 31))[0],
+        "hourly sales": hourly_sales(date(2024, 1, 1), date(2024, 3, 31)),
+        "invoice by id": select(models.Invoice).filter(models.Invoice.id == 1),
+        "product by id": select(models.Product).filter(models.Product.id == 1),
+        "product full-text search": (
+            select(products_fts.c.rowid)
+            .where(literal_column("products_fts").op("MATCH")('"ca"* "phe"*'))
+            .order_by(products_fts.c.rowid)
+            .limit(10)
+        ),
+        "product changes page": changes_after(models.Product, 100, 501),
+        "product tombstones page": changes_after(models.ProductTombstone, 100, 501),
+        "products of items": select(models.Product).where(models.Product.id.in_([1, 2])),
+        "latest valid otp": latest_valid_otp("u", now),
+    }
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'pos.db'}")
+    with engine.begin() as connection:
+        models.Base.metadata.create_all(connection)
+        apply_migrations(connection)
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+def query_plan(conn, stmt):
+    compiled = stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+@pytest.mark.parametrize("name", list(hot_queries()))
+def test_hot_query_uses_index(conn, name):
+    """Test the hot query never falls back to a full-table scan."""
+    plan = query_plan(conn, hot_queries()[name])
+    full_scans = [
+        step for step in plan
+        if step.startswith("SCAN ") and " USING " not in step
+        and "VIRTUAL TABLE INDEX" not in step
+    ]
+    assert not full_scans, f"{name}: {plan}"
+    if "page" in name:
+        assert not any("TEMP B-TREE" in step for step in plan), f"{name}: {plan}"
+
+def test_migrations_run_once(conn):
+    """Test already applied migrations are skipped."""
+    assert apply_migrations(conn) == []
+    versions = conn.exec_driver_sql("SELECT version FROM schema_migrations").scalars().all()
+    assert versions == [version for version, _, _ in MIGRATIONS]
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import update
+from app import models, schemas
+from app.database import get_read_db
+from app.receipts import escpos_cache, receipt_cache, warm_receipts
+from app.routers import invoices
+from app.utils import escpos
+
+@pytest.fixture
+def seed():
+    return {
+        models.Product: [{"code": "SP001", "name": "Cà phê", "price": 10, "quantity": 100}],
+        models.Invoice: [
+            {"invoice_number": f"INV-20240101-{n:04d}", "total_amount": 10 * n, "created_at": datetime(2024, 1, 1, n)}
+            for n in range(1, 4)
+        ] + [{"invoice_number": "INV-20240102-0001", "total_amount": 10, "created_at": datetime(2024, 1, 2, 9)}],
+        models.InvoiceItem: [
+            {"invoice_id": n, "product_id": 1, "quantity": n, "unit_price": 10, "total_price": 10 * n}
+            for n in range(1, 5)
+        ],
+    }
+
+@pytest_asyncio.fixture
+async def client(session_factory):
+    async def read_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(invoices.router)
+    app.dependency_overrides[get_read_db] = read_db
+    app.state.session_factory = session_factory
+    receipt_cache.clear()
+    escpos_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        c.app = app
+        yield c
+    receipt_cache.clear()
+    escpos_cache.clear()
+
+@pytest.mark.asyncio
+async def test_reprint_comes_from_cache(client):
+    """Test a reprint is served from the rendered receipt, not the database."""
+    first = await client.get("/invoices/print/1")
+    assert first.status_code == 200
+    assert "INV-20240101-0001" in first.text and "Cà phê" in first.text
+
+    async with client.app.state.session_factory() as db:
+        await db.execute(update(models.Product).values(name="Trà"))
+        await db.commit()
+    hits = receipt_cache.hits
+    again = await client.get("/invoices/print/1")
+    assert again.text == first.text
+    assert receipt_cache.hits == hits + 1
+
+    assert (await client.get("/invoices/print/99")).status_code == 404
+
+@pytest.mark.asyncio
+async def test_warm_after_checkout(client):
+    """Test warming renders receipts ahead of the first print."""
+    await warm_receipts(client.app.state.session_factory, [2, 3])
+    assert len(receipt_cache) == 2
+    hits = receipt_cache.hits
+    await client.get("/invoices/print/3")
+    assert receipt_cache.hits == hits + 1
+
+@pytest.mark.asyncio
+async def test_batch_print(client, monkeypatch):
+    """Test a batch document has each receipt once, in order, by ids or by day."""
+    monkeypatch.setattr("app.receipts.RECEIPT_BATCH_CHUNK", 2)
+    await client.get("/invoices/print/2")
+
+    response = await client.get("/invoices/print/batch", params={"ids": "3,1,99,2,3"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    numbers = ["INV-20240101-0003", "INV-20240101-0001", "INV-20240101-0002"]
+    positions = [response.text.index(number) for number in numbers]
+    assert positions == sorted(positions)
+    assert response.text.count('<section class="receipt">') == 3
+
+    by_day = await client.get("/invoices/print/batch", params={"day": "2024-01-01"})
+    assert by_day.text.count('<section class="receipt">') == 3
+    assert "INV-20240102-0001" not in by_day.text
+    assert len(receipt_cache) == 3
+
+    assert (await client.get("/invoices/print/batch")).status_code == 400
+    assert (await client.get("/invoices/print/batch", params={"ids": "a,b"})).status_code == 400
+    assert (await client.get("/invoices/print/batch", params={"day": "2023-01-01"})).status_code == 404
+
+@pytest.mark.asyncio
+async def test_escpos_receipt(client):
+    """Test the ESC/POS receipt is served, cached, and warmed after checkout."""
+    response = await client.get("/invoices/print/1/escpos", params={"paper": 58})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.content.startswith(b"\x1b@") and b"INV-20240101-0001" in response.content
+    assert (await client.get("/invoices/print/1/escpos", params={"paper": 58})).content == response.content
+
+    assert (await client.get("/invoices/print/1/escpos", params={"paper": 57})).status_code == 400
+    assert (await client.get("/invoices/print/99/escpos")).status_code == 404
+
+    await warm_receipts(client.app.state.session_factory, [2])
+    assert (2, 80, schemas.EscposMode.TEXT) in escpos_cache._entries
+
+@pytest.mark.asyncio
+async def test_raster_receipt_needs_the_font(client, monkeypatch):
+    """Test a raster receipt without its font is a clear server error, and is not cached."""
+    monkeypatch.setattr(escpos, "FONT", "missing.ttf")
+    escpos._font.cache_clear()
+    escpos._raster_line.cache_clear()
+    try:
+        response = await client.get("/invoices/print/1/escpos", params={"mode": "raster"})
+    finally:
+        escpos._font.cache_clear()
+        escpos._raster_line.cache_clear()
+    assert response.status_code == 500
+    assert "Unicode TrueType font" in response.json()["detail"]
+    assert not escpos_cache._entries
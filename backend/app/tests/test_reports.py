@@ -0,0 +1,184 @@
+from datetime import date, datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import insert, select
+from app import models
+from app.analytics import AnalyticsCache, analytics_cache
+from app.database import get_read_db
+from app.rollups import rebuild_rollups
+from app.routers import reports
+
+# (created_at, [(product_id, quantity, unit_price)]); 2024-01-01 is a Monday
+SALES = [
+    (datetime(2024, 1, 1, 9, 15), [(1, 2, 10), (2, 1, 25)]),
+    (datetime(2024, 1, 1, 9, 40), [(1, 1, 10)]),
+    (datetime(2024, 1, 2, 18, 5), [(2, 4, 25)]),
+    (datetime(2024, 1, 8, 9, 0), [(1, 5, 10)]),
+    (datetime(2024, 2, 1, 12, 0), [(2, 1, 25)]),
+]
+
+def sale_rows(sales, first_id):
+    return {
+        models.Invoice: [
+            {"invoice_number": f"INV-{n}", "created_at": created_at,
+             "total_amount": sum(quantity * price for _, quantity, price in lines)}
+            for n, (created_at, lines) in enumerate(sales, first_id)
+        ],
+        models.InvoiceItem: [
+            {"invoice_id": n, "product_id": product_id, "quantity": quantity,
+             "unit_price": price, "total_price": quantity * price}
+            for n, (_, lines) in enumerate(sales, first_id) for product_id, quantity, price in lines
+        ],
+    }
+
+async def record(conn, sales, first_id):
+    for model, rows in sale_rows(sales, first_id).items():
+        await conn.execute(insert(model), rows)
+
+@pytest.fixture(autouse=True)
+def utc(server_tz):
+    """Rollup days are the server's local days; pinned before the database is seeded."""
+
+@pytest.fixture
+def seed_before_migrations():
+    # Sales recorded before the rollups existed are backfilled...
+    return {
+        models.Product: [
+            {"code": "SP001", "name": "Cà phê", "price": 10, "quantity": 100},
+            {"code": "SP002", "name": "Bánh mì", "price": 25, "quantity": 100},
+            {"code": "SP003", "name": "Trà đá", "price": 5, "quantity": 100},
+        ],
+        **sale_rows(SALES[:2], 1),
+    }
+
+@pytest.fixture
+def seed():
+    # ...and later ones are added by the triggers
+    return sale_rows(SALES[2:], 3)
+
+@pytest_asyncio.fixture
+async def client(session_factory):
+    async def read_db():
+        async with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(reports.router)
+    app.dependency_overrides[get_read_db] = read_db
+    analytics_cache.invalidate()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+async def rollup_rows(engine):
+    async with engine.connect() as conn:
+        return [
+            (await conn.execute(select(table).order_by(*table.__table__.primary_key))).all()
+            for table in (models.SalesDaily, models.SalesHourly, models.ProductSalesDaily, models.ProductSalesMonthly)
+        ]
+
+@pytest.mark.asyncio
+async def test_triggers_match_rebuild(engine):
+    """Test the rollups kept by the triggers equal a rebuild from the invoices."""
+    kept = await rollup_rows(engine)
+    assert kept[0][0] == (date(2024, 1, 1), 2, 4, 55.0)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_rollups, date(2024, 1, 2))
+    assert await rollup_rows(engine) == kept
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_rollups)
+    assert await rollup_rows(engine) == kept
+
+@pytest.mark.asyncio
+async def test_revenue_by_period(client):
+    """Test revenue is summed per day, ISO week and month."""
+    params = {"start": "2024-01-01", "end": "2024-01-31"}
+    days = (await client.get("/reports/revenue", params=params)).json()
+    assert [(day["period_start"], day["invoice_count"], day["units"], day["revenue"]) for day in days] == [
+        ("2024-01-01", 2, 4, 55.0), ("2024-01-02", 1, 4, 100.0), ("2024-01-08", 1, 5, 50.0)
+    ]
+
+    weeks = (await client.get("/reports/revenue", params={**params, "period": "week"})).json()
+    assert [(week["period_start"], week["revenue"]) for week in weeks] == [
+        ("2024-01-01", 155.0), ("2024-01-08", 50.0)
+    ]
+
+    months = (await client.get("/reports/revenue", params={"start": "2024-01-01", "end": "2024-12-31", "period": "month"})).json()
+    assert [(month["period_start"], month["invoice_count"]) for month in months] == [
+        ("2024-01-01", 4), ("2024-02-01", 1)
+    ]
+
+    backwards = await client.get("/reports/revenue", params={"start": "2024-02-01", "end": "2024-01-01"})
+    assert backwards.status_code == 400
+
+@pytest.mark.asyncio
+async def test_top_products_and_hourly(client):
+    """Test top products by revenue or quantity, and the weekday/hour heatmap."""
+    params = {"start": "2024-01-01", "end": "2024-02-29"}
+    top = (await client.get("/reports/top-products", params=params)).json()
+    assert [(row["code"], row["quantity"], row["revenue"]) for row in top] == [
+        ("SP002", 6, 150.0), ("SP001", 8, 80.0)
+    ]
+    first = await client.get("/reports/top-products", params={**params, "order": "quantity", "limit": 1})
+    assert [row["product_id"] for row in first.json()] == [1]
+    # Days of January from the daily rollup, February from the monthly one
+    partial = await client.get("/reports/top-products", params={"start": "2024-01-02", "end": "2024-02-29"})
+    assert [(row["code"], row["quantity"], row["revenue"]) for row in partial.json()] == [
+        ("SP002", 5, 125.0), ("SP001", 5, 50.0)
+    ]
+
+    cells = (await client.get("/reports/hourly", params=params)).json()
+    assert [(cell["weekday"], cell["hour"], cell["invoice_count"]) for cell in cells] == [
+        (1, 9, 3), (2, 18, 1), (4, 12, 1)
+    ]
+
+@pytest.mark.asyncio
+async def test_product_analytics(client, engine):
+    """Test ABC classes, velocity, sell-through and changes, cached until invalidated."""
+    params = {"start": "2024-01-01", "end": "2024-01-31"}
+    january = (await client.get("/reports/products", params=params)).json()
+    assert (january["revenue"], january["previous_end"], january["total"]) == (205.0, "2023-12-31", 3)
+    first, second, unsold = january["items"]
+    assert (first["code"], first["abc_class"], first["units"]) == ("SP002", "A", 5)
+    assert second["velocity"] == pytest.approx(8 / 31)
+    assert second["sell_through"] == pytest.approx(8 / 108)
+    assert (unsold["code"], unsold["abc_class"], unsold["revenue_change_pct"]) == ("SP003", "C", None)
+
+    only_c = (await client.get("/reports/products", params={**params, "abc_class": "C"})).json()
+    assert [item["code"] for item in only_c["items"]] == ["SP003"]
+
+    # Compared with 2024-01-02 .. 2024-01-31
+    february = (await client.get("/reports/products", params={"start": "2024-02-01", "end": "2024-03-01"})).json()
+    changes = {item["code"]: (item["units_change"], item["revenue_change_pct"]) for item in february["items"]}
+    assert changes == {"SP002": (-3, -0.75), "SP001": (-5, -1.0), "SP003": (0, None)}
+
+    async with engine.begin() as conn:
+        await record(conn, [(datetime(2024, 1, 5, 10), [(3, 10, 5)])], 6)
+    cached = (await client.get("/reports/products", params=params)).json()
+    assert cached == january
+    analytics_cache.invalidate()
+    fresh = (await client.get("/reports/products", params={**params, "limit": 1, "page": 3})).json()
+    assert fresh["items"][0]["code"] == "SP003" and fresh["items"][0]["units"] == 10
+
+def test_analytics_cache_drops_ranges_reaching_the_change():
+    """Test a sale drops only the cached ranges that reach its day, and a product edit drops them all."""
+    cache = AnalyticsCache()
+    january, february = (date(2024, 1, 1), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 29))
+    for key in (january, february):
+        cache.put(key, {"range": key}, cache.generation)
+    generation = cache.generation
+
+    cache.invalidate(since=date(2024, 2, 10))
+    assert cache.get(january) == {"range": january} and cache.get(february) is None
+    # Computed while the sale came in: kept for January, not for February
+    cache.put(february, {"range": february}, generation)
+    cache.put((date(2023, 12, 1), date(2023, 12, 31)), {}, generation)
+    assert cache.get(february) is None and len(cache) == 2
+
+    cache.invalidate()
+    assert len(cache) == 0
+    cache.put(january, {"range": january}, generation)
+    assert cache.get(january) is None
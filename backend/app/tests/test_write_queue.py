@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.write_queue import WriteQueue
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_engine_for_profile(f"sqlite+aiosqlite:///{tmp_path / 'pos.db'}", SQLiteProfile())
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE sales (id INTEGER PRIMARY KEY, till INTEGER)"))
+    yield engine
+    await engine.dispose()
+
+def insert_sale(till):
+    async def unit(db):
+        if till < 0:
+            raise HTTPException(status_code=400, detail="bad till")
+        result = await db.execute(text("INSERT INTO sales (till) VALUES (:till) RETURNING id"), {"till": till})
+        return result.scalar_one()
+    return unit
+
+@pytest.mark.asyncio
+async def test_units_share_commits(engine):
+    """Test concurrent units are group-committed and each gets its own result."""
+    commits = []
+    event.listen(engine.sync_engine, "commit", lambda conn: commits.append(1))
+    queue = WriteQueue(sessionmaker(engine, class_=AsyncSession), max_batch=16, max_delay=0.005)
+
+    ids = await asyncio.gather(*(queue.submit(insert_sale(till)) for till in range(40)))
+    await queue.stop()
+
+    assert sorted(ids) == list(range(1, 41))
+    assert len(commits) < 40
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT count(*) FROM sales"))).scalar() == 40
+
+@pytest.mark.asyncio
+async def test_failed_unit_does_not_affect_batch(engine):
+    """Test a failing unit only rolls back its own savepoint."""
+    queue = WriteQueue(sessionmaker(engine, class_=AsyncSession), max_delay=0.005)
+
+    results = await asyncio.gather(
+        queue.submit(insert_sale(1)),
+        queue.submit(insert_sale(-1)),
+        queue.submit(insert_sale(2)),
+        return_exceptions=True
+    )
+    await queue.stop()
+
+    assert isinstance(results[1], HTTPException)
+    assert results[1].status_code == 400
+    async with engine.connect() as conn:
+        tills = (await conn.execute(text("SELECT till FROM sales ORDER BY till"))).scalars().all()
+    assert tills == [1, 2]
+
+@pytest.mark.asyncio
+async def test_writer_survives_a_failed_session(engine):
+    """Test a batch whose session cannot be opened fails its units and later units still run."""
+    session_factory = sessionmaker(engine, class_=AsyncSession)
+    opened = []
+
+    def flaky_session_factory():
+        opened.append(1)
+        if len(opened) == 1:
+            raise OSError("disk unavailable")
+        return session_factory()
+
+    queue = WriteQueue(flaky_session_factory, max_delay=0)
+    with pytest.raises(OSError):
+        await asyncio.wait_for(queue.submit(insert_sale(1)), timeout=5)
+    assert await asyncio.wait_for(queue.submit(insert_sale(2)), timeout=5) == 1
+    await queue.stop()
@@ -0,0 +1,172 @@
+"""ESC/POS receipts for 58 and 80 mm thermal printers.
+
+Two ways to get Vietnamese onto the paper:
+
+* text: the printer's WPC1258 code page (``ESC t``). Letters that code page
+  has no precomposed form for ("ạ", "ữ") are sent as base letter plus
+  combining tone mark, which is how Windows-1258 writes Vietnamese. Fast and
+  tiny, but needs a printer with that code page.
+* raster: each line drawn with a TrueType font and sent as a bit image
+  (``GS v 0``); prints on any printer. Needs Pillow and a monospace font
+  with Vietnamese letters (``ESCPOS_FONT``/``ESCPOS_BOLD_FONT``, DejaVu
+  Sans Mono by default), and is CPU work the caller should keep off the
+  event loop.
+
+Encoded characters and rasterized lines are cached, so repeated headers and
+product names are converted once.
+"""
+import os
+import textwrap
+import unicodedata
+from functools import lru_cache
+from typing import List, NamedTuple
+
+CODEPAGE = "cp1258"
+CODE_TABLE = int(os.getenv("ESCPOS_CODE_TABLE", "52"))  # WPC1258 on Epson printers
+FONT = os.getenv("ESCPOS_FONT", "DejaVuSansMono.ttf")
+BOLD_FONT = os.getenv("ESCPOS_BOLD_FONT", "DejaVuSansMono-Bold.ttf")
+
+# Characters per line (font A) and printable dots per line
+PAPER_COLUMNS = {58: 32, 80: 48}
+PAPER_DOTS = {58: 384, 80: 576}
+
+ESC_INIT = b"\x1b@"
+ALIGN_LEFT = b"\x1ba\x00"
+ALIGN_CENTER = b"\x1ba\x01"
+BOLD_ON = b"\x1bE\x01"
+BOLD_OFF = b"\x1bE\x00"
+DOUBLE_HEIGHT = b"\x1d!\x01"
+NORMAL_SIZE = b"\x1d!\x00"
+FEED_AND_CUT = b"\x1dV\x42\x03"  # feed 3 lines, then partial cut
+RASTER_BAND = 256  # rows per GS v 0 command; some printers cap the height
+
+# Combining tone marks of Windows-1258
+TONE_MARKS = {"\u0300", "\u0301", "\u0303", "\u0309", "\u0323"}
+
+
+class ReceiptFontError(Exception):
+    """The raster receipt font could not be loaded."""
+
+
+class Line(NamedTuple):
+    text: str
+    center: bool = False
+    bold: bool = False
+    large: bool = False
+
+
+def _money(value: float) -> str:
+    return f"{value:,.0f} đ"
+
+
+def _two_columns(left: str, right: str, columns: int) -> str:
+    return left + " " * max(1, columns - len(left) - len(right)) + right
+
+
+def receipt_lines(invoice, columns: int) -> List[Line]:
+    """Receipt layout of ``invoice`` (items and products loaded), in lines
+    of at most ``columns`` characters."""
+    rule = Line("-" * columns)
+    lines = [
+        Line("HÓA ĐƠN BÁN HÀNG", center=True, bold=True, large=True),
+        Line(invoice.invoice_number, center=True),
+        Line(f"Ngày: {invoice.created_at.strftime('%d/%m/%Y %H:%M:%S')}"),
+        rule,
+    ]
+    for item in invoice.items:
+        name = unicodedata.normalize("NFC", f"{item.product.code} {item.product.name}")
+        lines += [Line(part) for part in textwrap.wrap(name, columns)]
+        lines.append(Line(_two_columns(
+            f"  {item.quantity} x {_money(item.unit_price)}", _money(item.total_price), columns
+        )))
+    lines += [rule, Line(_two_columns("Tổng cộng:", _money(invoice.total_amount), columns), bold=True)]
+    return lines
+
+
+@lru_cache(maxsize=None)
+def _encode_char(char: str) -> bytes:
+    try:
+        return char.encode(CODEPAGE)
+    except UnicodeEncodeError:
+        pass
+    decomposed = unicodedata.normalize("NFD", char)
+    base = unicodedata.normalize("NFC", "".join(c for c in decomposed if c not in TONE_MARKS))
+    marks = "".join(c for c in decomposed if c in TONE_MARKS)
+    return (base + marks).encode(CODEPAGE, errors="replace")
+
+
+def encode_text(text: str) -> bytes:
+    """``text`` in Windows-1258, tone marks split off where needed."""
+    return b"".join(_encode_char(char) for char in unicodedata.normalize("NFC", text))
+
+
+def render_text(invoice, paper: int = 80) -> bytes:
+    """ESC/POS bytes of the receipt, printed in the WPC1258 code page."""
+    out = [ESC_INIT, b"\x1bt" + bytes([CODE_TABLE])]
+    for line in receipt_lines(invoice, PAPER_COLUMNS[paper]):
+        out.append(ALIGN_CENTER if line.center else ALIGN_LEFT)
+        if line.bold:
+            out.append(BOLD_ON)
+        if line.large:
+            out.append(DOUBLE_HEIGHT)
+        out.append(encode_text(line.text) + b"\n")
+        if line.large:
+            out.append(NORMAL_SIZE)
+        if line.bold:
+            out.append(BOLD_OFF)
+    out.append(FEED_AND_CUT)
+    return b"".join(out)
+
+
+def _truetype(path: str, size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        # Not installed (the Docker image installs DejaVu). Pillow's built-in
+        # font has no Vietnamese letters and is not monospace, so it would
+        # print boxes and misaligned columns
+        raise ReceiptFontError(
+            f"Raster receipts need a Unicode TrueType font; {path} could not be loaded "
+            "(set ESCPOS_FONT and ESCPOS_BOLD_FONT)."
+        )
+
+
+@lru_cache(maxsize=8)
+def _font(bold: bool, large: bool, columns: int, dots: int):
+    # Largest size at which a full line of a monospace font fits the paper
+    size = 12
+    while _truetype(FONT, size + 1).getlength("M" * columns) <= dots:
+        size += 1
+    return _truetype(BOLD_FONT if bold else FONT, size * 3 // 2 if large else size)
+
+
+@lru_cache(maxsize=4096)
+def _raster_line(line: Line, columns: int, dots: int) -> bytes:
+    """Rows of one line as packed bits, 1 = black, ``dots`` wide."""
+    from PIL import Image, ImageDraw
+
+    font = _font(line.bold, line.large, columns, dots)
+    height = font.getbbox("ÁẬỹgq|")[3] + 4  # tallest accents to deepest descenders
+    image = Image.new("1", (dots, height), 0)
+    width = font.getlength(line.text)
+    x = (dots - width) // 2 if line.center else 0
+    ImageDraw.Draw(image).text((x, 2), line.text, font=font, fill=1)
+    return image.tobytes()
+
+
+def render_raster(invoice, paper: int = 80) -> bytes:
+    """ESC/POS bytes of the receipt as bit images; raises ImportError
+    without Pillow and ReceiptFontError without the font."""
+    columns, dots = PAPER_COLUMNS[paper], PAPER_DOTS[paper]
+    row_bytes = dots // 8
+    image = b"".join(_raster_line(line, columns, dots) for line in receipt_lines(invoice, columns))
+    out = [ESC_INIT, ALIGN_LEFT]
+    rows = len(image) // row_bytes
+    for start in range(0, rows, RASTER_BAND):
+        band = min(RASTER_BAND, rows - start)
+        out.append(b"\x1dv0\x00" + row_bytes.to_bytes(2, "little") + band.to_bytes(2, "little"))
+        out.append(image[start * row_bytes:(start + band) * row_bytes])
+    out.append(FEED_AND_CUT)
+    return b"".join(out)
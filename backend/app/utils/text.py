@@ -0,0 +1,31 @@
+"""Text normalization helpers for product search."""
+import re
+import unicodedata
+from typing import List
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def fold_vietnamese(value: str) -> str:
+    """Lowercase and strip Vietnamese diacritics, e.g. "Cà Phê Đá" -> "ca phe da".
+
+    ``đ`` is a letter of its own rather than a ``d`` with a combining mark,
+    so it is mapped explicitly after the Unicode decomposition.
+    """
+    decomposed = unicodedata.normalize("NFD", value)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.replace("đ", "d").replace("Đ", "D").lower()
+
+
+def search_terms(query: str) -> List[str]:
+    """Split a search box query into folded word terms."""
+    return _WORD_RE.findall(fold_vietnamese(query))
+
+
+def fts_match_expression(query: str) -> str:
+    """Build an FTS5 MATCH expression where every term is a prefix query.
+
+    Terms are quoted so user input can never inject FTS5 query syntax.
+    Returns an empty string when the query has no searchable terms.
+    """
+    return " ".join(f'"{term}"*' for term in search_terms(query))
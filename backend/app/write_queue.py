@@ -0,0 +1,125 @@
+"""Single-writer queue that group-commits database writes.
+
+SQLite has exactly one writer at a time, so instead of every request opening
+its own write transaction and queueing on the lock, write units are handed to
+one background task. It runs whatever units are waiting inside a single
+transaction, each in its own SAVEPOINT, and commits them together. Every
+caller gets back its own unit's result or exception once the batch commits.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import AsyncSessionLocal
+
+WriteUnit = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class WriteQueue:
+    def __init__(self, session_factory, max_batch: int = 64, max_delay: float = 0.002):
+        """
+        Args:
+            session_factory: Callable returning a new AsyncSession for each batch
+            max_batch: Maximum number of units committed together
+            max_delay: Seconds to wait for more units once a batch has started
+        """
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, unit: WriteUnit) -> Any:
+        """Run ``unit`` in the next batch and return its result after commit.
+
+        Exceptions raised by the unit (e.g. ``HTTPException``) only roll back
+        that unit's savepoint and are re-raised to the caller.
+        """
+        self._ensure_running()
+        future = self._loop.create_future()
+        self._queue.put_nowait((unit, future))
+        return await future
+
+    async def stop(self) -> None:
+        """Finish the units already queued, then stop the writer task."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def _drain(self, batch: List[Tuple[WriteUnit, asyncio.Future]]) -> None:
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch and self.max_delay > 0:
+                await asyncio.sleep(self.max_delay)
+                self._drain(batch)
+            try:
+                await self._commit_batch(batch)
+            except Exception as e:
+                # No session, or the rollback itself failed: fail what is
+                # left of the batch and keep serving the next ones
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit_batch(self, batch: List[Tuple[WriteUnit, asyncio.Future]]) -> None:
+        outcomes = []
+        async with self.session_factory() as session:
+            try:
+                for unit, future in batch:
+                    if future.done():  # caller went away
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await unit(session)
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                await session.commit()
+            except Exception as e:
+                # The whole batch is lost; units that failed on their own keep their error
+                await session.rollback()
+                unit_errors = {id(future): error for future, _, error in outcomes if error}
+                outcomes = [
+                    (future, None, unit_errors.get(id(future), e)) for _, future in batch
+                ]
+
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+write_queue = WriteQueue(
+    AsyncSessionLocal,
+    max_batch=int(os.getenv("WRITE_QUEUE_MAX_BATCH", 64)),
+    max_delay=float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", 2)) / 1000,
+)
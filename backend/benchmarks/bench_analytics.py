@@ -0,0 +1,143 @@
+"""Per-product sales analytics: the NumPy pass over the rollups vs a per-product ORM loop over invoice_items.
+
+Sales are inserted before the rollup migration runs, so its backfill is
+timed too. The ORM loop (one query per product, measures computed in
+Python) is too slow to run for every product on millions of lines; it runs
+for a sample and is extrapolated to the whole catalog.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_analytics --lines 5000000 --products 2000 --days 90
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.analytics import analytics_cache, compute_analytics, previous_period, product_analytics
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.export import day_range
+from app.migrations import run_migrations
+
+HISTORY_DAYS = 730
+LINES_PER_INVOICE = 3
+CHUNK = 50_000  # invoices per insert transaction
+
+
+async def seed(engine, lines: int, products: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(insert(models.Product), [
+            {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 500}
+            for i in range(1, products + 1)
+        ])
+    rng = random.Random(1)
+    invoices = lines // LINES_PER_INVOICE
+    start = datetime(2023, 1, 1)
+    step = HISTORY_DAYS * 86400 / invoices
+    # Skewed demand, so the ABC classes are not all equal
+    weights = [1 / rank for rank in range(1, products + 1)]
+    for first in range(1, invoices + 1, CHUNK):
+        ids = range(first, min(first + CHUNK, invoices + 1))
+        picks = rng.choices(range(1, products + 1), weights, k=len(ids) * LINES_PER_INVOICE)
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Invoice), [
+                {"id": i, "invoice_number": f"INV-{i:08d}", "total_amount": LINES_PER_INVOICE * 10.0,
+                 "created_at": start + timedelta(seconds=i * step)}
+                for i in ids
+            ])
+            await conn.execute(insert(models.InvoiceItem), [
+                {"invoice_id": i, "product_id": product_id, "quantity": 1, "unit_price": 10.0, "total_price": 10.0}
+                for i, product_id in zip((i for i in ids for _ in range(LINES_PER_INVOICE)), picks)
+            ])
+    return start + timedelta(days=HISTORY_DAYS - 1)
+
+
+async def orm_loop(session_factory, product_ids, start, end):
+    """What the analytics would take without rollups or NumPy: each
+    product's lines of both periods loaded and summed in Python."""
+    previous_start, _ = previous_period(start, end)
+    since, _ = day_range(previous_start, end)
+    boundary, until = day_range(start, end)
+    measures = {}
+    async with session_factory() as db:
+        for product_id in product_ids:
+            product = await db.get(models.Product, product_id)
+            rows = (await db.execute(
+                select(models.InvoiceItem, models.Invoice.created_at)
+                .join(models.Invoice, models.Invoice.id == models.InvoiceItem.invoice_id)
+                .where(models.InvoiceItem.product_id == product_id,
+                       models.Invoice.created_at >= since, models.Invoice.created_at < until)
+            )).all()
+            units = sum(item.quantity for item, created_at in rows if created_at >= boundary)
+            revenue = sum(item.total_price for item, created_at in rows if created_at >= boundary)
+            previous_revenue = sum(item.total_price for item, created_at in rows if created_at < boundary)
+            measures[product_id] = (
+                units, revenue, units / ((end - start).days + 1),
+                units / (units + product.quantity) if units + product.quantity else 0.0,
+                (revenue - previous_revenue) / previous_revenue if previous_revenue else None,
+            )
+    return measures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5_000_000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--orm-sample", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        started = time.perf_counter()
+        last_day = (await seed(engine, args.lines, args.products)).date()
+        print(f"seeded {args.lines:,} lines, {args.products:,} products in {time.perf_counter() - started:.1f} s")
+        started = time.perf_counter()
+        await run_migrations(engine)
+        print(f"rollup backfill (migration):     {time.perf_counter() - started:8.1f} s")
+
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+        start, end = last_day - timedelta(days=args.days - 1), last_day
+
+        async with session_factory() as db:
+            started = time.perf_counter()
+            analytics = await compute_analytics(db, start, end)
+            computed = time.perf_counter() - started
+            classes = {c: int((analytics["abc_class"] == c).sum()) for c in "ABC"}
+            print(f"NumPy over rollups, cold:        {computed * 1000:8.1f} ms   classes {classes}")
+
+            analytics_cache.invalidate()
+            await product_analytics(db, start, end)
+            started = time.perf_counter()
+            await product_analytics(db, start, end)
+            print(f"NumPy over rollups, cached:      {(time.perf_counter() - started) * 1000:8.3f} ms")
+
+        sample = random.Random(2).sample(range(1, args.products + 1), args.orm_sample)
+        started = time.perf_counter()
+        measures = await orm_loop(session_factory, sample, start, end)
+        per_product = (time.perf_counter() - started) / len(sample)
+        print(f"ORM loop, per product:           {per_product * 1000:8.1f} ms"
+              f"   -> {per_product * args.products:,.0f} s for {args.products:,} products")
+
+        # Both give the same numbers
+        positions = {product_id: n for n, product_id in enumerate(analytics["product_id"].tolist())}
+        for product_id, (units, revenue, *_) in measures.items():
+            assert analytics["units"][positions[product_id]] == units
+            assert abs(analytics["revenue"][positions[product_id]] - revenue) < 1e-6
+
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
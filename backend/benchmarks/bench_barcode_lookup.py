@@ -0,0 +1,101 @@
+"""Server-side latency of a barcode scan: /products/by-code vs /products/search.
+
+Requests are sent straight into the ASGI app (no HTTP client or socket), so
+the numbers are what the server spends per scan, routing and dependencies
+included.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_barcode_lookup --skus 100000 --scans 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import schemas
+from app.database import SQLiteProfile, create_engine_for_profile, get_read_db
+from app.product_cache import product_cache
+from app.routers import products
+from benchmarks.bench_product_search import seed
+
+
+async def call(app: FastAPI, path: str, query: str = "") -> int:
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def measure(app: FastAPI, requests) -> tuple:
+    timings = []
+    for path, query in requests:
+        start = time.perf_counter()
+        assert await call(app, path, query) == 200
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--scans", type=int, default=2000)
+    parser.add_argument("--hot", type=int, default=500, help="distinct codes scanned")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        await seed(engine, args.skus)
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+
+        async def read_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(products.router)
+        app.dependency_overrides[get_read_db] = read_db
+
+        rng = random.Random(7)
+        hot = [f"SKU{rng.randint(1, args.skus):07d}" for _ in range(args.hot)]
+        scans = [rng.choice(hot) for _ in range(args.scans)]
+
+        product_cache.clear()
+        cold = await measure(app, [(f"/products/by-code/{code}", "") for code in hot])
+        warm = await measure(app, [(f"/products/by-code/{code}", "") for code in scans])
+        search = await measure(app, [
+            ("/products/search", f"query={code}&mode={schemas.ProductSearchMode.LIKE.value}")
+            for code in scans[:200]
+        ])
+        for label, (p50, p99) in [
+            ("by-code, cache miss", cold), ("by-code, cache hit", warm), ("search (ilike)", search),
+        ]:
+            print(f"{label:<20} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms")
+        print(f"cache: {len(product_cache)} entries, {product_cache.hits} hits, {product_cache.misses} misses")
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Price update from a supplier sheet: one PUT per product vs PATCH /products/bulk.
+
+Requests are sent straight into the ASGI app through httpx's ASGI transport,
+so the serial numbers are a lower bound: a terminal on shop Wi-Fi adds a
+network round trip to every PUT.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_bulk_patch --skus 100000 --updates 1000 10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile, get_db
+from app.routers import products
+from app.write_queue import WriteQueue
+from benchmarks.bench_product_search import seed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--updates", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--serial-max", type=int, default=1000, help="largest sheet sent as single PUTs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        await seed(engine, args.skus)
+        session_factory = sessionmaker(engine, class_=AsyncSession, autoflush=False)
+        products.write_queue = WriteQueue(session_factory)
+
+        async def db():
+            async with session_factory() as session:
+                yield session
+
+        app = FastAPI()
+        app.include_router(products.router)
+        app.dependency_overrides[get_db] = db
+
+        async with session_factory() as session:
+            rows = (await session.execute(select(models.Product))).scalars().all()
+            catalog = {product.id: product for product in rows}
+
+        rng = random.Random(3)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for updates in args.updates:
+                sheet = [(product_id, rng.randint(5, 500) * 1000) for product_id in rng.sample(list(catalog), updates)]
+
+                if updates <= args.serial_max:
+                    start = time.perf_counter()
+                    for product_id, price in sheet:
+                        product = catalog[product_id]
+                        response = await client.put(f"/products/{product_id}", json={
+                            "code": product.code, "name": product.name,
+                            "price": price, "quantity": product.quantity,
+                        })
+                        assert response.status_code == 200
+                    serial = time.perf_counter() - start
+                    print(f"{updates:>6} prices, one PUT each   {serial:8.2f}s ({updates / serial:8.0f} updates/s)")
+
+                start = time.perf_counter()
+                response = await client.patch("/products/bulk", json=[
+                    {"id": product_id, "price": price + 1000} for product_id, price in sheet
+                ])
+                bulk = time.perf_counter() - start
+                assert response.status_code == 200 and response.json()["updated"] == updates
+                print(f"{updates:>6} prices, one bulk PATCH {bulk:8.2f}s ({updates / bulk:8.0f} updates/s)")
+
+        await products.write_queue.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
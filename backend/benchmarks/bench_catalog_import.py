@@ -0,0 +1,105 @@
+"""Memory use of the streaming catalog file import.
+
+Writes CSV catalogs of increasing size, imports each one through the
+background job path (``save_upload`` + ``run_import``) and samples the
+process RSS while it runs. Peak heap RSS should stay flat as files grow. The
+in-memory catalog index is left unloaded here: it grows with the number of
+products in the catalog, not with the size of the file.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_catalog_import --mb 10 50 200
+"""
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models, product_import
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.write_queue import WriteQueue
+from benchmarks.bench_product_search import catalog
+
+
+def rss_mib(field: str = "RssAnon") -> float:
+    """Resident memory in MiB. ``RssAnon`` is the heap; ``RssFile`` also
+    counts the database pages SQLite maps with mmap_size."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def write_catalog(path: str, megabytes: int) -> int:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["code", "name", "price", "quantity"])
+        rows = 0
+        for product in catalog(10 ** 9):
+            writer.writerow([product["code"], product["name"], product["price"], product["quantity"]])
+            rows += 1
+            if rows % 10_000 == 0 and f.tell() >= megabytes * 2 ** 20:
+                return rows
+    return rows
+
+
+async def sample_rss(peak: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], rss_mib())
+        peak[1] = max(peak[1], rss_mib("RssFile"))
+        await asyncio.sleep(0.05)
+
+
+async def run(megabytes: int, chunk_size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "catalog.csv")
+        rows = write_catalog(source, megabytes)
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await run_migrations(engine)
+        product_import.write_queue = WriteQueue(sessionmaker(engine, class_=AsyncSession))
+
+        baseline = rss_mib()
+        peak, stop = [baseline, rss_mib("RssFile")], asyncio.Event()
+        sampler = asyncio.create_task(sample_rss(peak, stop))
+        start = time.perf_counter()
+        with open(source, "rb") as f:
+            path, kind = await product_import.save_upload(UploadFile(f, filename="catalog.csv"))
+        job = product_import.create_job("catalog.csv")
+        await product_import.run_import(job, path, kind, chunk_size)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampler
+
+        await product_import.write_queue.stop()
+        await engine.dispose()
+
+    print(
+        f"{megabytes:>5} MB, {rows:>9} rows: {job.status.value} in {elapsed:7.1f}s "
+        f"({rows / elapsed:7.0f} rows/s), heap RSS {baseline:6.1f} -> peak {peak[0]:6.1f} MiB "
+        f"(+{peak[0] - baseline:5.1f}), file-backed RSS peak {peak[1]:6.1f} MiB"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    for megabytes in args.mb:
+        await run(megabytes, args.chunk_size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
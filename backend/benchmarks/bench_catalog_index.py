@@ -0,0 +1,63 @@
+"""Memory footprint and search latency of the in-memory catalog index.
+
+Builds the index from synthetic Vietnamese catalogs (no database involved),
+measures the memory it holds with tracemalloc, then replays
+search-as-you-type keystrokes and reports p50/p99.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_catalog_index --skus 100000 500000 1000000
+"""
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+from app.catalog_index import CatalogIndex
+from benchmarks.bench_product_search import KEYSTROKES, catalog
+
+
+def build(skus: int) -> CatalogIndex:
+    index = CatalogIndex()
+    now = datetime.utcnow()
+    for id, product in enumerate(catalog(skus), start=1):
+        index._append(id, product["code"], product["name"], product["price"],
+                      product["quantity"], now, now)
+    index.ready = True
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, nargs="+", default=[100_000, 500_000, 1_000_000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    for skus in args.skus:
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = build(skus)
+        build_seconds = time.perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(args.rounds):
+            for query in KEYSTROKES:
+                start = time.perf_counter()
+                index.search(query, 0, 10)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(
+            f"{skus:>8} SKUs: {memory / 2**20:7.1f} MiB ({memory / skus:5.0f} B/SKU), "
+            f"built in {build_seconds:5.1f}s, "
+            f"search p50 {statistics.median(timings):6.3f} ms, "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:6.3f} ms"
+        )
+        del index
+
+
+if __name__ == "__main__":
+    main()
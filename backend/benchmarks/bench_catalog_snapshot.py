@@ -0,0 +1,134 @@
+"""Terminal bootstrap: /products/snapshot vs paging /products/search as JSON.
+
+Both paths download the whole catalog and decode it into product dicts, as a
+terminal does before it can sell offline; "time to first sale" is the time
+until the last product is decoded. Requests go straight into the ASGI app,
+so network time is left out and the payload sizes show what shop Wi-Fi would
+have to carry. Search pages are also shown gzip'd, as they would be behind a
+compressing proxy.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_catalog_snapshot --skus 100000
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import schemas
+from app.catalog_snapshot import catalog_snapshot
+from app.database import SQLiteProfile, create_engine_for_profile, get_read_db
+from app.routers import products
+from benchmarks.bench_product_search import seed
+
+
+async def call(app: FastAPI, path: str, query: str = "", headers=()) -> tuple:
+    response = {"body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+
+async def search_pages(app: FastAPI, limit: int) -> tuple:
+    raw = compressed = 0
+    catalog, cursor = [], None
+    while True:
+        params = {"query": "", "limit": limit, "mode": schemas.ProductSearchMode.LIKE.value}
+        if cursor:
+            params["cursor"] = cursor
+        status, _, body = await call(app, "/products/search", urlencode(params))
+        assert status == 200
+        raw += len(body)
+        compressed += len(gzip.compress(body))
+        page = json.loads(body)
+        catalog += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return catalog, raw, compressed
+
+
+async def snapshot(app: FastAPI, headers=(("accept-encoding", "gzip"),)) -> tuple:
+    status, response_headers, body = await call(app, "/products/snapshot", headers=headers)
+    assert status == 200
+    data = json.loads(gzip.decompress(body))
+    columns = data["columns"]
+    catalog = [dict(zip(columns, row)) for row in data["rows"]]
+    return catalog, len(body), response_headers[b"etag"].decode()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        await seed(engine, args.skus)
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+
+        async def read_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(products.router)
+        app.dependency_overrides[get_read_db] = read_db
+
+        start = time.perf_counter()
+        catalog, raw, compressed = await search_pages(app, args.page_size)
+        search_time = time.perf_counter() - start
+        assert len(catalog) == args.skus
+
+        start = time.perf_counter()
+        catalog, cold_size, etag = await snapshot(app)
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        catalog, warm_size, _ = await snapshot(app)
+        warm_time = time.perf_counter() - start
+        assert len(catalog) == args.skus
+
+        start = time.perf_counter()
+        status, _, _ = await call(app, "/products/snapshot", headers=[("if-none-match", etag)])
+        revalidate_time = time.perf_counter() - start
+        assert status == 304
+
+        print(f"{args.skus} SKUs, time to first sale and bytes transferred")
+        print(f"search pages of {args.page_size:<5}  {search_time:7.2f}s  {raw / 2 ** 20:8.2f} MiB json"
+              f"  ({compressed / 2 ** 20:.2f} MiB if gzip'd per page)")
+        print(f"snapshot, rebuilt     {cold_time:7.2f}s  {cold_size / 2 ** 20:8.2f} MiB gzip")
+        print(f"snapshot, cached      {warm_time:7.2f}s  {warm_size / 2 ** 20:8.2f} MiB gzip")
+        print(f"snapshot, unchanged   {revalidate_time * 1000:7.2f}ms 304 Not Modified")
+        print(f"snapshot cache holds {catalog_snapshot.count} products")
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
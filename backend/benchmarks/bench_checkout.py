@@ -0,0 +1,90 @@
+"""Checkout latency by cart size, per sale and per line item.
+
+Concurrent tills submit sales through the writer queue, as the API does; the
+latency of a sale is from submit to commit.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_checkout --tills 8 --sales 50 --lines 1 5 20 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from functools import partial
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.routers import invoices
+from app.write_queue import WriteQueue
+
+PRODUCTS = 5000
+
+
+def cart(rng: random.Random, lines: int) -> schemas.InvoiceCreate:
+    return schemas.InvoiceCreate(items=[
+        schemas.InvoiceItemCreate(product_id=product_id, quantity=rng.randint(1, 3), unit_price=10.0)
+        for product_id in rng.sample(range(1, PRODUCTS + 1), lines)
+    ])
+
+
+async def till(queue: WriteQueue, sales: list, timings: list):
+    for invoice in sales:
+        start = time.perf_counter()
+        await queue.submit(partial(invoices.checkout, invoice=invoice))
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+async def run(lines: int, tills: int, sales: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await run_migrations(engine)
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Product), [
+                {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 10_000_000}
+                for i in range(1, PRODUCTS + 1)
+            ])
+        queue = WriteQueue(sessionmaker(engine, class_=AsyncSession))
+
+        rng = random.Random(lines)
+        timings = []
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            till(queue, [cart(rng, lines) for _ in range(sales)], timings) for _ in range(tills)
+        ])
+        elapsed = time.perf_counter() - start
+        await queue.stop()
+        await engine.dispose()
+
+    timings.sort()
+    p50, p99 = statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+    print(
+        f"{lines:>3} lines: {tills * sales / elapsed:7.0f} sales/s   sale p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+        f"   per line p50 {p50 / lines:6.3f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tills", type=int, default=8)
+    parser.add_argument("--sales", type=int, default=50)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 5, 20, 50])
+    args = parser.parse_args()
+
+    for lines in args.lines:
+        await run(lines, args.tills, args.sales)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""Co-purchase index on a large catalog: full build, memory, incremental updates and cart recommendations.
+
+Baskets are skewed towards best sellers, and each product has a few
+regular companions, so the index has real neighbors to find among the
+noise (and products with more neighbors than slots evict some).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_copurchase --products 100000 --invoices 500000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.catalog_index import CatalogIndex
+from app.copurchase_index import CopurchaseIndex
+from app.database import SQLiteProfile, create_engine_for_profile
+
+CHUNK = 50_000  # invoices per insert transaction
+COMPANIONS = 3
+
+
+def basket(rng: random.Random, products: int, size: int):
+    first = min(int(rng.paretovariate(0.6)), products)
+    picks = [first]
+    for _ in range(size - 1):
+        if rng.random() < 0.5:
+            # A regular companion of the first product
+            picks.append((first * 7919 + rng.randrange(COMPANIONS)) % products + 1)
+        else:
+            picks.append(rng.randrange(1, products + 1))
+    return picks
+
+
+async def seed(engine, products: int, invoices: int, lines: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(insert(models.Product), [
+            {"code": f"SKU{i:06d}", "name": f"Product {i}", "price": 10.0, "quantity": 500}
+            for i in range(1, products + 1)
+        ])
+    rng = random.Random(1)
+    total = 0
+    for first in range(1, invoices + 1, CHUNK):
+        ids = range(first, min(first + CHUNK, invoices + 1))
+        items = [
+            {"invoice_id": i, "product_id": product_id, "quantity": 1, "unit_price": 10.0, "total_price": 10.0}
+            for i in ids for product_id in basket(rng, products, rng.randint(1, 2 * lines - 1))
+        ]
+        total += len(items)
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Invoice), [
+                {"id": i, "invoice_number": f"INV-{i:08d}", "total_amount": 0.0} for i in ids
+            ])
+            await conn.execute(insert(models.InvoiceItem), items)
+    return total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--invoices", type=int, default=500_000)
+    parser.add_argument("--lines", type=int, default=4, help="average lines per invoice")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        started = time.perf_counter()
+        lines = await seed(engine, args.products, args.invoices, args.lines)
+        print(f"seeded {args.products:,} products, {args.invoices:,} invoices, {lines:,} lines"
+              f" in {time.perf_counter() - started:.1f} s")
+
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+        catalog = CatalogIndex()
+        await catalog.load(session_factory)
+
+        index = CopurchaseIndex()
+        started = time.perf_counter()
+        await index.load(session_factory)
+        print(f"full build:             {time.perf_counter() - started:8.2f} s"
+              f"   ({index.baskets:,} baskets)")
+        print(f"memory ({index.slots} slots):      {index.memory_bytes() / 2**20:8.1f} MiB"
+              f"   ({index.memory_bytes() / args.products:.0f} bytes per product)")
+
+        rng = random.Random(2)
+        new_baskets = [basket(rng, args.products, args.lines) for _ in range(args.lookups)]
+        started = time.perf_counter()
+        for n, product_ids in enumerate(new_baskets, args.invoices + 1):
+            index.record(n, product_ids)
+        print(f"incremental update:     {(time.perf_counter() - started) / len(new_baskets) * 1e6:8.1f} µs per invoice")
+
+        timings = []
+        found = 0
+        for _ in range(args.lookups):
+            cart = basket(rng, args.products, rng.randint(1, 5))
+            started = time.perf_counter()
+            # What GET /products/recommendations does past parsing the ids
+            recommended = []
+            for product_id, score in index.recommend(cart):
+                product = catalog.get(product_id)
+                if product is not None and product["quantity"] > 0:
+                    recommended.append({**product, "score": score})
+                    if len(recommended) == 10:
+                        break
+            timings.append(time.perf_counter() - started)
+            found += bool(recommended)
+        timings.sort()
+        print(f"recommend, 1-5 items:   {statistics.median(timings) * 1e6:8.1f} µs median,"
+              f" {timings[int(len(timings) * 0.99)] * 1e6:.1f} µs p99"
+              f"   ({found / args.lookups:.0%} of carts got recommendations)")
+
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""Streaming a date range of sales lines as CSV: time, size and peak memory.
+
+Peak memory is the Python heap high-water mark (tracemalloc) while the
+response is consumed; it should not grow with the length of the range.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_export --invoices 200000 --items 5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile, get_read_db
+from app.migrations import run_migrations
+from app.routers import invoices
+
+YEAR = 2024
+
+
+async def seed(engine, count: int, items: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    await run_migrations(engine)
+    start, step = datetime(YEAR, 1, 1), timedelta(days=365) / count
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Product), [
+            {"code": f"SKU{i:05d}", "name": f"Cà phê sữa {i}", "price": 10.0, "quantity": 100} for i in range(1, 1001)
+        ])
+        for offset in range(0, count, 50_000):
+            batch = range(offset + 1, min(offset + 50_000, count) + 1)
+            await conn.execute(insert(models.Invoice), [
+                {"invoice_number": f"INV-{i:07d}", "total_amount": items * 10.0, "created_at": start + step * i}
+                for i in batch
+            ])
+            await conn.execute(insert(models.InvoiceItem), [
+                {"invoice_id": i, "product_id": (i * 7 + n) % 1000 + 1, "quantity": 1,
+                 "unit_price": 10.0, "total_price": 10.0}
+                for i in batch for n in range(items)
+            ])
+
+
+async def export(app, end: date) -> None:
+    # Called as a raw ASGI app: httpx's ASGI transport would buffer the body
+    size, disconnected = 0, asyncio.Event()
+
+    async def receive():
+        # StreamingResponse keeps listening for a disconnect while it sends
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/invoices/export", "raw_path": b"/invoices/export",
+        "query_string": f"start={YEAR}-01-01&end={end}".encode(), "root_path": "",
+        "headers": [(b"host", b"test")], "server": ("test", 80), "client": ("test", 1234),
+    }
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    # Again under tracemalloc, which slows it down too much to time
+    tracemalloc.start()
+    await app(scope, receive, send)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{YEAR}-01-01 .. {end}: {elapsed:7.2f}s  {size / 2 / 2**20:8.1f} MiB CSV   peak heap {peak / 2**20:6.1f} MiB")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=200_000)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        await seed(engine, args.invoices, args.items)
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+
+        async def read_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(invoices.router)
+        app.dependency_overrides[get_read_db] = read_db
+
+        for end in (date(YEAR, 1, 31), date(YEAR, 6, 30), date(YEAR, 12, 31)):
+            await export(app, end)
+
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
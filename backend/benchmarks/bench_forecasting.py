@@ -0,0 +1,111 @@
+"""Restock forecast of a large catalog: loading the demand series, fitting every product, writing the plans.
+
+The forecast reads the daily product rollup, so that is seeded directly
+(skewed demand with a weekly pattern, most products not selling every day)
+rather than through millions of invoices.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_forecasting --products 100000 --sell-rate 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from functools import partial
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import forecasting, models
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.write_queue import WriteQueue
+
+TODAY = date(2024, 6, 3)
+WEEKDAY_FACTORS = [0.8, 0.9, 0.9, 1.0, 1.2, 1.6, 1.4]
+
+
+async def seed(engine, products: int, sell_rate: float):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    await run_migrations(engine)
+    rng = random.Random(1)
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Product), [
+            {"code": f"SKU{i:06d}", "name": f"Product {i}", "price": 10.0, "quantity": rng.randint(0, 200)}
+            for i in range(1, products + 1)
+        ])
+    first = TODAY - timedelta(days=forecasting.HISTORY_DAYS)
+    rows = 0
+    for offset in range(forecasting.HISTORY_DAYS):
+        day = first + timedelta(days=offset)
+        factor = WEEKDAY_FACTORS[day.weekday()]
+        sales = [
+            {"day": day, "product_id": product_id, "quantity": max(1, int(rng.expovariate(1 / 4) * factor)), "revenue": 10.0}
+            for product_id in range(1, products + 1) if rng.random() < sell_rate * factor
+        ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.ProductSalesDaily), sales)
+        rows += len(sales)
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--sell-rate", type=float, default=0.3, help="share of products selling on a given day")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        started = time.perf_counter()
+        rows = await seed(engine, args.products, args.sell_rate)
+        print(f"seeded {args.products:,} products, {rows:,} product-days in {time.perf_counter() - started:.1f} s")
+
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+        forecasting.write_queue = WriteQueue(sessionmaker(engine, class_=AsyncSession))
+        first = TODAY - timedelta(days=forecasting.HISTORY_DAYS)
+
+        started = time.perf_counter()
+        async with session_factory() as db:
+            ids, demand = await forecasting.load_demand(db, first, forecasting.HISTORY_DAYS)
+        loaded = time.perf_counter() - started
+        print(f"load demand series:   {loaded:7.2f} s   ({demand.nbytes / 2**20:.0f} MiB matrix)")
+
+        started = time.perf_counter()
+        daily_demand, reorder_point, order_up_to = forecasting.plan_restock(demand)
+        print(f"fit + plan (NumPy):   {time.perf_counter() - started:7.2f} s")
+
+        started = time.perf_counter()
+        computed_at = datetime.utcnow()
+        plans = [
+            {"product_id": product_id, "daily_demand": demand, "reorder_point": rop, "order_up_to": level,
+             "computed_at": computed_at}
+            for product_id, demand, rop, level in zip(
+                ids.tolist(), daily_demand.tolist(), reorder_point.tolist(), order_up_to.tolist()
+            )
+        ]
+        for start in range(0, len(plans), forecasting.PLAN_WRITE_CHUNK):
+            await forecasting.write_queue.submit(
+                partial(forecasting.save_plans, plans=plans[start:start + forecasting.PLAN_WRITE_CHUNK])
+            )
+        print(f"write plans:          {time.perf_counter() - started:7.2f} s")
+
+        started = time.perf_counter()
+        await forecasting.run_forecast(session_factory, today=TODAY)
+        print(f"whole run_forecast:   {time.perf_counter() - started:7.2f} s"
+              f"   reorder points > 0: {int((reorder_point > 0).sum()):,}")
+
+        await forecasting.write_queue.stop()
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
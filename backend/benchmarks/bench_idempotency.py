@@ -0,0 +1,80 @@
+"""Cost of a retried POST /invoices/ carrying an Idempotency-Key.
+
+The first attempt runs the checkout; a retry with the same key is answered
+from the idempotency store without touching the writer queue.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_idempotency --sales 1000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.idempotency import IdempotencyMiddleware, IdempotencyStore
+from app.migrations import run_migrations
+from app.routers import invoices
+from app.write_queue import WriteQueue
+
+PRODUCTS = 2000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    sales = [
+        (str(uuid.uuid4()), {"items": [
+            {"product_id": product_id, "quantity": rng.randint(1, 3), "unit_price": 10.0}
+            for product_id in rng.sample(range(1, PRODUCTS + 1), rng.randint(1, 8))
+        ]})
+        for _ in range(args.sales)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await run_migrations(engine)
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Product), [
+                {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 10_000_000}
+                for i in range(1, PRODUCTS + 1)
+            ])
+        invoices.write_queue = WriteQueue(sessionmaker(engine, class_=AsyncSession))
+        store = IdempotencyStore()
+        app = FastAPI()
+        app.add_middleware(IdempotencyMiddleware, store=store)
+        app.include_router(invoices.router)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for attempt in ("first attempt", "retry"):
+                start = time.perf_counter()
+                for key, sale in sales:
+                    response = await client.post("/invoices/", json=sale, headers={"Idempotency-Key": key})
+                    assert response.status_code == 200
+                elapsed = time.perf_counter() - start
+                print(f"{attempt:<14} {elapsed:7.2f}s  {elapsed / len(sales) * 1000:6.2f} ms per request")
+        assert store.replays == len(sales)
+
+        await invoices.write_queue.stop()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
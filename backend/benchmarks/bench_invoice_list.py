@@ -0,0 +1,86 @@
+"""Invoice list pages: full invoices with their items vs ``view=summary``.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_invoice_list --invoices 20000 --items 5 --limit 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile, get_read_db
+from app.migrations import run_migrations
+from app.routers import invoices
+
+
+async def seed(engine, count: int, items: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    await run_migrations(engine)
+    start = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        await conn.execute(insert(models.Product), [
+            {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 100} for i in range(1, 101)
+        ])
+        await conn.execute(insert(models.Invoice), [
+            {"invoice_number": f"INV-{i:06d}", "total_amount": items * 10.0, "created_at": start + timedelta(minutes=i)}
+            for i in range(1, count + 1)
+        ])
+        await conn.execute(insert(models.InvoiceItem), [
+            {"invoice_id": i, "product_id": n % 100 + 1, "quantity": 1, "unit_price": 10.0, "total_price": 10.0}
+            for i in range(1, count + 1) for n in range(items)
+        ])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        await seed(engine, args.invoices, args.items)
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+
+        async def read_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(invoices.router)
+        app.dependency_overrides[get_read_db] = read_db
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for view in ("full", "summary"):
+                timings = []
+                for n in range(args.rounds):
+                    start = time.perf_counter()
+                    response = await client.get(
+                        "/invoices/", params={"page": n + 1, "limit": args.limit, "view": view, "approximate": True}
+                    )
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200
+                print(f"{view:<8} page of {args.limit}: p50 {statistics.median(timings):7.2f} ms"
+                      f"   {len(response.content) / 1024:7.1f} KiB")
+
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Cost of allocating an invoice number as the day's sales pile up.
+
+Compares the previous allocation (load the day's invoices with LIKE and count
+them) with the invoice_sequences UPSERT, after a day of N sales.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_invoice_number --day-sales 100 1000 10000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.routers.invoices import next_invoice_number
+
+
+async def count_today(db: AsyncSession, today: datetime) -> str:
+    result = await db.execute(
+        select(models.Invoice).filter(models.Invoice.invoice_number.like(f"INV-{today.strftime('%Y%m%d')}%"))
+    )
+    return f"INV-{today.strftime('%Y%m%d')}-{str(len(result.scalars().all()) + 1).zfill(4)}"
+
+
+async def measure(session_factory, allocate, today: datetime, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        async with session_factory() as db:
+            start = time.perf_counter()
+            await allocate(db, today)
+            timings.append((time.perf_counter() - start) * 1000)
+            await db.rollback()
+    return statistics.median(timings)
+
+
+async def run(day_sales: int, rounds: int):
+    today = datetime.now()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+            await conn.execute(insert(models.Product), [{"code": "SKU1", "name": "P", "price": 1.0, "quantity": 1}])
+            invoices = (await conn.execute(insert(models.Invoice).returning(models.Invoice.id), [
+                {"invoice_number": f"INV-{today.strftime('%Y%m%d')}-{n:04d}", "total_amount": 10.0}
+                for n in range(1, day_sales + 1)
+            ])).scalars().all()
+            await conn.execute(insert(models.InvoiceItem), [
+                {"invoice_id": invoice_id, "product_id": 1, "quantity": 1, "unit_price": 5.0, "total_price": 5.0}
+                for invoice_id in invoices for _ in range(3)
+            ])
+        await run_migrations(engine)  # seeds invoice_sequences from the invoices above
+        session_factory = sessionmaker(engine, class_=AsyncSession)
+
+        previous = await measure(session_factory, count_today, today, rounds)
+        sequence = await measure(session_factory, next_invoice_number, today, rounds)
+        await engine.dispose()
+    print(f"{day_sales:>7} sales today: count invoices {previous:9.3f} ms   sequence {sequence:7.3f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--day-sales", type=int, nargs="+", default=[100, 1000, 10_000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    for day_sales in args.day_sales:
+        await run(day_sales, args.rounds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
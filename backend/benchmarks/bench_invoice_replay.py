@@ -0,0 +1,105 @@
+"""Replaying a terminal's offline queue: one POST /invoices/ per sale vs POST /invoices/batch.
+
+Requests go through httpx's ASGI transport (no network), so the per-sale
+replay is a lower bound: on shop Wi-Fi every sale also pays a round trip.
+The batch replay is then repeated to show that a retried upload only
+reports duplicates.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_invoice_replay --sales 5000 --batch-size 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.routers import invoices
+from app.write_queue import WriteQueue
+
+PRODUCTS = 2000
+
+
+def queued_sales(sales: int) -> list:
+    rng = random.Random(5)
+    return [
+        {
+            "client_txn_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "items": [
+                {"product_id": product_id, "quantity": rng.randint(1, 3), "unit_price": 10.0}
+                for product_id in rng.sample(range(1, PRODUCTS + 1), rng.randint(1, 8))
+            ],
+        }
+        for _ in range(sales)
+    ]
+
+
+async def replay(label: str, sales: list, batch_size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await run_migrations(engine)
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Product), [
+                {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 10_000_000}
+                for i in range(1, PRODUCTS + 1)
+            ])
+        invoices.write_queue = WriteQueue(sessionmaker(engine, class_=AsyncSession))
+        app = FastAPI()
+        app.include_router(invoices.router)
+
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None
+        ) as client:
+            start = time.perf_counter()
+            if batch_size == 1:
+                for sale in sales:
+                    response = await client.post("/invoices/", json={"items": sale["items"]})
+                    assert response.status_code == 200
+            else:
+                for attempt in ("first", "retry"):
+                    start = time.perf_counter()
+                    created = duplicates = 0
+                    for offset in range(0, len(sales), batch_size):
+                        response = await client.post("/invoices/batch", json=sales[offset:offset + batch_size])
+                        assert response.status_code == 200
+                        created += response.json()["created"]
+                        duplicates += response.json()["duplicates"]
+                    elapsed = time.perf_counter() - start
+                    print(f"{label + ', ' + attempt:<32} {elapsed:7.2f}s ({len(sales) / elapsed:6.0f} sales/s)"
+                          f"  created {created}, duplicates {duplicates}")
+            if batch_size == 1:
+                elapsed = time.perf_counter() - start
+                print(f"{label:<32} {elapsed:7.2f}s ({len(sales) / elapsed:6.0f} sales/s)")
+
+        await invoices.write_queue.stop()
+        await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sales", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    sales = queued_sales(args.sales)
+    await replay("one POST per sale", sales, 1)
+    await replay(f"batches of {args.batch_size}", sales, args.batch_size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""Bulk product import throughput: ORM add + refresh per row vs chunked upsert.
+
+Each size is imported into an empty catalog and then imported again, so the
+second run measures the ON CONFLICT update path. The ORM baseline is only
+run up to --orm-max rows.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_product_import --rows 10000 100000 1000000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models, product_import
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.write_queue import WriteQueue
+from benchmarks.bench_product_search import catalog
+
+
+async def orm_per_row(session_factory, rows: int) -> None:
+    """The original bulk_create_products: add every row, commit, refresh each."""
+    async with session_factory() as db:
+        db_products = [models.Product(**product) for product in catalog(rows)]
+        db.add_all(db_products)
+        await db.commit()
+        for product in db_products:
+            await db.refresh(product)
+
+
+async def chunked_upsert(session_factory, rows: int, chunk_size: int) -> None:
+    report = await product_import.upsert_products(enumerate(catalog(rows), start=1), chunk_size=chunk_size)
+    assert not report.errors, report.errors[:3]
+
+
+async def timed(label: str, rows: int, make_run) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await run_migrations(engine)
+        session_factory = sessionmaker(engine, class_=AsyncSession)
+        product_import.write_queue = WriteQueue(session_factory)
+
+        for phase in ("insert", "update"):
+            start = time.perf_counter()
+            await make_run(session_factory)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<22} {phase:<6} {rows:>8} rows in {elapsed:7.2f}s -> {rows / elapsed:9.0f} rows/s")
+            if label.startswith("orm"):
+                break  # a second plain insert would only hit the unique constraint
+        await product_import.write_queue.stop()
+        await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--orm-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        if rows <= args.orm_max:
+            await timed("orm + refresh per row", rows, lambda factory: orm_per_row(factory, rows))
+        for chunk_size in args.chunk_size:
+            await timed(
+                f"upsert chunk={chunk_size}", rows,
+                lambda factory: chunked_upsert(factory, rows, chunk_size)
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
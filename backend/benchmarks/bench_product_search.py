@@ -0,0 +1,91 @@
+"""Product search latency: ILIKE substring scan vs the FTS5 index.
+
+Seeds a catalog of Vietnamese product names, then replays search-as-you-type
+keystrokes through ``search_products`` and reports p50/p99 per mode.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_product_search --skus 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.migrations import run_migrations
+from app.routers.products import search_products
+
+WORDS = [
+    "cà phê", "sữa", "đá", "trà", "đào", "cam", "sả", "bánh", "mì", "thịt", "gà",
+    "nướng", "nước", "mắm", "gạo", "tám", "thơm", "dầu", "ăn", "đường", "muối",
+    "mì tôm", "hảo hảo", "bia", "sài gòn", "kẹo", "dừa", "bến tre", "nem", "chua",
+]
+KEYSTROKES = ["c", "ca", "ca p", "ca ph", "ca phe", "ca phe s", "ca phe sua",
+              "b", "ba", "ban", "banh", "banh m", "banh mi", "SK", "SKU01", "SKU0123"]
+
+
+def catalog(skus: int):
+    rng = random.Random(42)
+    for i in range(1, skus + 1):
+        yield {
+            "code": f"SKU{i:07d}",
+            "name": " ".join(rng.sample(WORDS, 3)) + f" {rng.randint(100, 999)}g",
+            "price": rng.randint(5, 500) * 1000,
+            "quantity": rng.randint(0, 200),
+        }
+
+
+async def seed(engine, skus: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    await run_migrations(engine)
+    rows = list(catalog(skus))
+    async with engine.begin() as conn:
+        for start in range(0, len(rows), 10_000):
+            await conn.execute(insert(models.Product), rows[start:start + 10_000])
+
+
+async def measure(session_factory, mode, rounds: int):
+    timings = []
+    async with session_factory() as db:
+        for _ in range(rounds):
+            for query in KEYSTROKES:
+                start = time.perf_counter()
+                await search_products(query=query, page=1, limit=10, mode=mode, db=db)
+                timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skus", type=int, default=200_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        start = time.perf_counter()
+        await seed(engine, args.skus)
+        print(f"seeded {args.skus} SKUs in {time.perf_counter() - start:.1f}s")
+
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession)
+        for mode in schemas.ProductSearchMode:
+            p50, p99 = await measure(session_factory, mode, args.rounds)
+            print(f"{mode.value:<5} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
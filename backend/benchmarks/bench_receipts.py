@@ -0,0 +1,103 @@
+"""Receipt printing: cold render vs cached reprint (HTML and ESC/POS), and a day's batch reprint.
+
+While the batch document streams, a ticker task measures the longest the
+event loop went without running it (what other tills would wait).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_receipts --invoices 500 --items 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database import SQLiteProfile, create_engine_for_profile, get_read_db
+from app.receipts import receipt_cache
+from app.routers import invoices
+from benchmarks.bench_invoice_list import seed
+
+
+async def ticker(stalls: list, stop: asyncio.Event):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        stalls.append((now - last) * 1000)
+        last = now
+
+
+async def batch(client, ids: list) -> tuple:
+    stalls, stop = [], asyncio.Event()
+    task = asyncio.create_task(ticker(stalls, stop))
+    start = time.perf_counter()
+    response = await client.get("/invoices/print/batch", params={"ids": ",".join(map(str, ids))})
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    await task
+    assert response.status_code == 200
+    return elapsed, max(stalls), len(response.content)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=500)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        await seed(engine, args.invoices, args.items)
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+
+        async def read_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(invoices.router)
+        app.dependency_overrides[get_read_db] = read_db
+        ids = list(range(1, args.invoices + 1))
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for label in ("print, cold", "reprint, cached"):
+                timings = []
+                for invoice_id in ids[:200]:
+                    start = time.perf_counter()
+                    response = await client.get(f"/invoices/print/{invoice_id}")
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200
+                print(f"{label:<22} p50 {statistics.median(timings):7.2f} ms")
+
+            for label in ("ESC/POS text, cold", "ESC/POS text, cached"):
+                timings = []
+                for invoice_id in ids[:200]:
+                    start = time.perf_counter()
+                    response = await client.get(f"/invoices/print/{invoice_id}/escpos")
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200
+                print(f"{label:<22} p50 {statistics.median(timings):7.2f} ms   {len(response.content)} bytes")
+
+            receipt_cache.clear()
+            # The first batch also compiles the batch template
+            for label in ("batch, cold", "batch, cold again", "batch, cached"):
+                if label == "batch, cold again":
+                    receipt_cache.clear()
+                elapsed, stall, size = await batch(client, ids)
+                print(f"{label:<22} {len(ids)} receipts {elapsed:8.1f} ms  {size / 1024:7.0f} KiB"
+                      f"   longest event-loop stall {stall:6.1f} ms")
+
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
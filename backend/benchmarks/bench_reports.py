@@ -0,0 +1,144 @@
+"""Sales dashboard (revenue by day, top products, hourly heatmap) read from the rollups vs scanning invoices.
+
+The history grows in steps; at each size the dashboard is loaded for the
+last 30 days and for the whole history, through the /reports endpoints and
+through the same aggregates computed from invoices and invoice_items.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_reports --per-day 200 --items 3 --days 90 365 730
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import Integer, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import SQLiteProfile, create_engine_for_profile, get_read_db
+from app.export import day_range
+from app.migrations import run_migrations
+from app.routers import reports
+
+FIRST_DAY = date(2022, 1, 1)
+
+
+async def add_history(engine, first: int, last: int, per_day: int, items: int):
+    """Sales of days ``first`` to ``last`` (offsets from FIRST_DAY), recorded
+    through the triggers like live checkouts."""
+    invoice_id = first * per_day
+    for offset in range(first, last):
+        day = datetime.combine(FIRST_DAY + timedelta(days=offset), datetime.min.time())
+        invoice_rows, item_rows = [], []
+        for n in range(per_day):
+            invoice_id += 1
+            invoice_rows.append({
+                "id": invoice_id, "invoice_number": f"INV-{invoice_id:08d}", "total_amount": items * 10.0,
+                "created_at": day + timedelta(hours=7, seconds=n * 50_000 // per_day),
+            })
+            item_rows += [
+                {"invoice_id": invoice_id, "product_id": (invoice_id * 7 + k) % 500 + 1,
+                 "quantity": 1, "unit_price": 10.0, "total_price": 10.0}
+                for k in range(items)
+            ]
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Invoice), invoice_rows)
+            await conn.execute(insert(models.InvoiceItem), item_rows)
+
+
+def raw_queries(start: date, end: date):
+    """The dashboard computed from the invoices themselves."""
+    since, until = day_range(start, end)
+    in_range = (models.Invoice.created_at >= since, models.Invoice.created_at < until)
+    day = func.date(models.Invoice.created_at, "localtime")
+    weekday = func.cast(func.strftime("%w", models.Invoice.created_at, "localtime"), Integer)
+    hour = func.cast(func.strftime("%H", models.Invoice.created_at, "localtime"), Integer)
+    units = (
+        select(func.sum(models.InvoiceItem.quantity))
+        .where(models.InvoiceItem.invoice_id == models.Invoice.id)
+        .scalar_subquery()
+    )
+    return [
+        select(day, func.count(), func.sum(units), func.sum(models.Invoice.total_amount))
+        .where(*in_range).group_by(day).order_by(day),
+        select(models.InvoiceItem.product_id, func.sum(models.InvoiceItem.quantity),
+               func.sum(models.InvoiceItem.total_price).label("revenue"))
+        .join(models.Invoice, models.Invoice.id == models.InvoiceItem.invoice_id)
+        .where(*in_range).group_by(models.InvoiceItem.product_id)
+        .order_by(func.sum(models.InvoiceItem.total_price).desc()).limit(10),
+        select(weekday, hour, func.count(), func.sum(models.Invoice.total_amount))
+        .where(*in_range).group_by(weekday, hour).order_by(weekday, hour),
+    ]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-day", type=int, default=200)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--days", type=int, nargs="+", default=[90, 365, 730])
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, SQLiteProfile())
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await run_migrations(engine)
+        async with engine.begin() as conn:
+            await conn.execute(insert(models.Product), [
+                {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 10**9}
+                for i in range(1, 501)
+            ])
+        reader = create_engine_for_profile(url, SQLiteProfile().for_readers())
+        session_factory = sessionmaker(reader, class_=AsyncSession, autoflush=False)
+
+        async def read_db():
+            async with session_factory() as db:
+                yield db
+
+        app = FastAPI()
+        app.include_router(reports.router)
+        app.dependency_overrides[get_read_db] = read_db
+
+        def timed(timings, started):
+            timings.append((time.perf_counter() - started) * 1000)
+
+        print(f"{'history':>8} {'range':>8} {'rollups p50':>12} {'invoices p50':>13}")
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            loaded = 0
+            for days in args.days:
+                started = time.perf_counter()
+                await add_history(engine, loaded, days, args.per_day, args.items)
+                print(f"  (+{days - loaded} days of sales recorded in {time.perf_counter() - started:.1f} s)")
+                loaded = days
+                end = FIRST_DAY + timedelta(days=days - 1)
+                for label, start in (("30 days", end - timedelta(days=29)), ("all", FIRST_DAY)):
+                    params = {"start": start.isoformat(), "end": end.isoformat()}
+                    rollups, raw = [], []
+                    for _ in range(args.rounds):
+                        started = time.perf_counter()
+                        for path in ("/reports/revenue", "/reports/top-products", "/reports/hourly"):
+                            assert (await client.get(path, params=params)).status_code == 200
+                        timed(rollups, started)
+                        started = time.perf_counter()
+                        async with session_factory() as db:
+                            for stmt in raw_queries(start, end):
+                                (await db.execute(stmt)).all()
+                        timed(raw, started)
+                    print(f"{days:>7}d {label:>8} {statistics.median(rollups):9.2f} ms"
+                          f" {statistics.median(raw):10.2f} ms")
+
+        await reader.dispose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""Checkout throughput with and without the tuned SQLite engine profile.
+
+Runs ``create_invoice`` from several concurrent "tills" against a fresh
+database file for each configuration, while a reader keeps searching the
+catalog, and reports sales per second plus lock errors.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_sqlite_profile --tills 8 --sales 50
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.models import Base
+from app.routers import invoices
+
+PRODUCTS = 200
+
+
+async def seed(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(models.Product), [
+            {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0 + i, "quantity": 1_000_000}
+            for i in range(1, PRODUCTS + 1)
+        ])
+
+
+async def till(session_factory, till_id: int, sales: int, errors: list):
+    for sale in range(sales):
+        product_id = (till_id * 31 + sale) % PRODUCTS + 1
+        invoice = schemas.InvoiceCreate(items=[
+            schemas.InvoiceItemCreate(product_id=product_id, quantity=1, unit_price=10.0),
+            schemas.InvoiceItemCreate(product_id=product_id % PRODUCTS + 1, quantity=2, unit_price=12.0),
+        ])
+        async with session_factory() as db:
+            try:
+                await invoices.checkout(db, invoice)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                errors.append(str(e))
+
+
+async def reader(session_factory, stop: asyncio.Event, counter: list):
+    while not stop.is_set():
+        async with session_factory() as db:
+            await db.execute(
+                select(func.count()).select_from(models.Product)
+                .where(models.Product.name.ilike("%1%"))
+            )
+            counter[0] += 1
+
+
+async def run(label: str, profile, tills: int, sales: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_engine_for_profile(url, profile)
+        read_engine = create_engine_for_profile(url, profile.for_readers() if profile else None)
+        await seed(engine)
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        read_session_factory = sessionmaker(read_engine, class_=AsyncSession)
+
+        errors, reads, stop = [], [0], asyncio.Event()
+        reader_task = asyncio.create_task(reader(read_session_factory, stop, reads))
+        start = time.perf_counter()
+        await asyncio.gather(*(till(session_factory, t, sales, errors) for t in range(tills)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await reader_task
+        await engine.dispose()
+        await read_engine.dispose()
+
+    completed = tills * sales - len(errors)
+    print(
+        f"{label:<8} {completed:>6} sales in {elapsed:6.2f}s "
+        f"-> {completed / elapsed:8.1f} sales/s, {reads[0] / elapsed:8.1f} reads/s, "
+        f"{len(errors)} errors"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tills", type=int, default=8)
+    parser.add_argument("--sales", type=int, default=50, help="sales per till")
+    args = parser.parse_args()
+
+    await run("default", None, args.tills, args.sales)
+    await run("tuned", SQLiteProfile.from_env(), args.tills, args.sales)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
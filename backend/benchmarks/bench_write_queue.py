@@ -0,0 +1,99 @@
+"""Checkout throughput: one transaction per sale vs the group-commit writer queue.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_write_queue --tills 24 --sales 40
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from functools import partial
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.database import SQLiteProfile, create_engine_for_profile
+from app.models import Base
+from app.routers import invoices
+from app.write_queue import WriteQueue
+
+PRODUCTS = 500
+
+
+def sale(till_id: int, n: int) -> schemas.InvoiceCreate:
+    product_id = (till_id * 37 + n) % PRODUCTS + 1
+    return schemas.InvoiceCreate(items=[
+        schemas.InvoiceItemCreate(product_id=product_id, quantity=1, unit_price=10.0),
+        schemas.InvoiceItemCreate(product_id=product_id % PRODUCTS + 1, quantity=1, unit_price=5.0),
+    ])
+
+
+async def per_sale_commit(session_factory, till_id: int, sales: int, errors: list):
+    for n in range(sales):
+        async with session_factory() as db:
+            try:
+                await invoices.checkout(db, sale(till_id, n))
+                await db.commit()
+            except Exception as e:
+                errors.append(e)
+
+
+async def queued(queue: WriteQueue, till_id: int, sales: int, errors: list):
+    for n in range(sales):
+        try:
+            await queue.submit(partial(invoices.checkout, invoice=sale(till_id, n)))
+        except Exception as e:
+            errors.append(e)
+
+
+async def run(label: str, tills: int, sales: int, use_queue: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine_for_profile(
+            f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", SQLiteProfile()
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(models.Product), [
+                {"code": f"SKU{i:05d}", "name": f"Product {i}", "price": 10.0, "quantity": 10_000_000}
+                for i in range(1, PRODUCTS + 1)
+            ])
+        commits = [0]
+        event.listen(engine.sync_engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        queue = WriteQueue(session_factory)
+
+        errors = []
+        start = time.perf_counter()
+        if use_queue:
+            await asyncio.gather(*(queued(queue, t, sales, errors) for t in range(tills)))
+            await queue.stop()
+        else:
+            await asyncio.gather(*(
+                per_sale_commit(session_factory, t, sales, errors) for t in range(tills)
+            ))
+        elapsed = time.perf_counter() - start
+        await engine.dispose()
+
+    total = tills * sales - len(errors)
+    print(
+        f"{label:<16} {total:>6} sales in {elapsed:6.2f}s -> {total / elapsed:8.1f} sales/s, "
+        f"{commits[0]} commits ({total / max(commits[0], 1):.1f} sales/commit), "
+        f"{len(errors)} errors"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tills", type=int, default=24)
+    parser.add_argument("--sales", type=int, default=40, help="sales per till")
+    args = parser.parse_args()
+
+    await run("commit per sale", args.tills, args.sales, use_queue=False)
+    await run("writer queue", args.tills, args.sales, use_queue=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
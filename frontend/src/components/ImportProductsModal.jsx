@@ -17,8 +17,8 @@ export default function ImportProductsModal({ open, onClose, onImport }) {
 
     const handleFileChange = (event) => {
         const selectedFile = event.target.files[0];
-        if (selectedFile && selectedFile.type !== 'text/csv') {
-            setError('Chỉ chấp nhận file CSV');
+        if (selectedFile && !/\.(csv|xlsx)$/i.test(selectedFile.name)) {
+            setError('Chỉ chấp nhận file CSV hoặc XLSX');
             return;
         }
         setFile(selectedFile);
@@ -38,54 +38,21 @@ export default function ImportProductsModal({ open, onClose, onImport }) {
         window.URL.revokeObjectURL(url);
     };
 
+    // The server parses and validates the file, so large catalogs are
+    // uploaded as they are instead of being read into the browser
     const handleImport = () => {
         if (!file) {
-            setError('Vui lòng chọn file CSV');
+            setError('Vui lòng chọn file CSV hoặc XLSX');
             return;
         }
-
-        const reader = new FileReader();
-        reader.onload = (e) => {
-            try {
-                const content = e.target.result;
-                const lines = content.split('\n');
-                const headers = lines[0].toLowerCase().trim().split(',');
-                
-                if (!headers.includes('code') || !headers.includes('name') || 
-                    !headers.includes('price') || !headers.includes('quantity')) {
-                    setError('File CSV không đúng định dạng. Vui lòng tải template mẫu.');
-                    return;
-                }
-
-                const products = lines.slice(1)
-                    .filter(line => line.trim())
-                    .map(line => {
-                        const values = line.split(',');
-                        return {
-                            code: values[0].trim(),
-                            name: values[1].trim(),
-                            price: parseFloat(values[2].trim()),
-                            quantity: parseInt(values[3].trim())
-                        };
-                    });
-
-                if (products.some(p => isNaN(p.price) || isNaN(p.quantity))) {
-                    setError('Giá hoặc số lượng không hợp lệ');
-                    return;
-                }
-
-                onImport(products);
-                onClose();
-            } catch (err) {
-                setError('Lỗi xử lý file: ' + err.message);
-            }
-        };
-        reader.readAsText(file);
+        onImport(file);
+        setFile(null);
+        onClose();
     };
 
     return (
         <Dialog open={open} onClose={onClose} maxWidth="sm" fullWidth>
-            <DialogTitle>Import Sản phẩm từ CSV</DialogTitle>
+            <DialogTitle>Import Sản phẩm từ CSV/XLSX</DialogTitle>
             <DialogContent>
                 <Box sx={{ mb: 2 }}>
                     <Button variant="outlined" onClick={downloadTemplate}>
@@ -103,7 +70,7 @@ export default function ImportProductsModal({ open, onClose, onImport }) {
                     }}
                 >
                     <input
-                        accept=".csv"
+                        accept=".csv,.xlsx"
                         style={{ display: 'none' }}
                         id="csv-file"
                         type="file"
@@ -115,7 +82,7 @@ export default function ImportProductsModal({ open, onClose, onImport }) {
                             variant="contained"
                             startIcon={<CloudUpload />}
                         >
-                            Chọn file CSV
+                            Chọn file CSV/XLSX
                         </Button>
                     </label>
                     {file && (
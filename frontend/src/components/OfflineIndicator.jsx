@@ -1,7 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { Box, Alert, Snackbar, Badge, IconButton, Tooltip } from '@mui/material';
 import { WifiOff, Sync } from '@mui/icons-material';
-import { isOnline, getPendingTransactions } from '../services/localStorageService';
+import { isOnline, getPendingTransactions, syncPendingTransactions } from '../services/localStorageService';
+import { replayInvoices } from '../services/api';
 
 /**
  * Component to display offline status and pending transactions
@@ -69,7 +70,11 @@ export default function OfflineIndicator() {
     } else {
       console.log('Background sync not supported');
       // Fallback for browsers that don't support background sync
-      // Implement manual sync here
+      syncPendingTransactions(replayInvoices)
+        .then(loadPendingTransactions)
+        .catch(err => {
+          console.error('Manual sync failed:', err);
+        });
     }
   };
 
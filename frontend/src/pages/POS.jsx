@@ -29,7 +29,7 @@ import {
     ShoppingCart as ShoppingCartIcon,
     Sync as SyncIcon,
 } from '@mui/icons-material';
-import { searchProducts, createInvoice } from '../services/api';
+import { searchProducts, createInvoice, getProductChanges, getProductSnapshot } from '../services/api';
 import CameraModal from '../components/CameraModal';
 import OfflineIndicator from '../components/OfflineIndicator';
 import OfflineTransactionSuccess from '../components/OfflineTransactionSuccess';
@@ -37,7 +37,7 @@ import CartToggleButton from '../components/CartToggleButton';
 import { 
     isOnline, 
     getLocalProducts, 
-    saveLocalProducts, 
+    syncLocalProducts, 
     getLocalCart, 
     saveLocalCart,
     saveLocalTransaction,
@@ -118,9 +118,9 @@ export default function POS() {
                 const response = await searchProducts('');
                 setProducts(response.items);
                 
-                // Save to local storage for offline use
-                saveLocalProducts(response.items).catch(err => 
-                    console.error('Error saving products to local storage:', err)
+                // Sync the offline catalog with what changed since the last sync
+                syncLocalProducts(getProductChanges, getProductSnapshot).catch(err => 
+                    console.error('Error syncing products to local storage:', err)
                 );
             } catch (error) {
                 console.error('Error loading products from API:', error);
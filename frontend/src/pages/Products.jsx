@@ -14,7 +14,7 @@ import {
 } from '@mui/material';
 import { DataGrid } from '@mui/x-data-grid';
 import { Add as AddIcon, Edit as EditIcon, CloudUpload } from '@mui/icons-material';
-import { searchProducts, createProduct, updateProduct, importProducts } from '../services/api';
+import { searchProducts, createProduct, updateProduct, importProductFile, getProductImportJob } from '../services/api';
 import ImportProductsModal from '../components/ImportProductsModal';
 
 export default function Products() {
@@ -221,10 +221,17 @@ export default function Products() {
             <ImportProductsModal
                 open={openImportDialog}
                 onClose={() => setOpenImportDialog(false)}
-                onImport={async (products) => {
+                onImport={async (file) => {
                     try {
                         setLoading(true);
-                        await importProducts(products);
+                        let job = await importProductFile(file);
+                        while (job.status === 'pending' || job.status === 'running') {
+                            await new Promise((resolve) => setTimeout(resolve, 1000));
+                            job = await getProductImportJob(job.job_id);
+                        }
+                        if (job.report.error_count > 0 || job.status === 'failed') {
+                            console.error('Product import finished with errors:', job);
+                        }
                         loadProducts();
                     } catch (error) {
                         console.error('Error importing products:', error);
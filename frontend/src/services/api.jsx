@@ -9,6 +9,23 @@ export const api = axios.create({
 
 export default api;
 
+const POST_RETRIES = 2;
+
+// POST with an Idempotency-Key, retried with the same key when no response
+// came back (timeout, dropped connection), so the server applies it once
+const postIdempotent = async (url, data) => {
+    const headers = { 'Idempotency-Key': crypto.randomUUID() };
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await api.post(url, data, { headers });
+        } catch (error) {
+            if (error.response || attempt >= POST_RETRIES) {
+                throw error;
+            }
+        }
+    }
+};
+
 // Product APIs
 export const searchProducts = async (query, page = 1, limit = 10) => {
     const response = await api.get(`/products/search?query=${query}&page=${page}&limit=${limit}`);
@@ -20,8 +37,51 @@ export const getProduct = async (id) => {
     return response.data;
 };
 
+export const getProductsByIds = async (ids) => {
+    const response = await api.get('/products/', { params: { ids: ids.join(',') } });
+    return response.data;
+};
+
+// Products also bought with the cart's, in stock, best first (each has a score)
+export const getRecommendations = async (ids, limit = 10) => {
+    const response = await api.get('/products/recommendations', { params: { ids: ids.join(','), limit } });
+    return response.data;
+};
+
+// patches: [{ id, price?, quantity?, name?, code? }]; returns one result per patch
+export const bulkPatchProducts = async (patches) => {
+    const response = await api.patch('/products/bulk', patches);
+    return response.data;
+};
+
+export const getProductByCode = async (code) => {
+    const response = await api.get(`/products/by-code/${encodeURIComponent(code)}`);
+    return response.data;
+};
+
+export const getProductsByCodes = async (codes) => {
+    const response = await api.get('/products/by-codes', { params: { codes: codes.join(',') } });
+    return response.data;
+};
+
+// Products changed since a sync cursor, see GET /products/changes
+export const getProductChanges = async (since = null, limit = 500) => {
+    const params = { limit };
+    if (since) {
+        params.since = since;
+    }
+    const response = await api.get('/products/changes', { params });
+    return response.data;
+};
+
+// Whole catalog as { cursor, columns, rows, count }, see GET /products/snapshot
+export const getProductSnapshot = async () => {
+    const response = await api.get('/products/snapshot');
+    return response.data;
+};
+
 export const createProduct = async (productData) => {
-    const response = await api.post('/products/', productData);
+    const response = await postIdempotent('/products/', productData);
     return response.data;
 };
 
@@ -35,9 +95,28 @@ export const importProducts = async (products) => {
     return response.data;
 };
 
+export const importProductFile = async (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post('/products/import', formData);
+    return response.data;
+};
+
+export const getProductImportJob = async (jobId) => {
+    const response = await api.get(`/products/import/${jobId}`);
+    return response.data;
+};
+
+// Download links for streamed exports (dates as YYYY-MM-DD, end day included)
+export const invoiceExportUrl = (start, end, format = 'csv') =>
+    `${import.meta.env.VITE_API_URL}/invoices/export?start=${start}&end=${end}&format=${format}`;
+
+export const inventoryExportUrl = (start, end, format = 'csv') =>
+    `${import.meta.env.VITE_API_URL}/inventory/export?start=${start}&end=${end}&format=${format}`;
+
 // Inventory APIs
 export const createInventoryRecord = async (recordData) => {
-    const response = await api.post('/inventory/record', recordData);
+    const response = await postIdempotent('/inventory/record', recordData);
     return response.data;
 };
 
@@ -46,14 +125,28 @@ export const getInventoryHistory = async (productId, page = 1, limit = 10) => {
     return response.data;
 };
 
-export const getLowStockProducts = async (threshold = 10) => {
-    const response = await api.get(`/inventory/low-stock?threshold=${threshold}`);
+// Without a threshold, products at or below their forecast reorder point
+export const getLowStockProducts = async (threshold = null) => {
+    const params = threshold === null ? {} : { threshold };
+    const response = await api.get('/inventory/low-stock', { params });
+    return response.data;
+};
+
+// Products to reorder, soonest to run out first, with the suggested order quantity
+export const getRestockRecommendations = async (limit = 100) => {
+    const response = await api.get('/inventory/restock', { params: { limit } });
     return response.data;
 };
 
 // Invoice APIs
 export const createInvoice = async (invoiceData) => {
-    const response = await api.post('/invoices/', invoiceData);
+    const response = await postIdempotent('/invoices/', invoiceData);
+    return response.data;
+};
+
+// Replay sales recorded offline; each carries its client_txn_id, so a retry is safe
+export const replayInvoices = async (transactions) => {
+    const response = await api.post('/invoices/batch', transactions);
     return response.data;
 };
 
@@ -62,8 +155,17 @@ export const getInvoice = async (id) => {
     return response.data;
 };
 
-export const listInvoices = async (page = 1, limit = 10) => {
-    const response = await api.get(`/invoices/?page=${page}&limit=${limit}`);
+// 'summary' lists invoice number, date, total and item count; items come from getInvoice
+export const listInvoices = async (page = 1, limit = 10, view = 'summary') => {
+    const response = await api.get(`/invoices/?page=${page}&limit=${limit}&view=${view}`);
+    return response.data;
+};
+
+// ESC/POS bytes for a thermal printer (paper: 58 or 80 mm; mode: 'text' or 'raster')
+export const getEscposReceipt = async (id, paper = 80, mode = 'text') => {
+    const response = await api.get(`/invoices/print/${id}/escpos?paper=${paper}&mode=${mode}`, {
+        responseType: 'arraybuffer',
+    });
     return response.data;
 };
 
@@ -71,3 +173,33 @@ export const printInvoice = async (id) => {
     const response = await api.get(`/invoices/print/${id}`);
     return response.data;
 };
+
+// Sales report APIs (dates as YYYY-MM-DD, end day included)
+// period: 'day', 'week' or 'month'
+export const getRevenueReport = async (start, end, period = 'day') => {
+    const response = await api.get('/reports/revenue', { params: { start, end, period } });
+    return response.data;
+};
+
+// order: 'revenue' or 'quantity'
+export const getTopProducts = async (start, end, order = 'revenue', limit = 10) => {
+    const response = await api.get('/reports/top-products', { params: { start, end, order, limit } });
+    return response.data;
+};
+
+// Heatmap cells { weekday (0 = Sunday), hour, invoice_count, revenue }
+export const getHourlySales = async (start, end) => {
+    const response = await api.get('/reports/hourly', { params: { start, end } });
+    return response.data;
+};
+
+// ABC class, velocity, sell-through and change vs the previous period of every product
+// abcClass: null, 'A', 'B' or 'C'
+export const getProductAnalytics = async (start, end, abcClass = null, page = 1, limit = 100) => {
+    const params = { start, end, page, limit };
+    if (abcClass) {
+        params.abc_class = abcClass;
+    }
+    const response = await api.get('/reports/products', { params });
+    return response.data;
+};
@@ -89,6 +89,91 @@ export const saveLocalProducts = async (products) => {
   }
 };
 
+/**
+ * Get the catalog sync cursor returned by the last applied change page
+ * @returns {Promise<string|null>} - Cursor ("<epoch>.<seq>") or null if never synced
+ */
+export const getCatalogCursor = async () => {
+  try {
+    const db = await initDatabase();
+    const transaction = db.transaction([STORES.SYNC_STATUS], 'readonly');
+    const store = transaction.objectStore(STORES.SYNC_STATUS);
+    const request = store.get('catalogCursor');
+
+    return new Promise((resolve, reject) => {
+      request.onsuccess = () => resolve(request.result ? request.result.cursor : null);
+      request.onerror = (event) => reject(event.target.error);
+    });
+  } catch (error) {
+    console.error('Error getting catalog cursor from IndexedDB:', error);
+    return null;
+  }
+};
+
+/**
+ * Apply one page of GET /products/changes to the local catalog and store
+ * its cursor in the same IndexedDB transaction
+ * @param {Object} changes - { cursor, reset, items, deleted }
+ * @returns {Promise<void>}
+ */
+export const applyProductChanges = async (changes) => {
+  const db = await initDatabase();
+  const transaction = db.transaction([STORES.PRODUCTS, STORES.SYNC_STATUS], 'readwrite');
+  const products = transaction.objectStore(STORES.PRODUCTS);
+
+  if (changes.reset) {
+    products.clear();
+  }
+  changes.deleted.forEach(product => products.delete(product.id));
+  changes.items.forEach(product => products.put(product));
+  transaction.objectStore(STORES.SYNC_STATUS).put({ id: 'catalogCursor', cursor: changes.cursor });
+
+  return new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve();
+    transaction.onerror = (event) => reject(event.target.error);
+  });
+};
+
+/**
+ * Replace the local catalog with a snapshot from GET /products/snapshot
+ * @param {Object} snapshot - { cursor, columns, rows }
+ * @returns {Promise<void>}
+ */
+export const saveProductSnapshot = async (snapshot) => {
+  const products = snapshot.rows.map(row =>
+    Object.fromEntries(snapshot.columns.map((column, i) => [column, row[i]]))
+  );
+  return applyProductChanges({ cursor: snapshot.cursor, reset: true, items: products, deleted: [] });
+};
+
+/**
+ * Bring the local catalog up to date with only what changed since the
+ * last sync. A terminal that has never synced starts from a snapshot
+ * when fetchSnapshot is given.
+ * @param {Function} fetchChanges - (since) => Promise of a change page, e.g. api.getProductChanges
+ * @param {Function} [fetchSnapshot] - () => Promise of a snapshot, e.g. api.getProductSnapshot
+ * @returns {Promise<number>} - Number of products updated or deleted
+ */
+export const syncLocalProducts = async (fetchChanges, fetchSnapshot = null) => {
+  let cursor = await getCatalogCursor();
+  let applied = 0;
+  if (!cursor && fetchSnapshot) {
+    const snapshot = await fetchSnapshot();
+    await saveProductSnapshot(snapshot);
+    applied += snapshot.rows.length;
+    cursor = snapshot.cursor;
+  }
+  let changes;
+  do {
+    changes = await fetchChanges(cursor);
+    await applyProductChanges(changes);
+    applied += changes.items.length + changes.deleted.length;
+    cursor = changes.cursor;
+  } while (changes.has_more);
+  await saveLastSyncTime(new Date().toISOString());
+  return applied;
+};
+
 /**
  * Get products from local storage
  * @returns {Promise<Array>} - Array of product objects
@@ -171,9 +256,10 @@ export const saveLocalTransaction = async (transaction) => {
     const tx = db.transaction([STORES.TRANSACTIONS], 'readwrite');
     const store = tx.objectStore(STORES.TRANSACTIONS);
 
-    // Add timestamp and status
+    // Add timestamp and status, and the id the server deduplicates replays on
     const transactionToSave = {
       ...transaction,
+      client_txn_id: crypto.randomUUID(),
       timestamp: new Date().toISOString(),
       status: 'pending'
     };
@@ -247,6 +333,75 @@ export const updateTransactionStatus = async (id, status) => {
   }
 };
 
+/**
+ * Update the status of several transactions in one IndexedDB transaction
+ * @param {Object} statuses - Map of transaction ID to new status
+ * @returns {Promise<void>}
+ */
+export const updateTransactionStatuses = async (statuses) => {
+  const db = await initDatabase();
+  const transaction = db.transaction([STORES.TRANSACTIONS], 'readwrite');
+  const store = transaction.objectStore(STORES.TRANSACTIONS);
+
+  Object.entries(statuses).forEach(([id, status]) => {
+    const getRequest = store.get(Number(id));
+    getRequest.onsuccess = () => {
+      if (getRequest.result) {
+        store.put({ ...getRequest.result, status });
+      }
+    };
+  });
+
+  return new Promise((resolve, reject) => {
+    transaction.oncomplete = () => resolve();
+    transaction.onerror = (event) => reject(event.target.error);
+  });
+};
+
+const REPLAY_BATCH_SIZE = 500;
+
+/**
+ * Send pending transactions to the server in batches
+ * @param {Function} replay - Posts a batch of sales, returns per-sale results
+ * @returns {Promise<{synced: number, failed: number}>}
+ */
+export const syncPendingTransactions = async (replay) => {
+  const pending = await getPendingTransactions();
+  // Sales queued before client_txn_id existed get one now
+  const unnumbered = pending.filter(transaction => !transaction.client_txn_id);
+  if (unnumbered.length > 0) {
+    const db = await initDatabase();
+    const transaction = db.transaction([STORES.TRANSACTIONS], 'readwrite');
+    const store = transaction.objectStore(STORES.TRANSACTIONS);
+    unnumbered.forEach(sale => {
+      sale.client_txn_id = crypto.randomUUID();
+      store.put(sale);
+    });
+    await new Promise((resolve, reject) => {
+      transaction.oncomplete = () => resolve();
+      transaction.onerror = (event) => reject(event.target.error);
+    });
+  }
+
+  let synced = 0;
+  let failed = 0;
+
+  for (let start = 0; start < pending.length; start += REPLAY_BATCH_SIZE) {
+    const batch = pending.slice(start, start + REPLAY_BATCH_SIZE);
+    const response = await replay(batch.map(({ client_txn_id, items }) => ({ client_txn_id, items })));
+
+    // Results come back in request order; a duplicate was recorded by an earlier attempt
+    const statuses = {};
+    response.results.forEach((result, i) => {
+      statuses[batch[i].id] = result.status === 'failed' ? 'failed' : 'synced';
+    });
+    await updateTransactionStatuses(statuses);
+    failed += response.failed;
+    synced += response.results.length - response.failed;
+  }
+  return { synced, failed };
+};
+
 /**
  * Clear an object store
  * @param {IDBDatabase} db - Database instance